@@ -43,7 +43,17 @@ a = Analysis(
         'src.chatbot.bot',         
         'src.chatbot.commands',
         'src.ai.rag',
+        'src.ai.forecast',
+        'src.ai.forecast_service',
+        'src.ai.projections',
         'src.database.db',
+
+        # Importeras först i bakgrundsuppvärmningen (syns inte för PyInstallers analys)
+        'sentence_transformers',
+        'faiss',
+        'pandas',
+        'statsmodels.tsa.arima.model',
+        'google.genai',
         'threading', # För multitrådning i GUI
         
         # FIX FÖR STATSMODELS/ARIMA
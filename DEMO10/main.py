@@ -3,8 +3,12 @@ import customtkinter as ctk
 from src.chatbot.gui import ChatbotGUI 
 import os 
 import sys 
+import multiprocessing
 
 if __name__ == "__main__":
+    #Krävs för prognostjänstens processpool i den paketerade .exe-filen
+    multiprocessing.freeze_support()
+
     #Ställer in utseendet
     ctk.set_appearance_mode("System") 
     ctk.set_default_color_theme("blue")
@@ -0,0 +1,213 @@
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.ai import forecast
+from src.ai.forecast_service import _fit_arima_sum
+from src.database.history import catalog_daily_consumption
+from src.utils.config import FORECAST_CONFIG
+from src.utils.logger import log_info
+
+#Backtest av prognosmodellerna med rullande startpunkt: historiken spelas upp dag för dag,
+#vid varje startpunkt anpassas modellerna på de history_days dagarna före och jämförs med
+#det faktiska uttaget de följande horizon dagarna. De vektoriserade modellerna körs för alla
+#produkter på en gång; ARIMA(1,0,0) anpassas per serie, parallellt i en processpool.
+#Alla modeller jämförs på oavrundade prognoser. ARIMA anpassas på varje serie utan
+#medelvärdesreserven i forecast_next_week; serier där anpassningen misslyckas räknas
+#som misslyckade och ingår inte i ARIMA-felen.
+#Uttaget per dag räknas direkt ur Produkt_historik (history.catalog_daily_consumption).
+
+MODELS = ("medel", "ses", "ar1", "vektoriserad", "arima")
+
+
+def _timed_arima(consumption, horizon):
+    """Körs i en arbetsprocess: (summan av ARIMA-prognoserna eller nan, anpassningstid i sekunder)."""
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        #Konvergensvarningar för korta eller konstanta serier
+        warnings.simplefilter("ignore")
+        predicted = _fit_arima_sum(consumption, horizon)
+    return (float("nan") if predicted is None else predicted), time.perf_counter() - started
+
+
+def _vectorized_models(train, horizon):
+    """Prognoser från de vektoriserade modellerna för alla rader, med tid per modell."""
+    timings = {}
+
+    started = time.perf_counter()
+    mean = horizon * train.mean(axis=1)
+    timings["medel"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    level, _, _ = forecast.fit_ses(train)
+    ses = horizon * level
+    timings["ses"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    mu, phi, _ = forecast.fit_ar1(train)
+    ar1 = forecast.forecast_ar1(mu, phi, train[:, -1], horizon)
+    timings["ar1"] = time.perf_counter() - started
+
+    #Hela batchmotorn med modellval, utan ARIMA-reserven (den mäts separat)
+    started = time.perf_counter()
+    combined, _ = forecast.forecast_matrix(train, horizon, arima_max=0)
+    timings["vektoriserad"] = time.perf_counter() - started
+
+    predictions = {
+        "medel": np.maximum(mean, 0.0),
+        "ses": np.maximum(ses, 0.0),
+        "ar1": np.maximum(ar1, 0.0),
+        "vektoriserad": combined,
+    }
+    return predictions, timings
+
+
+def _errors(error, actual):
+    """MAE och MAPE (%); MAPE bara där det faktiska uttaget är större än 0. Misslyckade (nan) hoppas över."""
+    fitted = np.isfinite(error)
+    error, actual = error[fitted], actual[fitted]
+    if not error.size:
+        return float("nan"), float("nan")
+    nonzero = actual > 0
+    mape = float((np.abs(error[nonzero]) / actual[nonzero]).mean() * 100) if nonzero.any() else float("nan")
+    return float(np.abs(error).mean()), mape
+
+
+def rolling_origins(n_days, history_days, horizon, step):
+    """Startpunkter (index för första prognosdagen) från history_days till sista hela horisonten."""
+    return list(range(history_days, n_days - horizon + 1, step))
+
+
+def backtest(matrix, history_days=None, horizon=None, step=None, arima_series=200, workers=None, seed=0):
+    """
+    Backtest på en matris med uttag per dag (produkter × dagar, äldst först).
+
+    Args:
+        history_days: Antal dagar som modellerna får se före varje startpunkt.
+        horizon: Antal dagar som prognostiseras (jämförs med summan av faktiskt uttag).
+        step: Antal dagar mellan startpunkterna.
+        arima_series: Antal slumpvis valda produkter som ARIMA körs för (0 = ingen ARIMA,
+                      None = alla). ARIMA tar storleksordningar längre tid än de andra.
+        workers: Antal processer för ARIMA (None = antal kärnor).
+
+    Returns:
+        Lista av dicts med nycklarna model, mae, mape, n, failed (misslyckade anpassningar),
+        fit_ms (per serie) och wall_s, samt mae_sample och mape_sample: felen för bara de
+        produkter som ARIMA kördes för, så att alla modeller kan jämföras med ARIMA på samma serier.
+    """
+    history_days = history_days or FORECAST_CONFIG["history_days"]
+    horizon = horizon or FORECAST_CONFIG["horizon_days"]
+    step = step or horizon
+    origins = rolling_origins(matrix.shape[1], history_days, horizon, step)
+    if not origins:
+        raise ValueError(
+            f"För kort historik för backtest: {matrix.shape[1]} dagar, minst {history_days + horizon} krävs."
+        )
+
+    errors = {model: [] for model in MODELS}
+    actual_sums = {model: [] for model in MODELS}
+    wall = {model: 0.0 for model in MODELS}
+    fit_seconds = {model: 0.0 for model in MODELS}
+    fits = {model: 0 for model in MODELS}
+
+    rng = np.random.default_rng(seed)
+    n_products = matrix.shape[0]
+    if arima_series is None or arima_series >= n_products:
+        arima_rows = np.arange(n_products)
+    else:
+        arima_rows = np.sort(rng.choice(n_products, arima_series, replace=False))
+
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers=workers) if len(arima_rows) else None
+    try:
+        for origin in origins:
+            train = matrix[:, origin - history_days:origin]
+            actual = matrix[:, origin:origin + horizon].sum(axis=1)
+
+            predictions, timings = _vectorized_models(train, horizon)
+            for model, predicted in predictions.items():
+                errors[model].append(predicted - actual)
+                actual_sums[model].append(actual)
+                wall[model] += timings[model]
+                fit_seconds[model] += timings[model]
+                fits[model] += n_products
+
+            if executor is not None:
+                started = time.perf_counter()
+                chunksize = max(1, len(arima_rows) // (4 * workers))
+                results = list(executor.map(
+                    _timed_arima,
+                    [train[row] for row in arima_rows],
+                    [horizon] * len(arima_rows),
+                    chunksize=chunksize,
+                ))
+                wall["arima"] += time.perf_counter() - started
+                predicted = np.array([value for value, _ in results], dtype="float64")
+                errors["arima"].append(predicted - actual[arima_rows])
+                actual_sums["arima"].append(actual[arima_rows])
+                fit_seconds["arima"] += sum(seconds for _, seconds in results)
+                fits["arima"] += len(results)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    report = []
+    for model in MODELS:
+        if not fits[model]:
+            continue
+        error = np.vstack(errors[model])
+        actual = np.vstack(actual_sums[model])
+        if model == "arima":
+            sample_error, sample_actual = error, actual
+        else:
+            sample_error, sample_actual = error[:, arima_rows], actual[:, arima_rows]
+        mae, mape = _errors(error, actual)
+        mae_sample, mape_sample = _errors(sample_error, sample_actual)
+        report.append({
+            "model": model,
+            "mae": mae,
+            "mape": mape,
+            "mae_sample": mae_sample,
+            "mape_sample": mape_sample,
+            "n": int(error.size),
+            "failed": int(np.count_nonzero(~np.isfinite(error))),
+            "fit_ms": fit_seconds[model] * 1000 / fits[model],
+            "wall_s": wall[model],
+        })
+    log_info(f"Backtest klart: {n_products} produkter, {len(origins)} startpunkter, horisont {horizon} dagar.")
+    return report
+
+
+def format_report(results):
+    """Formaterar backtest som en texttabell."""
+    lines = [f"{'Modell':<13} {'MAE':>9} {'MAPE (%)':>9} {'MAE urval':>10} {'MAPE urval':>11} "
+             f"{'Prognoser':>10} {'ms/serie':>10} {'Total (s)':>10}"]
+    for row in results:
+        lines.append(f"{row['model']:<13} {row['mae']:>9.2f} {row['mape']:>9.1f} {row['mae_sample']:>10.2f} "
+                     f"{row['mape_sample']:>11.1f} {row['n']:>10} {row['fit_ms']:>10.4f} {row['wall_s']:>10.2f}")
+    lines.append("(urval = de produkter som ARIMA kördes för)")
+    for row in results:
+        if row["failed"]:
+            lines.append(f"{row['model']}: {row['failed']} av {row['n']} anpassningar misslyckades (ingår inte i felen)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    #Kör: python -m src.ai.backtest [antal dagar historik] [antal produkter för ARIMA]
+    import sys
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 2 * FORECAST_CONFIG["history_days"]
+    arima_series = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    started = time.perf_counter()
+    _, _, _, matrix = forecast.consumption_matrix(catalog_daily_consumption(days), days)
+    if not len(matrix):
+        print("Inga produkter att mäta på.")
+        sys.exit(1)
+    history_days = min(FORECAST_CONFIG["history_days"], days // 2)
+    print(f"{len(matrix)} produkter, {days} dagar (inläsning {time.perf_counter() - started:.2f} s)")
+    print(format_report(backtest(matrix, history_days=history_days, arima_series=arima_series)))
+    print(f"Total tid: {time.perf_counter() - started:.2f} s")
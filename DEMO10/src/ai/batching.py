@@ -0,0 +1,78 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from src.utils.logger import log_error
+
+
+class MicroBatcher:
+    """
+    Samlar anrop som kommer nästan samtidigt och kör dem som en omgång.
+
+    Den första förfrågan i en omgång väntar högst max_wait_ms på fler förfrågningar
+    (eller tills max_batch har samlats); sedan anropas process_batch en gång med
+    hela listan. process_batch ska returnera en lista med ett resultat per förfrågan.
+    Bakgrundstråden startas vid första anropet.
+    """
+
+    def __init__(self, process_batch, max_batch=32, max_wait_ms=5, name="batcher"):
+        self._process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """Lägger förfrågan i kön och returnerar en Future med resultatet."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Kör förfrågan via kön och väntar på resultatet."""
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self._process_batch(items)
+            except Exception as e:
+                log_error(f"Fel i omgång ({self.name}, {len(items)} förfrågningar): {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        average = self.requests / self.batches if self.batches else 0.0
+        return {"omgångar": self.batches, "förfrågningar": self.requests, "snitt": round(average, 2)}
@@ -0,0 +1,304 @@
+import json
+import mmap
+import os
+import numpy as np
+
+from src.utils.logger import log_info
+
+#Kompakt dokumentlager för RAG. Texterna ligger efter varandra som UTF-8 i
+#<bas>.bin och en post per dokument i <bas>.idx (sorterad på ID). Båda filerna
+#minnesmappas, så bara de dokument som faktiskt läses avkodas; minnesbehovet
+#växer inte med antalet dokument. Källornas namn sparas i <bas>.sources.json.
+#Samma text i flera källor lagras en gång, under den första källan; övriga källor
+#sparas som referenser i <bas>.refs.json så att texten finns kvar tills sista källan släpper den.
+
+RECORD_DTYPE = np.dtype([
+    ("id", "<i8"),             #Dokument-ID (innehållshash, se rag.doc_id)
+    ("offset", "<i8"),         #Byteposition i .bin
+    ("length", "<i4"),         #Längd i byte
+    ("source", "<i4"),         #Index i källistan, -1 = ingen källa
+    ("source_offset", "<i8"),  #Teckenposition i källfilen, -1 = okänd
+])
+
+#Skräp (borttagna texter) i .bin skrivs bort när det utgör mer än så här stor andel
+MAX_GARBAGE_RATIO = 0.5
+
+
+def _map_file(path):
+    """Minnesmappar en fil för läsning. En tom eller saknad fil ger None."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DocumentStore:
+    """
+    Dokumentlager med minnesmappade filer. Nya och borttagna dokument hålls i minnet
+    tills save() anropas; då läggs texterna till sist i .bin och en ny .idx skrivs
+    atomiskt. Klassen är inte trådsäker (RAGChatbot håller sitt eget lås).
+    """
+
+    def __init__(self, base_path):
+        self.blob_path = base_path + ".bin"
+        self.index_path = base_path + ".idx"
+        self.sources_path = base_path + ".sources.json"
+        self.refs_path = base_path + ".refs.json"
+        self._blob = None
+        self._index_map = None
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        self._source_names = []
+        self._source_ids = {}
+        self._pending = {}    #ID -> (text, källa, källposition) som inte sparats än
+        self._deleted = set()
+        self._refs = {}       #ID -> {källa: källposition} för källor utöver postens egen
+        self._refs_dirty = False
+        self._open()
+
+    @classmethod
+    def exists(cls, base_path):
+        return os.path.exists(base_path + ".idx")
+
+    def _open(self):
+        if os.path.exists(self.sources_path):
+            with open(self.sources_path, "r", encoding="utf-8") as f:
+                self._source_names = json.load(f)
+        self._source_ids = {name: i for i, name in enumerate(self._source_names)}
+        if os.path.exists(self.refs_path):
+            with open(self.refs_path, "r", encoding="utf-8") as f:
+                self._refs = {}
+                for key, source, source_offset in json.load(f):
+                    self._refs.setdefault(key, {})[source] = source_offset
+        self._blob = _map_file(self.blob_path)
+        self._index_map = _map_file(self.index_path)
+        if self._index_map is not None:
+            self._records = np.frombuffer(self._index_map, dtype=RECORD_DTYPE)
+
+    def _close(self):
+        #Vyer mot minnesmappningen måste släppas innan den kan stängas
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        for mapped in (self._index_map, self._blob):
+            if mapped is not None:
+                mapped.close()
+        self._index_map = None
+        self._blob = None
+
+    def _position(self, key):
+        """Position för key i de sparade posterna, eller -1."""
+        position = int(np.searchsorted(self._records["id"], key))
+        if position < len(self._records) and self._records["id"][position] == key:
+            return position
+        return -1
+
+    def __contains__(self, key):
+        key = int(key)
+        if key in self._pending:
+            return True
+        return key not in self._deleted and self._position(key) >= 0
+
+    def __len__(self):
+        stored = len(self._records) - sum(1 for key in self._deleted if self._position(key) >= 0)
+        return stored + len(self._pending)
+
+    def get(self, key):
+        """Dokumentets text, eller None om det inte finns. Bara detta dokument avkodas."""
+        key = int(key)
+        if key in self._pending:
+            return self._pending[key][0]
+        if key in self._deleted:
+            return None
+        position = self._position(key)
+        if position < 0:
+            return None
+        record = self._records[position]
+        start = int(record["offset"])
+        return self._blob[start:start + int(record["length"])].decode("utf-8")
+
+    def metadata(self, key):
+        """{"source": ..., "offset": ...} för dokumentet, eller None om källa saknas."""
+        key = int(key)
+        if key in self._pending:
+            _, source, source_offset = self._pending[key]
+            return {"source": source, "offset": source_offset} if source is not None else None
+        position = self._position(key)
+        if position < 0 or key in self._deleted or self._records["source"][position] < 0:
+            return None
+        record = self._records[position]
+        return {"source": self._source_names[record["source"]], "offset": int(record["source_offset"])}
+
+    def ids(self):
+        """Alla dokument-ID som int64-array (en kopia, inte en vy mot den mappade filen)."""
+        stored = self._records["id"].copy()
+        if self._deleted:
+            stored = stored[~np.isin(stored, np.fromiter(self._deleted, dtype="int64"))]
+        if self._pending:
+            stored = np.concatenate([stored, np.fromiter(self._pending, dtype="int64")])
+        return stored
+
+    def ids_from(self, source):
+        """ID för alla dokument från källan source, även de som lagras under en annan källa."""
+        keys = [key for key, (_, pending_source, _) in self._pending.items() if pending_source == source]
+        source_id = self._source_ids.get(source)
+        if source_id is not None:
+            stored = self._records["id"][self._records["source"] == source_id]
+            keys += [int(key) for key in stored if int(key) not in self._deleted]
+        keys += [key for key, refs in self._refs.items() if source in refs and key in self]
+        return keys
+
+    def sources(self):
+        """Alla källor som har minst ett dokument."""
+        sources = self._records["source"]
+        if self._deleted:
+            sources = sources[~np.isin(self._records["id"], np.fromiter(self._deleted, dtype="int64"))]
+        used = set(np.unique(sources[sources >= 0]).tolist())
+        names = {self._source_names[i] for i in used}
+        names.update(source for _, source, _ in self._pending.values() if source is not None)
+        for key, refs in self._refs.items():
+            if key in self:
+                names.update(refs)
+        return names
+
+    def iter_texts(self, batch_size=1000):
+        """Ger (ID, text) för alla dokument, utan att hela lagret avkodas på en gång."""
+        keys = self.ids()
+        for start in range(0, len(keys), batch_size):
+            for key in keys[start:start + batch_size]:
+                yield int(key), self.get(key)
+
+    def add(self, key, text, source=None, source_offset=-1):
+        key = int(key)
+        if self._position(key) >= 0:
+            #En sparad post med samma ID ersätts vid nästa save()
+            self._deleted.add(key)
+        self._pending[key] = (text, source, source_offset)
+
+    def add_source(self, key, source, source_offset=-1):
+        """Registrerar ytterligare en källa för ett befintligt dokument (samma text i flera filer)."""
+        key = int(key)
+        metadata = self.metadata(key)
+        if source is None or key not in self or (metadata is not None and metadata["source"] == source):
+            return
+        if self._refs.get(key, {}).get(source) != source_offset:
+            self._refs.setdefault(key, {})[source] = source_offset
+            self._refs_dirty = True
+
+    def drop_source(self, key, source):
+        """
+        Tar bort källan source från dokumentet. Lagras dokumentet under source flyttas det
+        till en av de övriga källorna. Returnerar True om ingen källa återstår, dvs. om
+        dokumentet ska tas bort (det görs inte här).
+        """
+        key = int(key)
+        refs = self._refs.get(key, {})
+        if source in refs:
+            del refs[source]
+            if not refs:
+                del self._refs[key]
+            self._refs_dirty = True
+            return False
+        metadata = self.metadata(key)
+        if metadata is None or metadata["source"] != source:
+            #Källan har inte dokumentet
+            return False
+        if not refs:
+            return True
+        new_source = next(iter(refs))
+        source_offset = refs.pop(new_source)
+        if not refs:
+            del self._refs[key]
+        self._refs_dirty = True
+        self.add(key, self.get(key), new_source, source_offset)
+        return False
+
+    def delete(self, key):
+        key = int(key)
+        self._pending.pop(key, None)
+        if self._refs.pop(key, None) is not None:
+            self._refs_dirty = True
+        if self._position(key) >= 0:
+            self._deleted.add(key)
+
+    def clear(self):
+        self._pending.clear()
+        self._deleted = set(int(key) for key in self._records["id"])
+        if self._refs:
+            self._refs = {}
+            self._refs_dirty = True
+
+    def _save_refs(self):
+        if not self._refs_dirty:
+            return
+        os.makedirs(os.path.dirname(self.refs_path) or ".", exist_ok=True)
+        with open(self.refs_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump([[key, source, source_offset] for key, refs in self._refs.items()
+                       for source, source_offset in refs.items()], f, ensure_ascii=False)
+        os.replace(self.refs_path + ".tmp", self.refs_path)
+        self._refs_dirty = False
+
+    def save(self):
+        """
+        Skriver väntande ändringar. Texter läggs till sist i .bin; .idx och källistan
+        byts atomiskt (temporär fil + os.replace). Skräp skrivs bort när det behövs.
+        """
+        if not self._pending and not self._deleted:
+            self._save_refs()
+            return
+
+        keep = self._records
+        if self._deleted:
+            keep = keep[~np.isin(keep["id"], np.fromiter(self._deleted, dtype="int64"))]
+        keep = keep.copy()
+
+        blob_size = os.path.getsize(self.blob_path) if os.path.exists(self.blob_path) else 0
+        garbage = blob_size - int(keep["length"].sum())
+        rewrite = blob_size > 0 and garbage > MAX_GARBAGE_RATIO * blob_size
+
+        new_records = np.empty(len(self._pending), dtype=RECORD_DTYPE)
+        texts = []
+        for i, (key, (text, source, source_offset)) in enumerate(self._pending.items()):
+            data = text.encode("utf-8")
+            texts.append(data)
+            if source is not None and source not in self._source_ids:
+                self._source_ids[source] = len(self._source_names)
+                self._source_names.append(source)
+            new_records[i] = (key, 0, len(data), self._source_ids.get(source, -1), source_offset)
+
+        os.makedirs(os.path.dirname(self.blob_path) or ".", exist_ok=True)
+        if rewrite:
+            #Skriver om .bin utan borttagna texter (läses direkt från den gamla mappningen)
+            position = 0
+            with open(self.blob_path + ".tmp", "wb") as f:
+                for i in range(len(keep)):
+                    start, length = int(keep["offset"][i]), int(keep["length"][i])
+                    f.write(self._blob[start:start + length])
+                    keep["offset"][i] = position
+                    position += length
+                for i, data in enumerate(texts):
+                    new_records["offset"][i] = position
+                    f.write(data)
+                    position += len(data)
+            self._close()
+            os.replace(self.blob_path + ".tmp", self.blob_path)
+            log_info(f"Dokumentlagret komprimerat ({garbage} byte skräp borttaget).")
+        else:
+            #Lägger bara till nya texter; byte som inte pekas ut av .idx är ofarliga
+            self._close()
+            with open(self.blob_path, "ab") as f:
+                position = f.tell()
+                for i, data in enumerate(texts):
+                    new_records["offset"][i] = position
+                    f.write(data)
+                    position += len(data)
+
+        records = np.concatenate([keep, new_records])
+        records.sort(order="id")
+        with open(self.sources_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._source_names, f, ensure_ascii=False)
+        os.replace(self.sources_path + ".tmp", self.sources_path)
+        records.tofile(self.index_path + ".tmp")
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+        self._pending.clear()
+        self._deleted.clear()
+        self._save_refs()
+        self._open()
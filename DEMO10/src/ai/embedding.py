@@ -0,0 +1,190 @@
+import json
+import os
+import time
+import numpy as np
+
+from src.utils.config import RAG_CONFIG
+from src.utils.logger import log_info, log_warning
+
+#Inferensbackends för embeddern (RAG_CONFIG['embedding_backend']):
+#  "torch" - SentenceTransformer i full precision (standard)
+#  "int8"  - dynamisk int8-kvantisering av alla Linear-lager (torch, bara CPU)
+#  "onnx"  - ONNX Runtime via sentence-transformers (kräver optimum[onnxruntime]);
+#            RAG_CONFIG['onnx_file_name'] kan peka på en kvantiserad modellfil
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def _load(model_name, backend):
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        model_kwargs = {"file_name": RAG_CONFIG["onnx_file_name"]} if RAG_CONFIG["onnx_file_name"] else None
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    if backend == "int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return SentenceTransformer(model_name)
+
+
+def _check_key(model_name, backend, store_version):
+    """Det som kontrollen mot torch beror på: modell, backend (med ONNX-fil) och dokumentlagrets version."""
+    onnx_file_name = RAG_CONFIG["onnx_file_name"] if backend == "onnx" else None
+    return {"model": model_name, "backend": backend, "onnx_file_name": onnx_file_name, "store_version": store_version}
+
+
+def _read_check(path, key):
+    """Sparat resultat från check_agreement för key, eller None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError) as e:
+        log_warning(f"Kunde inte läsa sparad embedding-kontroll {path}: {e}")
+        return None
+    return saved.get("result") if saved.get("key") == key else None
+
+
+def _write_check(path, key, result):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"key": key, "result": result}, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_embedder(model_name=None, backend=None, sample_docs=None, check_path=None, store_version=None):
+    """
+    Laddar SentenceTransformer med vald backend. Om backenden inte kan laddas
+    (t.ex. saknat paket) används torch i full precision och en varning loggas.
+
+    En int8- eller ONNX-backend jämförs först med torch på sample_docs (t.ex. ett urval
+    ur dokumentlagret, se check_agreement); är överensstämmelsen under
+    RAG_CONFIG['embedding_min_agreement'] används torch i stället och en varning loggas.
+    Med check_path sparas resultatet där, nycklat på modell, backend och store_version;
+    kontrollen (som laddar en extra torch-modell) körs bara om när någon av dem ändras.
+
+    Returns:
+        (modell, backend som faktiskt används)
+    """
+    model_name = model_name or RAG_CONFIG["embedding_model"]
+    backend = backend or RAG_CONFIG["embedding_backend"]
+    if backend not in BACKENDS:
+        raise ValueError(f"Okänd embedding-backend '{backend}'. Välj en av {', '.join(BACKENDS)}.")
+
+    try:
+        model = _load(model_name, backend)
+    except (ImportError, RuntimeError, ValueError, OSError) as e:
+        if backend == "torch":
+            raise
+        log_warning(f"Kunde inte ladda embedding-backend '{backend}' ({e}). Använder torch.")
+        return _load(model_name, "torch"), "torch"
+
+    if backend != "torch" and sample_docs:
+        key = _check_key(model_name, backend, store_version)
+        reference = None
+        result = _read_check(check_path, key)
+        if result is None:
+            reference = _load(model_name, "torch")
+            result = check_agreement(reference, model, sample_docs)
+            if check_path:
+                _write_check(check_path, key, result)
+        #Gränsen jämförs på nytt så att en ändrad embedding_min_agreement gäller även sparade resultat
+        if result["agreement_mean"] < RAG_CONFIG["embedding_min_agreement"]:
+            log_warning(
+                f"Embedding-backend '{backend}' överensstämmer för dåligt med torch "
+                f"(top-k medel {result['agreement_mean']:.3f} < {RAG_CONFIG['embedding_min_agreement']}). Använder torch."
+            )
+            return reference or _load(model_name, "torch"), "torch"
+        source = "kontrollerad" if reference is not None else "kontrollerad tidigare"
+        log_info(f"Embedding-backend '{backend}' {source} mot torch: top-k medel {result['agreement_mean']:.3f}.")
+        del reference
+
+    log_info(f"Embedder laddad: {model_name} ({backend}).")
+    return model, backend
+
+
+def _top_k(doc_vectors, query_vectors, k):
+    """Exakta top-k (L2) för varje fråga, som i IndexFlatL2."""
+    distances = (
+        (query_vectors ** 2).sum(axis=1)[:, None]
+        - 2 * query_vectors @ doc_vectors.T
+        + (doc_vectors ** 2).sum(axis=1)[None, :]
+    )
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def _encode_timed(model, texts):
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=RAG_CONFIG["encode_batch_size"], convert_to_numpy=True)
+    return np.asarray(vectors, dtype="float32"), (time.perf_counter() - start) * 1000 / len(texts)
+
+
+def sample_queries(docs, n_queries, seed=0):
+    """Testfrågor: de första orden i slumpvis valda dokument."""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(docs), min(n_queries, len(docs)), replace=False)
+    return [" ".join(docs[i].split()[:8]) for i in picked]
+
+
+def check_agreement(reference, candidate, docs, queries=None, k=5):
+    """
+    Överensstämmelse mellan två inladdade modeller: båda bäddar in dokumenten och
+    frågorna (som standard sample_queries(docs)), och överensstämmelsen är andelen
+    gemensamma dokument i top-k per fråga.
+
+    Returns:
+        dict med medel- och minsta överensstämmelse, latens per text (ms) för båda
+        modellerna och om kravet i RAG_CONFIG['embedding_min_agreement'] uppfylls.
+    """
+    queries = queries or sample_queries(docs, RAG_CONFIG["embedding_check_queries"])
+    k = min(k, len(docs))
+
+    ref_docs, _ = _encode_timed(reference, docs)
+    ref_queries, ref_latency = _encode_timed(reference, queries)
+    cand_docs, _ = _encode_timed(candidate, docs)
+    cand_queries, cand_latency = _encode_timed(candidate, queries)
+
+    expected = _top_k(ref_docs, ref_queries, k)
+    found = _top_k(cand_docs, cand_queries, k)
+    agreement = np.array([len(set(a) & set(b)) / k for a, b in zip(expected, found)])
+
+    return {
+        "agreement_mean": float(agreement.mean()),
+        "agreement_min": float(agreement.min()),
+        "latency_ms_torch": ref_latency,
+        "latency_ms_backend": cand_latency,
+        "ok": bool(agreement.mean() >= RAG_CONFIG["embedding_min_agreement"]),
+    }
+
+
+def compare_backends(docs, queries, k=5, backend=None, model_name=None):
+    """
+    Jämför en backend med torch i full precision (se check_agreement).
+
+    Returns:
+        dict från check_agreement samt backend (den som faktiskt laddades).
+    """
+    backend = backend or RAG_CONFIG["embedding_backend"]
+    reference = _load(model_name or RAG_CONFIG["embedding_model"], "torch")
+    candidate, used = load_embedder(model_name, backend)
+    return dict(check_agreement(reference, candidate, docs, queries, k), backend=used)
+
+
+if __name__ == "__main__":
+    #Kör: python -m src.ai.embedding [backend] [antal frågor]
+    #Frågorna är de första orden i slumpvis valda dokument ur data/docs.txt.
+    import sys
+
+    backend = sys.argv[1] if len(sys.argv) > 1 else RAG_CONFIG["embedding_backend"]
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with open(RAG_CONFIG["docs_path"], "r", encoding="utf-8") as f:
+        docs = [line.strip() for line in f if line.strip()]
+
+    result = compare_backends(docs, sample_queries(docs, n_queries), backend=backend)
+    print(f"Backend: {result['backend']}")
+    print(f"Överensstämmelse top-5 mot torch: medel {result['agreement_mean']:.3f}, minst {result['agreement_min']:.3f}")
+    print(f"Latens per text: torch {result['latency_ms_torch']:.2f} ms, {result['backend']} {result['latency_ms_backend']:.2f} ms")
+    print("OK" if result["ok"] else f"UNDER GRÄNSEN ({RAG_CONFIG['embedding_min_agreement']})")
+    sys.exit(0 if result["ok"] else 1)
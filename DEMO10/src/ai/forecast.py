@@ -1,42 +1,225 @@
-import pandas as pd
+import time
+from datetime import datetime, timezone
+
+import numpy as np
 from statsmodels.tsa.arima.model import ARIMA
-from src.database.db import get_product_history
+from src.database.db import get_daily_consumption
+from src.ai.forecast_service import get_service
+from src.utils.config import FORECAST_CONFIG
+from src.utils.logger import log_info
 
-def forecast_next_week(product_name: str, df: pd.DataFrame) -> int:
+def forecast_next_week(product_name: str, consumption, horizon=None) -> int:
     """
-    Använder ARIMA-modellering för att förutsäga efterfrågan för nästa vecka baserat på historik.
+    Använder ARIMA-modellering för att förutsäga uttaget de närmaste horizon dagarna
+    (standard: en vecka) utifrån förbrukningen per dag.
     
     Args:
         product_name: Namn på produkten (för loggning/felrapportering).
-        df: DataFrame som innehåller historisk data ('date', 'quantity').
+        consumption: Uttag per dag, äldst först och utan glapp (se src.database.history).
+        horizon: Antal dagar framåt (FORECAST_CONFIG['horizon_days'] om None).
         
     Returns:
-        Heltal som representerar förväntad försäljning/uttag nästa vecka.
+        Heltal som representerar förväntat uttag under perioden.
     """
-    
-    if df.empty:
-        return 0 
+    horizon = horizon or FORECAST_CONFIG["horizon_days"]
+    ts = np.asarray(consumption, dtype="float64")
+    if len(ts) == 0:
+        return 0
 
-    #Förbereder data
+    #För få dagar med uttag för en meningsfull modell: medelvärdet per dag
+    if np.count_nonzero(ts) < FORECAST_CONFIG["min_active_days"]:
+        return max(0, int(round(horizon * ts.mean())))
+
+    #Modellering (ARIMA)
     try:
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.set_index('date').sort_index()
-        ts = df['quantity'].astype(float)
-    
-        if len(ts) < 7:
-            return round(ts.mean()) if not ts.empty else 0
-            
+        model_fit = ARIMA(ts, order=(1, 0, 0)).fit()
+        return max(0, int(round(model_fit.forecast(steps=horizon).sum())))
+
     except Exception as e:
-        return round(df['quantity'].mean()) if not df.empty else 0
+        return max(0, int(round(horizon * ts.mean())))
 
 
-    #Modellering (ARIMA)
-    try:
-        model = ARIMA(ts, order=(1, 0, 0))
-        model_fit = model.fit()
+#Batchprognoser för hela sortimentet. All förbrukning hämtas i ett anrop och ställs upp
+#som en matris (produkter × dagar); AR(1) och exponentiell utjämning anpassas för alla
+#serier samtidigt med slutna uttryck. Bara serier där AR(1) är osäker (nära enhetsrot)
+#anpassas med statsmodels ARIMA, och högst FORECAST_CONFIG['arima_fallback_max'] per körning.
 
-        forecast = model_fit.forecast(steps=1)[0]
-        return max(0, int(round(forecast)))
+#Metod per produkt i resultatet
+METHOD_MEAN = "medel"
+METHOD_AR1 = "ar1"
+METHOD_SES = "ses"
+METHOD_ARIMA = "arima"
 
-    except Exception as e:
-        return max(0, int(round(ts.mean()))) if not ts.empty else 0
+
+def consumption_matrix(rows, days, end_date=None):
+    """
+    Ställer upp rader från get_daily_consumption som en matris med en rad per produkt
+    och en kolumn per dag (äldst först); dagar utan uttag blir 0.
+
+    Returns:
+        (ProduktID-array, namnlista, saldo-array, matris float64 med form (produkter, days))
+    """
+    end = np.datetime64(end_date or datetime.now(timezone.utc).date(), "D")
+    start = end - (days - 1)
+
+    product_ids = np.array([row[0] for row in rows], dtype="int64")
+    #Raderna är sorterade på ProduktID: första raden per produkt ger namn och saldo
+    first = np.flatnonzero(np.r_[True, product_ids[1:] != product_ids[:-1]]) if len(rows) else np.empty(0, dtype="int64")
+    names = [rows[i][1] for i in first]
+    stocks = np.array([rows[i][2] for i in first], dtype="float64")
+
+    matrix = np.zeros((len(first), days), dtype="float64")
+    dated = [i for i, row in enumerate(rows) if row[3] is not None]
+    if dated:
+        product_rows = np.searchsorted(product_ids[first], product_ids[dated])
+        columns = (np.array([rows[i][3] for i in dated], dtype="datetime64[D]") - start).astype("int64")
+        values = np.array([rows[i][4] for i in dated], dtype="float64")
+        inside = (columns >= 0) & (columns < days)
+        matrix[product_rows[inside], columns[inside]] = values[inside]
+
+    return product_ids[first], names, stocks, matrix
+
+
+def fit_ar1(matrix):
+    """
+    AR(1) med medelvärde för varje rad: x[t] - mu = phi·(x[t-1] - mu) + e[t],
+    skattad med minsta kvadrat. Returns: (mu, phi, residualvarians) per rad.
+    """
+    mu = matrix.mean(axis=1)
+    centered = matrix - mu[:, None]
+    previous, current = centered[:, :-1], centered[:, 1:]
+    denominator = (previous ** 2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        phi = np.where(denominator > 0, (previous * current).sum(axis=1) / denominator, 0.0)
+    residuals = current - phi[:, None] * previous
+    return mu, phi, (residuals ** 2).mean(axis=1)
+
+
+def forecast_ar1(mu, phi, last, horizon):
+    """Summan av AR(1)-prognoserna för steg 1..horizon: horizon·mu + (last - mu)·(phi + ... + phi^horizon)."""
+    #Stationär del: |phi| < 1 (skattningar utanför klipps)
+    phi = np.clip(phi, -0.99, 0.99)
+    powers = phi[:, None] ** np.arange(1, horizon + 1)[None, :]
+    return horizon * mu + (last - mu) * powers.sum(axis=1)
+
+
+def fit_ses(matrix, alphas=None):
+    """
+    Enkel exponentiell utjämning för varje rad, med den utjämningsparameter (bland alphas)
+    som ger minst kvadratiskt ettstegsfel. Alla alphas och rader körs samtidigt.
+
+    Returns: (nivå efter sista dagen, vald alpha, ettstegsfelets varians) per rad.
+    """
+    alphas = np.asarray(alphas or FORECAST_CONFIG["ses_alphas"], dtype="float64")[:, None]
+    level = np.repeat(matrix[None, :, 0], len(alphas), axis=0)
+    sse = np.zeros_like(level)
+    for t in range(1, matrix.shape[1]):
+        error = matrix[None, :, t] - level
+        sse += error ** 2
+        level += alphas * error
+
+    best = sse.argmin(axis=0)
+    rows = np.arange(matrix.shape[0])
+    return level[best, rows], alphas[best, 0], sse[best, rows] / max(matrix.shape[1] - 1, 1)
+
+
+def forecast_matrix(matrix, horizon=None, arima_max=None):
+    """
+    Prognos för summan av de närmaste horizon dagarna, för varje rad i matrisen.
+    Per serie väljs AR(1) eller exponentiell utjämning efter minst ettstegsfel;
+    serier med för få dagar med uttag får medelvärdet och serier nära enhetsrot
+    (|phi| över FORECAST_CONFIG['unit_root_phi']) anpassas med ARIMA om antalet tillåter.
+
+    Returns:
+        (prognos per rad (>= 0), metod per rad)
+    """
+    horizon = horizon or FORECAST_CONFIG["horizon_days"]
+    arima_max = FORECAST_CONFIG["arima_fallback_max"] if arima_max is None else arima_max
+
+    mu, phi, ar_variance = fit_ar1(matrix)
+    level, _, ses_variance = fit_ses(matrix)
+    ar_forecast = forecast_ar1(mu, phi, matrix[:, -1], horizon)
+    ses_forecast = horizon * level
+
+    use_ar = ar_variance <= ses_variance
+    forecast = np.where(use_ar, ar_forecast, ses_forecast)
+    methods = np.where(use_ar, METHOD_AR1, METHOD_SES).astype(object)
+
+    sparse = (matrix > 0).sum(axis=1) < FORECAST_CONFIG["min_active_days"]
+    forecast[sparse] = horizon * mu[sparse]
+    methods[sparse] = METHOD_MEAN
+
+    #AR(1) på sluten form blir missvisande nära enhetsrot; där används statsmodels (MLE),
+    #parallellt i prognostjänstens processpool
+    unstable = np.flatnonzero(use_ar & ~sparse & (np.abs(phi) > FORECAST_CONFIG["unit_root_phi"]))[:arima_max]
+    fitted = get_service().fit_series([matrix[row] for row in unstable], horizon)
+    for row, value in zip(unstable, fitted):
+        if value is None:
+            forecast[row] = ses_forecast[row]
+            methods[row] = METHOD_SES
+        else:
+            forecast[row] = value
+            methods[row] = METHOD_ARIMA
+
+    return np.maximum(forecast, 0.0), methods
+
+
+def forecast_catalog(horizon=None, days=None):
+    """
+    Prognos för förbrukningen de närmaste horizon dagarna för alla produkter i lagret.
+
+    Returns:
+        dict med arrayer (samma ordning): product_id, name, stock, forecast, method
+        samt shortage = forecast - stock (positivt: saldot räcker inte).
+    """
+    horizon = horizon or FORECAST_CONFIG["horizon_days"]
+    days = days or FORECAST_CONFIG["history_days"]
+
+    started = time.perf_counter()
+    product_ids, names, stocks, matrix = consumption_matrix(get_daily_consumption(days), days)
+    loaded = time.perf_counter()
+    forecast, methods = forecast_matrix(matrix, horizon)
+    log_info(
+        f"Batchprognos för {len(product_ids)} produkter: data {loaded - started:.2f} s, "
+        f"modeller {time.perf_counter() - loaded:.2f} s ({int((methods == METHOD_ARIMA).sum())} med ARIMA)."
+    )
+
+    return {
+        "product_id": product_ids,
+        "name": np.array(names, dtype=object),
+        "stock": stocks,
+        "forecast": forecast,
+        "method": methods,
+        "shortage": forecast - stocks,
+    }
+
+
+def products_running_out(horizon=None, limit=None):
+    """
+    Produkter vars prognostiserade förbrukning de närmaste horizon dagarna är större
+    än saldot, med störst underskott först. Returnerar en lista av dicts.
+    """
+    result = forecast_catalog(horizon)
+    order = np.argsort(-result["shortage"], kind="stable")
+    order = order[result["shortage"][order] > 0][:limit]
+    return [
+        {
+            "name": result["name"][i],
+            "stock": int(result["stock"][i]),
+            "forecast": int(round(result["forecast"][i])),
+            "method": result["method"][i],
+        }
+        for i in order
+    ]
+
+
+if __name__ == "__main__":
+    #Kör: python -m src.ai.forecast [antal dagar framåt]
+    import sys
+
+    horizon = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    started = time.perf_counter()
+    running_out = products_running_out(horizon)
+    print(f"{len(running_out)} produkter riskerar att ta slut ({time.perf_counter() - started:.2f} s):")
+    for p in running_out[:50]:
+        print(f"- {p['name']}: saldo {p['stock']}, prognos {p['forecast']} ({p['method']})")
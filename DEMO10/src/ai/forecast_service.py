@@ -0,0 +1,168 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.utils.cache import TTLCache, resolve_cache_path
+from src.utils.config import FORECAST_CONFIG
+from src.utils.logger import log_info, log_warning
+
+#Prognostjänst för statsmodels-ARIMA. Anpassningarna körs i en processpool (alla kärnor,
+#utan att GUI-tråden eller GIL blockeras) och resultatet sparas per produkt, nycklat på
+#produktens senaste historikrad och fönstrets sista dag. Ny anpassning görs bara när ny
+#historik har tillkommit eller när fönstret har flyttats fram en dag.
+#Modellerna anpassas på förbrukning per dag (src.database.history), som forecast_next_week.
+
+
+def _fit_arima(values, steps):
+    """
+    Anpassar ARIMA(1,0,0) och returnerar (prognoser för steg 1..steps, parametrar).
+    Körs i en arbetsprocess; statsmodels importeras där.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    model_fit = ARIMA(np.asarray(values, dtype="float64"), order=(1, 0, 0)).fit()
+    return model_fit.forecast(steps=steps).tolist(), model_fit.params.tolist()
+
+
+def _fit_arima_sum(values, steps):
+    """Summan av ARIMA-prognoserna för steg 1..steps, eller None om anpassningen misslyckas."""
+    try:
+        forecasts, _ = _fit_arima(values, steps)
+        return float(sum(forecasts))
+    except Exception:
+        return None
+
+
+def _history_key(series):
+    """
+    Senaste historikrad och antal rader (ändras så fort ny historik skrivs för produkten),
+    prognoshorisonten och fönstrets sista dag (fönstret flyttas varje dag även utan ny historik).
+    """
+    return [series["latest_history_id"], series["history_rows"], FORECAST_CONFIG["horizon_days"], str(series["end"])]
+
+
+def _mean_forecast(consumption, horizon):
+    return max(0, int(round(horizon * float(np.mean(consumption))))) if len(consumption) else 0
+
+
+class ForecastService:
+    """
+    ARIMA-prognoser med processpool och modellcache per produkt. Poolen startas vid
+    första anpassningen; cachen (ProduktID -> historiknyckel, parametrar, prognos)
+    sparas på disk så att den överlever omstarter.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or FORECAST_CONFIG["workers"] or os.cpu_count()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._models = TTLCache(
+            max_size=FORECAST_CONFIG["model_cache_max_entries"],
+            path=resolve_cache_path(FORECAST_CONFIG["model_cache_path"]),
+        )
+        self.hits = 0
+        self.fits = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                atexit.register(self.shutdown)
+                log_info(f"Prognospool startad med {self.max_workers} processer.")
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def cached(self, series):
+        """Cachad prognos för serien, eller None om produkten har ny historik eller fönstret har flyttats sedan dess."""
+        entry = self._models.get(str(series["product_id"]))
+        if entry is not None and entry["history"] == _history_key(series):
+            return entry["forecast"]
+        return None
+
+    def forecast_next_week(self, series):
+        """
+        Förväntat uttag de närmaste FORECAST_CONFIG['horizon_days'] dagarna (som
+        forecast.forecast_next_week), från cachen om produkten inte har fått ny historik
+        och fönstret inte har flyttats sedan förra anpassningen.
+
+        Args:
+            series: Dagserie från src.database.history.product_daily_series.
+        """
+        return self.forecast_many([series])[0]
+
+    def forecast_many(self, series_list):
+        """
+        Prognoser för flera produkter. Alla som saknas i cachen anpassas samtidigt i poolen.
+        Returnerar en prognos (heltal >= 0) per serie, i samma ordning.
+        """
+        horizon = FORECAST_CONFIG["horizon_days"]
+        results = [None] * len(series_list)
+        pending = {}
+        for i, series in enumerate(series_list):
+            cached = self.cached(series)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                results[i] = cached
+                continue
+            consumption = series["consumption"]
+            if np.count_nonzero(consumption) < FORECAST_CONFIG["min_active_days"]:
+                results[i] = self._store(series, _mean_forecast(consumption, horizon), None)
+                continue
+            pending[i] = self._pool().submit(_fit_arima, consumption, horizon)
+
+        for i, future in pending.items():
+            series = series_list[i]
+            try:
+                forecasts, params = future.result()
+                forecast = max(0, int(round(sum(forecasts))))
+            except Exception as e:
+                log_warning(f"ARIMA misslyckades för {series['name']}: {e}. Medelvärdet används.")
+                forecast, params = _mean_forecast(series["consumption"], horizon), None
+            with self._lock:
+                self.fits += 1
+            results[i] = self._store(series, forecast, params)
+        return results
+
+    def _store(self, series, forecast, params):
+        self._models.set(str(series["product_id"]), {
+            "history": _history_key(series),
+            "params": params,
+            "forecast": forecast,
+        })
+        return forecast
+
+    def fit_series(self, series, steps):
+        """
+        Anpassar ARIMA(1,0,0) för flera serier parallellt (utan cache). Returnerar summan
+        av prognoserna för steg 1..steps per serie, eller None där anpassningen misslyckades.
+        """
+        if not len(series):
+            return []
+        chunksize = max(1, len(series) // (4 * self.max_workers))
+        return list(self._pool().map(_fit_arima_sum, series, [steps] * len(series), chunksize=chunksize))
+
+    def stats(self):
+        with self._lock:
+            return {"cacheträffar": self.hits, "anpassningar": self.fits}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Processens enda prognostjänst (skapas vid första anropet)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ForecastService()
+        return _service
@@ -0,0 +1,221 @@
+import os
+import re
+from collections import deque
+
+from src.utils.config import RAG_CONFIG
+from src.utils.logger import log_info, log_warning
+from src.ai.rag import doc_id
+
+#Inläsning av dokument (manualer, datablad) till RAG-indexet.
+#Filerna läses strömmande och delas i överlappande textbitar med ett begränsat
+#antal ordbitar (embedderns tokenizer); bitarna bäddas in och skrivs till indexet i
+#omgångar, och dokumentlagret skrivs till disk under tiden, så att minnet inte växer
+#med filens storlek (bara FAISS-indexet, en vektor per bit, ligger i minnet).
+
+_TOKEN = re.compile(r"\S+")
+
+#Max antal ord vars antal ordbitar cachas av token_counter
+_MAX_CACHED_WORDS = 200000
+
+
+def _iter_text_lines(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            yield line
+
+
+def _iter_pdf_lines(path):
+    """Läser text ur en PDF sida för sida (kräver pypdf)."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("PDF-inläsning kräver paketet 'pypdf' (pip install pypdf).")
+
+    for page in PdfReader(path).pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def iter_lines(path):
+    """Returnerar en generator över filens textrader beroende på filändelse."""
+    if path.lower().endswith(".pdf"):
+        return _iter_pdf_lines(path)
+    return _iter_text_lines(path)
+
+
+def _iter_tokens(lines):
+    """Ger (teckenposition, ord) för alla ord i radströmmen."""
+    offset = 0
+    for line in lines:
+        for match in _TOKEN.finditer(line):
+            yield offset + match.start(), match.group()
+        offset += len(line)
+
+
+def token_counter(embedder):
+    """
+    Returnerar en funktion som räknar ordbitar (tokenizer-tokens) per ord med embedderns
+    tokenizer, eller None om modellen saknar tokenizer. Antalen cachas per ord.
+    """
+    tokenizer = getattr(embedder, "tokenizer", None)
+    if tokenizer is None:
+        return None
+    counts = {}
+
+    def count(word):
+        n = counts.get(word)
+        if n is None:
+            n = max(1, len(tokenizer.tokenize(word)))
+            if len(counts) < _MAX_CACHED_WORDS:
+                counts[word] = n
+        return n
+
+    return count
+
+
+def max_chunk_tokens(embedder):
+    """RAG_CONFIG['chunk_tokens'], men aldrig mer än modellens maxlängd minus start- och sluttoken."""
+    limit = RAG_CONFIG["chunk_tokens"]
+    max_seq_length = getattr(embedder, "max_seq_length", None)
+    if max_seq_length:
+        limit = min(limit, max_seq_length - 2)
+    return limit
+
+
+def iter_chunks(lines, chunk_tokens=None, overlap=None, count_tokens=None):
+    """
+    Delar en radström i textbitar om högst chunk_tokens ordbitar, där varje bit delar
+    upp till overlap ordbitar med föregående. count_tokens(ord) ger antalet ordbitar per
+    ord (se token_counter); utan den räknas varje ord som en ordbit.
+    Ger (teckenposition för bitens första ord, text).
+    """
+    chunk_tokens = chunk_tokens or RAG_CONFIG["chunk_tokens"]
+    overlap = RAG_CONFIG["chunk_overlap"] if overlap is None else overlap
+    if not 0 <= overlap < chunk_tokens:
+        raise ValueError("chunk_overlap måste vara mindre än chunk_tokens.")
+    count_tokens = count_tokens or (lambda word: 1)
+
+    window = deque()  #(teckenposition, ord, antal ordbitar)
+    size = 0
+    unemitted = 0     #Ord i fönstret som inte kommit med i någon bit än
+    for offset, word in _iter_tokens(lines):
+        n = count_tokens(word)
+        if window and size + n > chunk_tokens:
+            yield window[0][0], " ".join(token[1] for token in window)
+            unemitted = 0
+            #Behåller slutet av biten som överlapp, så länge nästa ord får plats
+            while window and (size > overlap or size + n > chunk_tokens):
+                size -= window.popleft()[2]
+        #Ett enskilt ord längre än chunk_tokens blir en egen bit (och klipps av modellen)
+        window.append((offset, word, n))
+        size += n
+        unemitted += 1
+
+    if unemitted:
+        yield window[0][0], " ".join(token[1] for token in window)
+
+
+def iter_files(directory, extensions=None):
+    """Ger (källa relativt katalogen, full sökväg) för alla filer med rätt ändelse, i sorterad ordning."""
+    extensions = tuple(ext.lower() for ext in (extensions or RAG_CONFIG["ingest_extensions"]))
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory).replace(os.sep, "/"), path
+
+
+def ingest_file(rag, path, source=None, batch_size=None):
+    """
+    Läser in en fil till indexet. Bitar som redan finns bäddas inte in igen och bitar
+    från en tidigare version av samma fil (samma källa) släpps; en bit som också finns
+    i en annan fil behålls tills den filen inte heller har den. Bitarna mäts i
+    embedderns ordbitar, och dokumentlagret skrivs till disk var
+    RAG_CONFIG['ingest_flush_batches'] omgång så att texterna inte samlas i minnet.
+
+    Returns:
+        (antal bitar i filen, nya bitar, borttagna bitar)
+    """
+    rag.wait_until_ready()
+    source = source or os.path.basename(path)
+    batch_size = batch_size or RAG_CONFIG["encode_batch_size"]
+    flush_every = RAG_CONFIG["ingest_flush_batches"]
+    chunk_ids = set()
+    added = 0
+    batches = 0
+    texts, metadata = [], []
+
+    chunks = iter_chunks(iter_lines(path), max_chunk_tokens(rag.embedder), count_tokens=token_counter(rag.embedder))
+    for offset, text in chunks:
+        chunk_ids.add(doc_id(text))
+        texts.append(text)
+        metadata.append({"source": source, "offset": offset})
+        if len(texts) >= batch_size:
+            added += rag.add_documents(texts, metadata, save=False)
+            texts, metadata = [], []
+            batches += 1
+            if batches % flush_every == 0:
+                rag.flush_documents()
+    if texts:
+        added += rag.add_documents(texts, metadata, save=False)
+
+    stale = [key for key in rag.documents_from(source) if key not in chunk_ids]
+    removed = rag.delete_documents(ids=stale, save=False, source=source)
+    rag.save()
+    return len(chunk_ids), added, removed
+
+
+def ingest_directory(rag, directory, batch_size=None, prune=False):
+    """
+    Läser in alla text-, markdown- och PDF-filer i katalogen (rekursivt). Indexet sparas
+    efter varje fil. Med prune=True tas bitar från källor som inte längre finns i katalogen
+    bort (förutsätter att alla inlästa filer kommer från just den katalogen).
+
+    Returns:
+        dict med antal filer, bitar, nya, borttagna och misslyckade filer.
+    """
+    if not os.path.isdir(directory):
+        raise ValueError(f"Katalogen hittades inte: {directory}")
+    rag.wait_until_ready()
+
+    stats = {"filer": 0, "bitar": 0, "nya": 0, "borttagna": 0, "misslyckade": []}
+    sources = set()
+    for source, path in iter_files(directory):
+        sources.add(source)
+        try:
+            chunks, added, removed = ingest_file(rag, path, source, batch_size)
+        except (OSError, ValueError) as e:
+            log_warning(f"Kunde inte läsa in {source}: {e}")
+            stats["misslyckade"].append((source, str(e)))
+            continue
+        stats["filer"] += 1
+        stats["bitar"] += chunks
+        stats["nya"] += added
+        stats["borttagna"] += removed
+        log_info(f"Inläst {source}: {chunks} bitar ({added} nya, {removed} borttagna).")
+
+    if prune:
+        #Filer som har tagits bort ur katalogen sedan förra inläsningen; bitar som också
+        #finns i kvarvarande filer behålls
+        for source in rag.sources() - sources:
+            stats["borttagna"] += rag.delete_documents(ids=rag.documents_from(source), save=False, source=source)
+        rag.save()
+
+    log_info(f"Dokumentinläsning klar från {directory}: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    #Kör: python -m src.ai.ingest <katalog> [--prune]
+    import sys
+    from src.ai.rag import RAGChatbot
+
+    args = [arg for arg in sys.argv[1:] if arg != "--prune"]
+    if len(args) != 1:
+        print("Användning: python -m src.ai.ingest <katalog> [--prune]")
+        sys.exit(1)
+
+    result = ingest_directory(RAGChatbot(), args[0], prune="--prune" in sys.argv)
+    print(f"{result['filer']} filer, {result['bitar']} bitar ({result['nya']} nya, {result['borttagna']} borttagna).")
+    for source, reason in result["misslyckade"]:
+        print(f"Misslyckades: {source}: {reason}")
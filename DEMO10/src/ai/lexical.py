@@ -0,0 +1,111 @@
+import os
+import re
+import sqlite3
+
+from src.utils.logger import log_warning
+
+#Lexikal sökning (BM25) för RAG, som komplement till vektorsökningen. Artikelnummer
+#och exakta typbeteckningar (t.ex. 'HB-63A') hittas dåligt av MiniLM men direkt av
+#ett inverterat index. SQLite FTS5 ger BM25-rankning och ligger på disk, så minnet
+#växer inte med antalet dokument.
+
+#Ord enligt FTS5:s unicode61-tokenisering (bokstäver och siffror)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(question):
+    """
+    Gör en FTS5-fråga av fri text: varje ord blir en term, och en beteckning som
+    består av flera delar ('HB-63A', '3G1,5') blir en fras så att delarna måste stå
+    intill varandra. Termerna kombineras med OR; BM25 rankar dokument som har
+    flest och ovanligast termer högst.
+    """
+    terms = []
+    for raw in question.split():
+        words = _WORD.findall(raw.lower())
+        if words:
+            term = '"' + " ".join(words) + '"'
+            if term not in terms:
+                terms.append(term)
+    return " OR ".join(terms)
+
+
+def reciprocal_rank_fusion(result_lists, k=60):
+    """
+    Slår ihop rankade listor med dokument-ID (Reciprocal Rank Fusion): varje lista
+    ger 1 / (k + rang) per dokument. Returnerar [(ID, poäng)] med högst poäng först.
+    """
+    scores = {}
+    for results in result_lists:
+        for rank, key in enumerate(results, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """
+    BM25-index i en SQLite FTS5-tabell med dokument-ID som rowid. Klassen är inte
+    trådsäker på egen hand (RAGChatbot håller sitt lås runt alla anrop).
+    Om SQLite saknar FTS5 är indexet avstängt och search returnerar tomt.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.enabled = True
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(text, tokenize='unicode61 remove_diacritics 0')"
+            )
+            self._conn.commit()
+        except sqlite3.OperationalError as e:
+            log_warning(f"SQLite saknar FTS5 ({e}). Lexikal sökning avstängd.")
+            self.enabled = False
+
+    def add(self, items):
+        """Lägger till (ID, text)-par."""
+        if not self.enabled or not items:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO docs(rowid, text) VALUES (?, ?)", items)
+
+    def delete(self, keys):
+        if not self.enabled or not keys:
+            return
+        with self._conn:
+            self._conn.executemany("DELETE FROM docs WHERE rowid = ?", [(int(key),) for key in keys])
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._conn:
+            self._conn.execute("DELETE FROM docs")
+
+    def ids(self):
+        """Alla ID i indexet (för avstämning mot dokumentlagret)."""
+        if not self.enabled:
+            return set()
+        return {row[0] for row in self._conn.execute("SELECT rowid FROM docs")}
+
+    def count(self):
+        if not self.enabled:
+            return 0
+        return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def search(self, question, limit=20):
+        """Returnerar upp till limit dokument-ID, bäst BM25-träff först."""
+        query = build_match_query(question)
+        if not self.enabled or not query:
+            return []
+        try:
+            rows = self._conn.execute(
+                "SELECT rowid FROM docs WHERE docs MATCH ? ORDER BY rank LIMIT ?", (query, limit)
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            log_warning(f"Lexikal sökning misslyckades för '{question}': {e}")
+            return []
+        return [row[0] for row in rows]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from functools import lru_cache
+
+import httpx
+from dotenv import load_dotenv
+
+from src.utils.config import LLM_CONFIG
+from src.utils.logger import log_info, log_error, log_warning
+
+#Laddar miljövariabler (som din GEMINI_API_KEY)
+load_dotenv()
+
+#google.genai importeras först vid första användningen (tar en stund att ladda)
+
+#HTTP-statuskoder som är värda ett nytt försök
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returnerar processens enda Gemini-klient (skapas vid första anropet).
+    Klienten återanvänds av alla anrop så att HTTP-anslutningen hålls vid liv
+    (keep-alive) i stället för en ny TLS-handskakning per meddelande.
+    Returnerar None om klienten inte kan initieras (t.ex. saknad API-nyckel).
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            try:
+                from google import genai
+                _client = genai.Client(
+                    http_options=genai.types.HttpOptions(timeout=LLM_CONFIG["timeout_ms"])
+                )
+                log_info("Gemini API-klient initierad.")
+            except Exception as e:
+                log_error(f"Kunde inte initiera Gemini Client: {e}")
+                return None
+    return _client
+
+
+def _is_retryable(error):
+    from google.genai.errors import APIError
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def generate(contents, config, model=None):
+    """
+    Anropar generate_content med den delade klienten. Tillfälliga fel (429/5xx,
+    timeout, nätverk) försöks igen med exponentiell backoff; övriga fel kastas direkt.
+    """
+    from google.genai.errors import APIError
+
+    client = get_client()
+    if client is None:
+        raise RuntimeError("LLM-klient ej tillgänglig")
+
+    retries = LLM_CONFIG["max_retries"]
+    delay = LLM_CONFIG["backoff_seconds"]
+    for attempt in range(retries + 1):
+        try:
+            return client.models.generate_content(
+                model=model or LLM_CONFIG["model"],
+                contents=contents,
+                config=config,
+            )
+        except (APIError, httpx.TransportError) as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            wait = delay * (2 ** attempt) * (1 + random.random() * 0.25)
+            log_warning(f"Tillfälligt LLM-fel ({e}). Nytt försök {attempt + 1}/{retries} om {wait:.1f} s.")
+            time.sleep(wait)
+
+
+def generate_stream(contents, config, model=None):
+    """
+    Som generate, men med generate_content_stream: ger svarstexten bit för bit
+    när den genereras. Nya försök görs bara innan första biten har kommit; ett fel
+    mitt i ett svar kastas vidare (texten som redan visats kan inte tas tillbaka).
+    """
+    from google.genai.errors import APIError
+
+    client = get_client()
+    if client is None:
+        raise RuntimeError("LLM-klient ej tillgänglig")
+
+    retries = LLM_CONFIG["max_retries"]
+    delay = LLM_CONFIG["backoff_seconds"]
+    for attempt in range(retries + 1):
+        started = False
+        try:
+            for chunk in client.models.generate_content_stream(
+                model=model or LLM_CONFIG["model"],
+                contents=contents,
+                config=config,
+            ):
+                if chunk.text:
+                    started = True
+                    yield chunk.text
+            return
+        except (APIError, httpx.TransportError) as e:
+            if started or attempt == retries or not _is_retryable(e):
+                raise
+            wait = delay * (2 ** attempt) * (1 + random.random() * 0.25)
+            log_warning(f"Tillfälligt LLM-fel ({e}). Nytt försök {attempt + 1}/{retries} om {wait:.1f} s.")
+            time.sleep(wait)
+
+
+#Systemprompt för kommandotolkning ({role} fylls i per roll)
+INTERPRETATION_PROMPT = (
+    "Du är Lagerbot, en tolk för en lagerhanteringsassistent. Din uppgift är att konvertera "
+    "användarens naturliga språk till ett strukturerat JSON-kommando. "
+    "Du får INTE svara med text, endast JSON.\n\n"
+    "Tillgängliga roller: 'user' (kan söka) och 'admin' (kan söka och uppdatera/se lågt saldo/prognos). "
+    "Användarens nuvarande roll är: {role}\n\n"
+    "Tillgängliga åtgärder (action) och deras argument (args):\n"
+    "1. saldo: Hämta lagersaldo. Kräver ett sökord för produkten i args[0].\n"
+    "2. uppdatera: Uppdatera lagersaldo. Kräver 'admin' roll. Kräver produktnamn i args[0] och nytt saldo (tal) i args[1].\n"
+    "3. lågtsaldo: Lista produkter med lågt saldo (≤10). Kräver 'admin' roll. Kräver inga args.\n"
+    "4. historik: Hämta historiska saldon. Kräver ett sökord för produkten i args[0].\n"
+    "5. prognos: Förutsäga försäljning/uttag för nästa vecka. Kräver 'admin' roll. Kräver ett sökord för produkten i args[0].\n"
+    "6. läggtill: Lägger till en ny produkt. Kräver 'admin' roll. Kräver produktnamn i args[0], initialt saldo (tal) i args[1], plats/hylla i args[2], specifikationer/beskrivning i args[3], och artikelnummer i args[4].\n"
+    "7. topplista: Hämta topplistan över mest förbrukade produkter. Kräver 'admin' roll. Kräver inga args.\n"
+    "8. flyttaplats: Ändrar lagringsplats. Kräver 'admin' roll. Kräver produktnamn i args[0] och ny plats/hylla i args[1].\n"
+    "9. tabort: Tar bort en produkt permanent från lagret. Kräver 'admin' roll. Kräver produktnamn i args[0].\n"
+    "10. bytnamn: Ändrar namnet på en produkt. Kräver 'admin' roll. Kräver gammalt produktnamn i args[0] och nytt produktnamn i args[1].\n"
+    "11. rag: Fråga kunskapsdatabasen. Används om frågan inte matchar något av ovanstående kommandon (t.ex. 'Vad är en Dimmerspärr?'). Kräver hela frågan som args[0].\n"
+    "12. okänd: Om frågan inte kan tolkas som någon av de andra åtgärderna.\n\n"
+    "Returnera ALLTID en JSON med strukturen: {{ \"action\": <action>, \"args\": [<arg1>, <arg2>, ...] }}"
+)
+
+INTERPRETATION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "action": {"type": "STRING", "description": "Det identifierade kommandot."},
+        "args": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "Argument till kommandot."},
+    },
+    "required": ["action", "args"]
+}
+
+
+@lru_cache(maxsize=None)
+def interpretation_config(role):
+    """Färdigbyggd konfiguration för kommandotolkning, en per roll."""
+    from google import genai
+    return genai.types.GenerateContentConfig(
+        system_instruction=INTERPRETATION_PROMPT.format(role=role),
+        response_mime_type="application/json",
+        response_schema=INTERPRETATION_SCHEMA,
+        temperature=0.0
+    )
+
+
+@lru_cache(maxsize=None)
+def rag_config():
+    """Färdigbyggd konfiguration för svarsgenerering i RAG."""
+    from google import genai
+    return genai.types.GenerateContentConfig(temperature=0.1)
@@ -0,0 +1,153 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.ai import forecast
+from src.database.db import (
+    PROJECTION_TIME_FORMAT,
+    get_daily_consumption,
+    get_projection_state,
+    get_products_with_new_history,
+    save_projections,
+)
+from src.utils.config import FORECAST_CONFIG
+from src.utils.logger import log_info, log_error
+
+#Förberäknade prognoser i tabellen Prognos. Ett bakgrundsjobb kontrollerar med jämna
+#mellanrum om ny historik har skrivits och räknar då om bara de produkterna; en gång
+#per dygn räknas alla om (förbrukningsfönstret flyttas även utan ny historik).
+#Adminkommandona läser tabellen i stället för att anpassa modeller i chattanropet.
+
+
+def compute_projections(product_ids=None):
+    """
+    Räknar prognos, dagar tills saldot tar slut och föreslagen beställning för
+    product_ids (alla produkter om None).
+
+    Returns:
+        Rader för save_projections: (ProduktID, förbrukning per dag, prognos för
+        horisonten, dagar tills saldot tar slut eller None, beställning, metod).
+    """
+    days = FORECAST_CONFIG["history_days"]
+    horizon = FORECAST_CONFIG["horizon_days"]
+    ids, _, stocks, matrix = forecast.consumption_matrix(get_daily_consumption(days, product_ids), days)
+    if not len(ids):
+        return []
+
+    predicted, methods = forecast.forecast_matrix(matrix, horizon)
+    daily = predicted / horizon
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(daily > 0, np.maximum(stocks, 0) / daily, np.nan)
+    #Beställ så att saldot räcker leveranstiden plus täckningsperioden
+    cover = FORECAST_CONFIG["reorder_lead_days"] + FORECAST_CONFIG["reorder_cover_days"]
+    reorder = np.ceil(np.maximum(daily * cover - stocks, 0)).astype("int64")
+
+    return [
+        (
+            int(ids[i]),
+            float(daily[i]),
+            float(predicted[i]),
+            None if np.isnan(days_left[i]) else float(days_left[i]),
+            int(reorder[i]),
+            str(methods[i]),
+        )
+        for i in range(len(ids))
+    ]
+
+
+def parse_timestamp(value):
+    """Tidsstämpel från prognostabellerna (UTC) som datetime med tidszon."""
+    return datetime.strptime(value, PROJECTION_TIME_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def is_stale(computed_at, now=None):
+    """
+    True om en prognos beräknad vid computed_at är äldre än intervallet för fullständig
+    omräkning (plus ett pollintervall): då har jobbet inte hunnit, eller inte kunnat, räkna om den.
+    """
+    now = now or datetime.now(timezone.utc)
+    max_age = timedelta(hours=FORECAST_CONFIG["projection_full_refresh_hours"],
+                        seconds=FORECAST_CONFIG["projection_poll_seconds"])
+    return now - parse_timestamp(computed_at) > max_age
+
+
+def _full_refresh_due(state, now):
+    if state["last_full_refresh"] is None:
+        return True
+    return now - parse_timestamp(state["last_full_refresh"]) > timedelta(hours=FORECAST_CONFIG["projection_full_refresh_hours"])
+
+
+def refresh(full=False):
+    """
+    Uppdaterar tabellen Prognos för produkter med ny historik sedan förra körningen,
+    eller för alla produkter om full=True eller om en daglig omräkning är på tur.
+    Returnerar antalet produkter som räknades om.
+    """
+    now = datetime.now(timezone.utc)
+    state = get_projection_state()
+    #Historikmarkeringen läses före förbrukningen: rader som skrivs under körningen tas nästa gång
+    latest = state["max_history_id"]
+    full = full or _full_refresh_due(state, now)
+
+    if full:
+        product_ids = None
+    elif latest > state["last_history_id"]:
+        product_ids = get_products_with_new_history(state["last_history_id"], latest)
+    else:
+        return 0
+
+    started = time.perf_counter()
+    rows = compute_projections(product_ids)
+    save_projections(rows, latest, now.strftime(PROJECTION_TIME_FORMAT), full_refresh=full)
+    log_info(
+        f"Prognostabellen uppdaterad ({'alla' if full else 'ändrade'} produkter): "
+        f"{len(rows)} st på {time.perf_counter() - started:.2f} s."
+    )
+    return len(rows)
+
+
+class ProjectionJob:
+    """Bakgrundstråd som kör refresh() var FORECAST_CONFIG['projection_poll_seconds'] sekund."""
+
+    def __init__(self, interval=None):
+        self.interval = interval or FORECAST_CONFIG["projection_poll_seconds"]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prognosjobb", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                refresh()
+            except Exception as e:
+                log_error(f"Prognosjobbet misslyckades: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def start_job():
+    """Startar processens prognosjobb (en gång)."""
+    global _job
+    with _job_lock:
+        if _job is None:
+            _job = ProjectionJob().start()
+        return _job
+
+
+if __name__ == "__main__":
+    #Kör: python -m src.ai.projections  (räknar om alla produkter en gång)
+    print(f"{refresh(full=True)} produkter uppdaterade.")
@@ -1,68 +1,519 @@
 import os
-import faiss
+import hashlib
+import json
+import threading
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from src.utils.config import RAG_CONFIG 
+from src.utils.config import RAG_CONFIG, CACHE_CONFIG
 import sys 
-from google import genai
-from google.genai.errors import APIError
+from src.ai import embedding, llm, vector_index, warmup
+from src.ai.docstore import DocumentStore
+from src.ai.lexical import LexicalIndex, reciprocal_rank_fusion
+from src.ai.batching import MicroBatcher
+from src.utils.cache import TTLCache, normalize_text, resolve_cache_path
+from src.utils.logger import log_info, log_warning
 
-#För att hantera API-nyckel säkert från miljövariabel
-from dotenv import load_dotenv 
+#faiss och sentence_transformers (torch) importeras först i uppvärmningen
+RAG_WARMUP = "rag"
+
+#Källnamnet för rader i docs.txt (en rad = ett dokument)
+DOCS_SOURCE = "docs.txt"
+
+
+def doc_id(text):
+    """Stabilt 63-bitars ID från dokumentets innehåll (samma text ger samma ID)."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
 
-#Laddar miljövariabler (som din GEMINI_API_KEY)
-load_dotenv()
 
 class RAGChatbot:
     def __init__(self):
         """
-        Initierar SentenceTransformer för embeddings och Gemini-klienten.
+        Förbereder sökvägar. Embeddern och indexet laddas i bakgrunden via start_warmup()
+        (eller vid första frågan), så att konstruktorn returnerar direkt.
         """
         
-        model_name = RAG_CONFIG["embedding_model"]
+        self.model_name = RAG_CONFIG["embedding_model"]
         
         if getattr(sys, 'frozen', False):
             base_dir = sys._MEIPASS
             
             self.index_path = os.path.join(base_dir, RAG_CONFIG["index_path"])
             self.docs_path = os.path.join(base_dir, RAG_CONFIG["docs_path"])
+            self.store_path = os.path.join(base_dir, RAG_CONFIG["store_path"])
+            self.lexical_path = os.path.join(base_dir, RAG_CONFIG["lexical_path"])
         else:
             self.index_path = RAG_CONFIG["index_path"]
             self.docs_path = RAG_CONFIG["docs_path"]
+            self.store_path = RAG_CONFIG["store_path"]
+            self.lexical_path = RAG_CONFIG["lexical_path"]
         
-        try:
-            self.client = genai.Client()
-            self.llm_model = 'gemini-2.5-flash'
-            print("INFO: Gemini API-klient initierad.")
-        except Exception as e:
-            self.client = None
-            print(f"VARNING: Kunde inte initiera Gemini Client (fel: {e}). Svar genereras lokalt.")
-
-        self.embedder = SentenceTransformer(model_name)
-        
+        self._embedder = None
+        self.embedding_backend = None
         self.index = None
-        self.docs = [] 
-    
-    def build_index(self, texts):
-        Path(os.path.dirname(self.index_path)).mkdir(exist_ok=True, parents=True)
-
-        embeddings = self.embedder.encode(texts, convert_to_numpy=True)
-        d = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(d)
-        self.index.add(embeddings)
-        self.docs = texts
-        faiss.write_index(self.index, self.index_path)
-        with open(self.docs_path, "w", encoding="utf-8") as f:
-            for t in texts:
-                f.write(t + "\n")
+        self.index_type = None
+        #Texter och metadata i ett minnesmappat lager (bara träffarna avkodas)
+        self.store = DocumentStore(self.store_path)
+        #BM25-index över samma dokument (öppnas i uppvärmningen)
+        self.lexical = None
+        #ID:n som finns i indexet men inte i lagret (HNSW kan inte ta bort vektorer)
+        self._tombstones = set()
+        #True när ett IVF-index är minnesmappat (skrivskyddat) och måste läsas in innan det ändras
+        self._index_mapped = False
+        self._index_dirty = False
+        #Ökas vid varje ändring av indexet; ingår i svarscachens nycklar
+        self.index_version = 0
+        self._lock = threading.RLock()
+        #Frågevektorer per normaliserad fråga (LRU i minnet)
+        self._query_cache = TTLCache(max_size=RAG_CONFIG["query_cache_size"])
+        #Samtidiga sökningar slås ihop till ett encode- och ett index.search-anrop
+        self._batcher = MicroBatcher(self._search_batch, RAG_CONFIG["batch_max_size"],
+                                     RAG_CONFIG["batch_max_wait_ms"], name="rag-sökning")
+        #Genererade svar per (indexversion, träffar, normaliserad fråga), sparas på disk
+        self._answers = TTLCache(
+            max_size=CACHE_CONFIG["answer_max_entries"],
+            ttl_seconds=CACHE_CONFIG["answer_ttl_seconds"],
+            path=resolve_cache_path(CACHE_CONFIG["answer_path"]),
+        )
+
+    @property
+    def client(self):
+        #Delad Gemini-klient (samma som kommandotolkningen använder)
+        return llm.get_client()
+
+    @property
+    def embedder(self):
+        """SentenceTransformer-modellen, eller None innan uppvärmningen är klar."""
+        return self._embedder
+
+    def start_warmup(self):
+        """Startar laddning av embedder och index i bakgrunden. Returnerar en Future."""
+        return warmup.submit(RAG_WARMUP, self._warm_up)
+
+    def wait_until_ready(self):
+        """Blockerar tills embedder och index är laddade (kastar uppvärmningens fel)."""
+        warmup.wait(RAG_WARMUP, self._warm_up)
+
+    def _warm_up(self):
+        if self.client is None:
+            log_warning("Kunde inte initiera Gemini Client. Svar genereras lokalt.")
+
+        #int8/onnx kontrolleras mot torch på ett urval av de egna dokumenten innan de används;
+        #resultatet sparas bredvid indexets metadata och gäller tills lagret ändras
+        sample = self._sample_documents(RAG_CONFIG["embedding_check_docs"]) if RAG_CONFIG["embedding_backend"] != "torch" else None
+        self._embedder, self.embedding_backend = embedding.load_embedder(
+            self.model_name, sample_docs=sample, check_path=self.index_path + ".check.json",
+            store_version=self._read_index_meta().get("version", 0),
+        )
+        self._open_lexical()
+        if os.path.exists(self.index_path) and DocumentStore.exists(self.store_path):
+            self.load_index()
+        elif len(self.store):
+            #Indexfilen saknas men lagret finns: vektorerna byggs om från texterna
+            with self._lock:
+                keys = self.store.ids().tolist()
+                self._add_vectors(keys, [self.store.get(key) for key in keys])
+                self.save()
+        if os.path.exists(self.docs_path):
+            #docs.txt är en källa bland andra: nya rader läggs till, borttagna rader tas bort
+            self.sync_documents(self._read_docs_file(), source=DOCS_SOURCE)
+        log_info(f"RAG redo: {len(self.store)} dokument i indexet.")
+
+    def _sample_documents(self, n):
+        """Slumpvis urval om högst n dokument ur lagret (eller docs.txt om lagret är tomt)."""
+        if len(self.store):
+            keys = self.store.ids()
+            picked = np.random.default_rng(0).choice(len(keys), min(n, len(keys)), replace=False)
+            return [self.store.get(keys[i]) for i in picked]
+        if os.path.exists(self.docs_path):
+            return self._read_docs_file()[:n]
+        return []
+
+    def _open_lexical(self):
+        """Öppnar BM25-indexet och stämmer av det mot dokumentlagret."""
+        with self._lock:
+            if self.lexical is None:
+                self.lexical = LexicalIndex(self.lexical_path)
+            if not self.lexical.enabled:
+                return
+            #Antalen skiljer sig bara om ett tidigare program avbröts mitt i en ändring
+            if self.lexical.count() == len(self.store):
+                return
+            store_ids = set(self.store.ids().tolist())
+            lexical_ids = self.lexical.ids()
+            self.lexical.delete(lexical_ids - store_ids)
+            missing = store_ids - lexical_ids
+            self.lexical.add([(key, self.store.get(key)) for key in missing])
+            log_info(f"BM25-index avstämt: {len(missing)} dokument tillagda.")
+
+    def _read_docs_file(self):
+        with open(self.docs_path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def _encode(self, texts):
+        embeddings = self.embedder.encode(texts, batch_size=RAG_CONFIG["encode_batch_size"], convert_to_numpy=True)
+        return np.ascontiguousarray(embeddings, dtype="float32")
+
+    def build_index(self, texts, index_type=None, source=None):
+        """
+        Bygger om hela indexet och dokumentlagret från texts och sparar dem. Indextypen
+        (flat, ivf_flat, ivf_pq, hnsw) väljs via RAG_CONFIG['index_type'], som standard
+        efter antal dokument. Använd add_documents/delete_documents/sync_documents för
+        mindre ändringar.
+        """
+        docs = {doc_id(text.strip()): text.strip() for text in texts if text.strip()}
+        if not docs:
+            raise ValueError("Inga dokument att bygga indexet av.")
+        ids = np.fromiter(docs.keys(), dtype="int64", count=len(docs))
+        embeddings = self._encode(list(docs.values()))
+
+        with self._lock:
+            self.index, self.index_type = vector_index.create_index(embeddings, index_type, ids=ids)
+            self._index_mapped = False
+            #Versionen fortsätter från det gamla indexet så att gamla cachade svar aldrig matchar
+            if os.path.exists(self.index_path + ".json"):
+                self.index_version = max(self.index_version, self._read_index_meta().get("version", 0))
+            self._mark_dirty()
+            self.store.clear()
+            for key, text in docs.items():
+                self.store.add(key, text, source)
+            if self.lexical is not None:
+                self.lexical.clear()
+                self.lexical.add(list(docs.items()))
+            self._tombstones = set()
+            self.save()
 
     def load_index(self):
+        """
+        Läser indexet (IVF minnesmappat om RAG_CONFIG['index_mmap']) och stämmer av det mot
+        dokumentlagret: dokument som saknar vektor bäddas in, vektorer utan dokument tas bort.
+        """
         if not os.path.exists(self.index_path):
             raise FileNotFoundError(f"Inget FAISS-index hittades på sökväg: {self.index_path}. Kör build_index först.")
-        self.index = faiss.read_index(self.index_path)
-        with open(self.docs_path, "r", encoding="utf-8") as f:
-            self.docs = [line.strip() for line in f.readlines()]
+
+        index, mapped = vector_index.read_index(self.index_path)
+        if not vector_index.has_ids(index):
+            #Index från en äldre version (positioner i stället för innehålls-ID): bygg om
+            log_info("FAISS-indexet saknar ID-mappning. Bygger om från dokumenten.")
+            self.index = None
+            self.store.clear()
+            self.store.save()
+            if os.path.exists(self.docs_path):
+                self.build_index(self._read_docs_file(), source=DOCS_SOURCE)
+            return
+
+        with self._lock:
+            self.index = index
+            self.index_type = vector_index.describe_index(index)
+            self._index_mapped = mapped
+            self._index_dirty = False
+            meta = self._read_index_meta()
+            self.index_version = meta.get("version", 0)
+            vector_index.set_search_params(self.index)
+
+            index_ids = vector_index.index_ids(index)
+            store_ids = self.store.ids()
+            orphans = index_ids[~np.isin(index_ids, store_ids)]
+            missing = store_ids[~np.isin(store_ids, index_ids)]
+            self._tombstones = set(orphans.tolist())
+
+            #Skillnader uppstår bara om ett tidigare program avbröts mellan lagret och indexet
+            if len(missing):
+                keys = [int(key) for key in missing]
+                self._add_vectors(keys, [self.store.get(key) for key in keys])
+            if len(orphans):
+                self._remove_vectors(orphans.tolist())
+
+            #Vektorer från en annan modell eller backend går inte att jämföra med nya frågor
+            stored = {"model": meta["model"], "backend": meta["backend"]}
+            if self._embedder is not None and stored != self._signature():
+                log_info(f"Indexet byggdes med {stored}, nu används {self._signature()}. Bäddar in dokumenten igen.")
+                self.compact(reembed=True)
+            #Index från en tidigare version kan ha fastnat i typen för sin första omgång
+            self._grow_index()
+            if self._index_dirty:
+                self.save()
+
+    def _signature(self):
+        """Modell och backend som indexets vektorer kommer från."""
+        return {"model": self.model_name, "backend": self.embedding_backend}
+
+    def _read_index_meta(self):
+        #Index utan metadatafil byggdes med torch i full precision
+        path = self.index_path + ".json"
+        if not os.path.exists(path):
+            return {"model": self.model_name, "backend": "torch", "version": 0}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _mark_dirty(self):
+        """Indexet har ändrats: ska sparas, och cachade svar gäller inte längre."""
+        self._index_dirty = True
+        self.index_version += 1
+
+    def _make_writable(self):
+        """Läser in ett minnesmappat index i minnet innan det ändras."""
+        import faiss
+
+        if self._index_mapped:
+            self.index = faiss.read_index(self.index_path)
+            vector_index.set_search_params(self.index)
+            self._index_mapped = False
+
+    def _add_vectors(self, keys, texts):
+        """Bäddar in texts och lägger till vektorerna under keys (skapar indexet vid behov)."""
+        embeddings = self._encode(texts)
+        ids = np.array(keys, dtype="int64")
+        if self.index is None:
+            self.index, self.index_type = vector_index.create_index(embeddings, ids=ids)
+        else:
+            self._make_writable()
+            self.index.add_with_ids(embeddings, ids)
+        self._mark_dirty()
+
+    def _grow_index(self):
+        """
+        Bygger om indexet med en annan typ när det har vuxit förbi en gräns (se
+        vector_index.rebuild_type). Anropas efter tillägg, när lagret har alla nya dokument.
+        """
+        index_type = vector_index.rebuild_type(self.index)
+        if index_type is not None:
+            log_info(f"RAG-indexet har {self.index.ntotal} vektorer: byggs om som {index_type}.")
+            self.compact(index_type)
+
+    def add_documents(self, texts, metadata=None, save=True):
+        """
+        Lägger till dokument. Bara texter som inte redan finns (jämförs via innehållshash)
+        bäddas in. metadata är en valfri lista (samma ordning som texts) med dicts som
+        {"source": ..., "offset": ...}. En text som redan finns från en annan källa får
+        källan som referens (se DocumentStore.add_source). Med save=False sparas inget
+        förrän save() anropas. Returnerar antal nya dokument.
+        """
+        with self._lock:
+            new_docs = {}
+            shared = []
+            for position, text in enumerate(texts):
+                text = text.strip()
+                if not text:
+                    continue
+                key = doc_id(text)
+                meta = metadata[position] if metadata is not None else {}
+                if key in self.store or key in new_docs:
+                    shared.append((key, meta))
+                else:
+                    new_docs[key] = (text, meta)
+            if not new_docs:
+                for key, meta in shared:
+                    self.store.add_source(key, meta.get("source"), meta.get("offset", -1))
+                if save:
+                    self.store.save()
+                return 0
+
+            #Tidigare borttagna (tombstone) dokument återanvänder sin befintliga vektor
+            revived = {key for key in new_docs if key in self._tombstones}
+            self._tombstones -= revived
+            to_embed = [key for key in new_docs if key not in revived]
+            if to_embed:
+                self._add_vectors(to_embed, [new_docs[key][0] for key in to_embed])
+            for key, (text, meta) in new_docs.items():
+                self.store.add(key, text, meta.get("source"), meta.get("offset", -1))
+            for key, meta in shared:
+                self.store.add_source(key, meta.get("source"), meta.get("offset", -1))
+            if self.lexical is not None:
+                self.lexical.add([(key, text) for key, (text, _) in new_docs.items()])
+            self._grow_index()
+            if save:
+                self.save()
+        log_info(f"RAG: {len(new_docs)} dokument tillagda ({len(to_embed)} nya inbäddningar).")
+        return len(new_docs)
+
+    def delete_documents(self, texts=None, ids=None, save=True, source=None):
+        """
+        Tar bort dokument (via text eller ID) ur indexet. Med source släpps bara källans
+        referens: ett dokument som också finns i andra källor tas inte bort förrän den
+        sista källan släpper det. Returnerar antal borttagna dokument.
+        """
+        keys = {doc_id(text.strip()) for text in texts or []} | {int(key) for key in ids or []}
+        with self._lock:
+            keys = [key for key in keys if key in self.store]
+            if source is not None:
+                keys = [key for key in keys if self.store.drop_source(key, source)]
+            if not keys:
+                if save:
+                    self.store.save()
+                return 0
+            for key in keys:
+                self.store.delete(key)
+            if self.lexical is not None:
+                self.lexical.delete(keys)
+            self._remove_vectors(keys)
+            if save:
+                self.save()
+        log_info(f"RAG: {len(keys)} dokument borttagna.")
+        return len(keys)
+
+    def documents_from(self, source):
+        """ID för alla dokument som lästs in från källan (filen) source."""
+        with self._lock:
+            return self.store.ids_from(source)
+
+    def sources(self):
+        """Alla källor (filer) som har dokument i indexet."""
+        with self._lock:
+            return self.store.sources()
+
+    def sync_documents(self, texts, source=None):
+        """
+        Gör källans dokument (alla dokument om source är None) likadana som texts:
+        nya/ändrade texter bäddas in, texter som inte längre finns tas bort och
+        oförändrade rörs inte. Returnerar (tillagda, borttagna).
+        """
+        texts = [text.strip() for text in texts if text.strip()]
+        wanted = {doc_id(text) for text in texts}
+        with self._lock:
+            #Läggs till först så att vektorer som redan finns i indexet kan återanvändas
+            added = self.add_documents(texts, [{"source": source}] * len(texts), save=False)
+            current = self.store.ids_from(source) if source is not None else self.store.ids().tolist()
+            removed = self.delete_documents(ids=[key for key in current if key not in wanted],
+                                            save=False, source=source)
+            self.save()
+        return added, removed
+
+    def _remove_vectors(self, keys):
+        """
+        Tar bort vektorer ur indexet. HNSW stöder inte borttagning; där markeras de
+        som tombstones och filtreras bort vid sökning tills indexet komprimeras.
+        """
+        self._make_writable()
+        self._mark_dirty()
+        try:
+            self.index.remove_ids(np.array(keys, dtype="int64"))
+            self._tombstones.difference_update(keys)
+        except RuntimeError:
+            self._tombstones.update(keys)
+            if len(self._tombstones) > RAG_CONFIG["max_tombstone_ratio"] * self.index.ntotal:
+                self.compact()
+
+    def compact(self, index_type=None, reembed=False):
+        """
+        Bygger om indexet utan tombstones, med de sparade vektorerna när indextypen
+        tillåter det (annars bäddas texterna in igen). Med index_type byts indextyp och
+        med reembed=True bäddas alla texter in igen (t.ex. efter byte av backend).
+        """
+        import faiss
+
+        with self._lock:
+            keys = self.store.ids()
+            if not len(keys):
+                self._make_writable()
+                self.index.reset()
+                self._tombstones = set()
+                self._mark_dirty()
+                return
+            try:
+                if reembed:
+                    raise RuntimeError("ny inbäddning begärd")
+                if self.index_type == "ivf_flat":
+                    #IVF-Flat lagrar vektorerna exakt; med en direktkarta (hashtabell, ID:n är
+                    #innehållshashar) kan de läsas ut igen utan ny inbäddning
+                    faiss.extract_index_ivf(self.index).set_direct_map_type(faiss.DirectMap.Hashtable)
+                embeddings = np.vstack([self.index.reconstruct(int(key)) for key in keys])
+            except RuntimeError:
+                #IVF-PQ lagrar bara komprimerade koder (och reembed kräver nya vektorer): bädda in igen
+                batch = RAG_CONFIG["encode_batch_size"] * 16
+                embeddings = np.vstack([
+                    self._encode([self.store.get(key) for key in keys[start:start + batch]])
+                    for start in range(0, len(keys), batch)
+                ])
+            self.index, self.index_type = vector_index.create_index(
+                embeddings, index_type or self.index_type, ids=keys)
+            self._index_mapped = False
+            self._mark_dirty()
+            self._tombstones = set()
+        log_info(f"RAG-index komprimerat till {len(keys)} vektorer.")
+
+    def flush_documents(self):
+        """
+        Skriver väntande dokument till dokumentlagret på disk, utan att spara indexet.
+        Används vid stora inläsningar för att hålla minnet konstant; save() sparar indexet.
+        """
+        with self._lock:
+            self.store.save()
+
+    def save(self):
+        """
+        Sparar dokumentlagret och, om det har ändrats, indexet (temporär fil + os.replace).
+        Lagret skrivs först; vid ett avbrott däremellan stämmer load_index av skillnaden.
+        """
+        import faiss
+
+        with self._lock:
+            self.store.save()
+            if self.index is None or not self._index_dirty:
+                return
+            Path(os.path.dirname(self.index_path) or ".").mkdir(exist_ok=True, parents=True)
+            faiss.write_index(self.index, self.index_path + ".tmp")
+            os.replace(self.index_path + ".tmp", self.index_path)
+            if self.embedding_backend is not None:
+                with open(self.index_path + ".json.tmp", "w", encoding="utf-8") as f:
+                    json.dump(dict(self._signature(), version=self.index_version), f)
+                os.replace(self.index_path + ".json.tmp", self.index_path + ".json")
+            self._index_dirty = False
+
+    def _encode_queries(self, questions):
+        """Frågevektorer som matris; bara frågor som inte finns i cachen bäddas in (i ett anrop)."""
+        keys = [normalize_text(question) or question for question in questions]
+        vectors = {}
+        for key in keys:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+        missing = list(dict.fromkeys(key for key in keys if key not in vectors))
+        if missing:
+            for key, vector in zip(missing, self._encode(missing)):
+                self._query_cache.set(key, vector)
+                vectors[key] = vector
+        return np.vstack([vectors[key] for key in keys])
+
+    def search(self, question, top_k=3):
+        """
+        Returnerar de top_k bästa dokumenten som lista av (dokument-ID, text, poäng).
+        Med RAG_CONFIG['hybrid'] slås vektorträffar och BM25-träffar ihop med
+        Reciprocal Rank Fusion (poäng = RRF), annars är poängen L2-avståndet.
+        Sökningar från flera trådar samtidigt körs som en omgång (se MicroBatcher).
+        """
+        if RAG_CONFIG["batch_max_wait_ms"] > 0:
+            return self._batcher((question, top_k))
+        return self._search_batch([(question, top_k)])[0]
+
+    def _search_batch(self, requests):
+        """Söker för flera (fråga, top_k) med ett encode-anrop och ett index.search över alla frågor."""
+        q_emb = self._encode_queries([question for question, _ in requests])
+        hybrid = RAG_CONFIG["hybrid"] and self.lexical is not None and self.lexical.enabled
+        top = max(top_k for _, top_k in requests)
+        candidates = max(top, RAG_CONFIG["hybrid_candidates"]) if hybrid else top
+
+        with self._lock:
+            if self.index is None or not len(self.store):
+                return [[] for _ in requests]
+            #Hämtar fler kandidater när tombstones kan finnas bland träffarna
+            k = min(candidates + len(self._tombstones), self.index.ntotal)
+            D, I = self.index.search(q_emb, k=k)
+
+            results = []
+            for (question, top_k), distances, found in zip(requests, D, I):
+                #Approximativa index returnerar -1 när färre än k träffar hittas
+                dense = [(int(key), float(dist)) for dist, key in zip(distances, found) if key >= 0]
+                dense = [(key, dist) for key, dist in dense if key in self.store][:candidates]
+
+                if hybrid:
+                    lexical = self.lexical.search(question, candidates)
+                    ranked = reciprocal_rank_fusion([[key for key, _ in dense], lexical], RAG_CONFIG["rrf_k"])
+                else:
+                    ranked = dense
+                #Bara de returnerade dokumentens texter avkodas ur lagret
+                results.append([(key, self.store.get(key), score) for key, score in ranked[:top_k]])
+            return results
 
     def _generate_response_dummy(self, prompt):
         """
@@ -75,16 +526,20 @@ class RAGChatbot:
         return "Jag kan svara baserat på kontexten, men just nu har jag ingen aktiv språkmodell (LLM) ansluten."
 
 
-    def query(self, question, top_k=3):
+    def _retrieve(self, question, top_k):
         """
-        Hämtar relevanta textbitar (R) och genererar svar (G) via Gemini API.
+        Hämtar textbitarna (R) och bygger prompten för svarsgenereringen (G).
+
+        Returns:
+            (prompt, hits, nyckel i svarscachen)
         """
+        self.wait_until_ready()
         if self.index is None:
             raise ValueError("Index är inte laddat. Kör build_index() eller load_index().")
 
-        q_emb = self.embedder.encode([question], convert_to_numpy=True)
-        D, I = self.index.search(np.array(q_emb), k=top_k)
-        hits = [self.docs[i] for i in I[0]]
+        results = self.search(question, top_k)
+        hits = [text for _, text, _ in results]
+        key = f"{self.index_version}|{','.join(str(key) for key, _, _ in results)}|{normalize_text(question)}"
 
         context = "\n".join(hits)
         prompt = (
@@ -93,15 +548,34 @@ class RAGChatbot:
             "Om informationen inte är tillgänglig, svara att du inte vet och hänvisa till att du sökte i dokumentationen."
             f"\n\nRelevant information:\n{context}\n\nFråga: {question}\n\nSvar:"
         )
+        return prompt, hits, key
+
+    def _cached_answer(self, key):
+        svar = self._answers.get(key)
+        if svar is not None:
+            log_info(f"Svar från cachen ({key.split('|', 2)[2]}).")
+        return svar
+
+    def query(self, question, top_k=3):
+        """
+        Hämtar relevanta textbitar (R) och genererar svar (G) via Gemini API.
+        Väntar på uppvärmningen om den inte är klar. Svar på samma fråga med samma
+        träffar och oförändrat index hämtas ur svarscachen.
+        """
+        prompt, hits, key = self._retrieve(question, top_k)
+
+        svar = self._cached_answer(key)
+        if svar is not None:
+            return svar, hits
 
         if self.client:
+            from google.genai.errors import APIError
             try:
-                response = self.client.models.generate_content(
-                    model=self.llm_model,
-                    contents=prompt,
-                    config=genai.types.GenerateContentConfig(temperature=0.1) 
-                )
+                response = llm.generate(prompt, llm.rag_config())
                 svar = response.text
+                #Bara lyckade svar från språkmodellen cachas
+                if svar:
+                    self._answers.set(key, svar)
             except APIError as e:
                 svar = f"Ett API-fel uppstod vid generering: {e}"
             except Exception as e:
@@ -110,3 +584,41 @@ class RAGChatbot:
             svar = self._generate_response_dummy(question)
         
         return svar, hits
+
+    def query_stream(self, question, top_k=3):
+        """
+        Som query, men svaret returneras som en generator som ger texten bit för bit
+        medan Gemini genererar den. Sökningen görs direkt; genereringen startar när
+        generatorn börjar läsas. Fel under genereringen blir en textbit med felet.
+        Ett cachat svar ges som en enda bit.
+
+        Returns:
+            (generator med svarstext, hits)
+        """
+        prompt, hits, key = self._retrieve(question, top_k)
+
+        def chunks():
+            svar = self._cached_answer(key)
+            if svar is not None:
+                yield svar
+                return
+            if not self.client:
+                yield self._generate_response_dummy(question)
+                return
+
+            from google.genai.errors import APIError
+            parts = []
+            try:
+                for part in llm.generate_stream(prompt, llm.rag_config()):
+                    parts.append(part)
+                    yield part
+            except APIError as e:
+                yield f"Ett API-fel uppstod vid generering: {e}"
+                return
+            except Exception as e:
+                yield f"Ett oväntat fel uppstod: {e}"
+                return
+            if parts:
+                self._answers.set(key, "".join(parts))
+
+        return chunks(), hits
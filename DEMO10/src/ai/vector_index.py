@@ -0,0 +1,294 @@
+import math
+import time
+import numpy as np
+
+from src.utils.config import RAG_CONFIG
+from src.utils.logger import log_info, log_warning
+
+#Indextyper för RAG-sökningen. faiss importeras i funktionerna (se src/ai/warmup.py).
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+#faiss kräver ungefär 39 träningsvektorer per kluster för att k-means ska bli stabilt
+MIN_POINTS_PER_CENTROID = 39
+
+#Indextyperna i den ordning 'auto' väljer dem när korpusen växer
+_AUTO_ORDER = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+
+def choose_index_type(n_vectors, config=RAG_CONFIG):
+    """Väljer indextyp: RAG_CONFIG['index_type'] eller, vid 'auto', efter korpusstorlek."""
+    index_type = config["index_type"]
+    if index_type != "auto":
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Okänd indextyp '{index_type}'. Välj en av {', '.join(INDEX_TYPES)} eller 'auto'.")
+        return index_type
+
+    if n_vectors <= config["auto_flat_max"]:
+        return "flat"
+    if n_vectors <= config["auto_hnsw_max"]:
+        return "hnsw"
+    if n_vectors <= config["auto_ivf_flat_max"]:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def rebuild_type(index, config=RAG_CONFIG):
+    """
+    Indextypen som ett index som har vuxit ska byggas om till, eller None om det kan behållas.
+    Typen väljs när indexet skapas, vid inläsning ofta från en första liten omgång; med
+    'auto' byts den när antalet vektorer passerar nästa gräns i choose_index_type.
+    IVF-kluster tränas bara när indexet skapas: när korpusen har vuxit så att den borde ha
+    RAG_CONFIG['ivf_retrain_factor'] gånger fler kluster byggs indexet om (och tränas om)
+    med samma typ.
+    """
+    import faiss
+
+    n_vectors = index.ntotal
+    wanted = choose_index_type(n_vectors, config)
+    current = describe_index(index)
+    if wanted in ("ivf_flat", "ivf_pq") and n_vectors < MIN_POINTS_PER_CENTROID:
+        return None
+    if wanted == current:
+        if current in ("ivf_flat", "ivf_pq"):
+            trained_nlist = faiss.extract_index_ivf(index).nlist
+            if _nlist(n_vectors, config) >= config["ivf_retrain_factor"] * trained_nlist:
+                return current
+        return None
+    #'auto' byter bara uppåt, så att borttagningar nära en gräns inte bygger om indexet fram och tillbaka
+    if config["index_type"] == "auto" and _AUTO_ORDER.index(wanted) < _AUTO_ORDER.index(current):
+        return None
+    return wanted
+
+
+def _nlist(n_vectors, config):
+    """Antal IVF-kluster: konfigurerat värde eller 4·√n, begränsat av träningsmängden."""
+    nlist = config["nlist"] or int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _training_sample(embeddings, config):
+    """Slumpmässigt urval för träning av IVF/PQ (hela mängden om den är liten)."""
+    sample_size = config["train_sample_size"]
+    if len(embeddings) <= sample_size:
+        return embeddings
+    rng = np.random.default_rng(0)
+    return embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+
+
+def create_index(embeddings, index_type=None, config=RAG_CONFIG, ids=None):
+    """
+    Skapar, tränar och fyller ett FAISS-index för embeddings (float32, n × d).
+    Med ids (int64) returnerar sökningen dokument-ID i stället för positioner och
+    vektorer kan läggas till/tas bort per ID. IVF-index lagrar ID:n själva; flat och
+    HNSW läggs i en IndexIDMap2 (en ID-mappning ovanpå IVF blir fel efter borttagning,
+    eftersom IVF inte numrerar om sina interna positioner).
+
+    Returns:
+        (index, indextyp)
+    """
+    import faiss
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n_vectors, d = embeddings.shape
+    index_type = index_type or choose_index_type(n_vectors, config)
+
+    if index_type in ("ivf_flat", "ivf_pq") and n_vectors < MIN_POINTS_PER_CENTROID:
+        log_warning(f"För få dokument ({n_vectors}) för {index_type}. Använder flat.")
+        index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, config["hnsw_m"])
+        index.hnsw.efConstruction = config["ef_construction"]
+    else:
+        quantizer = faiss.IndexFlatL2(d)
+        nlist = _nlist(n_vectors, config)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            if d % config["pq_m"] != 0:
+                raise ValueError(f"pq_m ({config['pq_m']}) måste dela dimensionen {d}.")
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, config["pq_m"], config["pq_nbits"])
+        index.train(_training_sample(embeddings, config))
+
+    if ids is None:
+        index.add(embeddings)
+    else:
+        if index_type in ("flat", "hnsw"):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype="int64"))
+    set_search_params(index, config)
+    log_info(f"FAISS-index byggt: {index_type} med {n_vectors} vektorer (d={d}).")
+    return index, index_type
+
+
+def set_search_params(index, config=RAG_CONFIG, nprobe=None, ef_search=None):
+    """
+    Sätter sökparametrarna (nprobe för IVF, efSearch för HNSW). Anropas även efter
+    load_index så att ändrade värden i RAG_CONFIG gäller utan att indexet byggs om.
+    """
+    import faiss
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        ivf.nprobe = min(nprobe or config["nprobe"], ivf.nlist)
+
+    hnsw_index = _base_index(index)
+    if hasattr(hnsw_index, "hnsw"):
+        hnsw_index.hnsw.efSearch = ef_search or config["ef_search"]
+
+
+def read_index(path, config=RAG_CONFIG):
+    """
+    Läser ett index med IO_FLAG_MMAP om RAG_CONFIG['index_mmap'] är satt. faiss minnesmappar
+    bara IVF-indexens inverterade listor, så att vektorerna läses från disk vid behov;
+    flat- och HNSW-index läses alltid in helt i minnet och räknas inte som minnesmappade.
+
+    Returns:
+        (index, True om indexet är minnesmappat (och måste läsas in innan det ändras))
+    """
+    import faiss
+
+    if config["index_mmap"]:
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+            return index, describe_index(index) in ("ivf_flat", "ivf_pq")
+        except RuntimeError as e:
+            log_warning(f"Kunde inte minnesmappa {path} ({e}). Läser in det i minnet.")
+    return faiss.read_index(path), False
+
+
+def _base_index(index):
+    """Indexet innanför en eventuell ID-mappning, nedtypat till sin konkreta klass."""
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def has_ids(index):
+    """True om indexet lagrar dokument-ID (ID-mappning eller IVF), inte bara positioner."""
+    import faiss
+
+    index = faiss.downcast_index(index)
+    return isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def index_ids(index):
+    """Alla ID i ett index som lagrar dokument-ID (se has_ids), som int64-array."""
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map)
+
+    invlists = index.invlists
+    lists = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+             for i in range(index.nlist) if invlists.list_size(i)]
+    return np.concatenate(lists) if lists else np.empty(0, dtype="int64")
+
+
+def describe_index(index):
+    """Indextypen (som i INDEX_TYPES) för ett befintligt, t.ex. inläst, index."""
+    import faiss
+
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def _search_timed(index, queries, k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return ids, elapsed * 1000 / len(queries)
+
+
+def recall_report(embeddings, queries, k=5, config=RAG_CONFIG, index_types=INDEX_TYPES,
+                  nprobes=(1, 4, 16, 64), ef_searches=(16, 32, 64, 128)):
+    """
+    Jämför indextyperna med det exakta flat-indexet: recall@k (andel av de k
+    exakta grannarna som hittas) och medellatens per fråga i ms.
+
+    Returns:
+        Lista av dicts med nycklarna index_type, param, recall, latency_ms och build_s.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    k = min(k, len(embeddings))
+
+    flat, _ = create_index(embeddings, "flat", config)
+    truth, flat_latency = _search_timed(flat, queries, k)
+    results = [{"index_type": "flat", "param": "-", "recall": 1.0, "latency_ms": flat_latency, "build_s": 0.0}]
+
+    for index_type in index_types:
+        if index_type == "flat":
+            continue
+        start = time.perf_counter()
+        try:
+            index, built_type = create_index(embeddings, index_type, config)
+        except (ValueError, RuntimeError) as e:
+            log_warning(f"Kunde inte bygga {index_type} för rapporten: {e}")
+            continue
+        build_s = time.perf_counter() - start
+        if built_type != index_type:
+            continue
+
+        if index_type == "hnsw":
+            settings = [("efSearch", value, {"ef_search": value}) for value in ef_searches]
+        else:
+            settings = [("nprobe", value, {"nprobe": value}) for value in nprobes]
+
+        for name, value, params in settings:
+            set_search_params(index, config, **params)
+            ids, latency = _search_timed(index, queries, k)
+            hits = sum(len(set(found) & set(exact)) for found, exact in zip(ids, truth))
+            results.append({
+                "index_type": index_type,
+                "param": f"{name}={value}",
+                "recall": hits / truth.size,
+                "latency_ms": latency,
+                "build_s": build_s,
+            })
+    return results
+
+
+def format_report(results, k=5):
+    """Formaterar recall_report som en texttabell."""
+    lines = [f"{'Index':<10} {'Parameter':<14} {'Recall@' + str(k):>9} {'ms/fråga':>10} {'Bygge (s)':>10}"]
+    for row in results:
+        lines.append(f"{row['index_type']:<10} {row['param']:<14} {row['recall']:>9.3f} "
+                     f"{row['latency_ms']:>10.3f} {row['build_s']:>10.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    #Kör: python -m src.ai.vector_index [antal frågor]
+    import sys
+    from src.ai.rag import RAGChatbot
+
+    rag = RAGChatbot()
+    rag.wait_until_ready()
+    if not len(rag.store):
+        print("Inga dokument att mäta på. Lägg till text i data/docs.txt.")
+        sys.exit(1)
+
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    vectors = rag.embedder.encode([text for _, text in rag.store.iter_texts()], convert_to_numpy=True)
+    rng = np.random.default_rng(1)
+    picked = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    #Frågorna är dokumentvektorer med lite brus, så att de inte exakt träffar sig själva
+    queries = vectors[picked] + rng.normal(0, 0.01, size=(len(picked), vectors.shape[1])).astype("float32")
+
+    print(format_report(recall_report(vectors, queries)))
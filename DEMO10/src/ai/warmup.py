@@ -0,0 +1,63 @@
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.config import RAG_CONFIG
+from src.utils.logger import log_info, log_error
+
+#Uppvärmning i bakgrunden: tunga moduler (torch, faiss, pandas, statsmodels) och
+#modeller laddas i en egen tråd medan fönstret redan visas. Varje uppgift har ett
+#namn och en Future; kommandon som behöver resultatet väntar på sin Future.
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warmup")
+_futures = {}
+_lock = threading.Lock()
+
+
+def submit(name, fn, *args):
+    """
+    Startar uppgiften 'name' i bakgrunden om den inte redan är startad.
+    Returnerar uppgiftens Future (samma Future vid upprepade anrop).
+    """
+    with _lock:
+        future = _futures.get(name)
+        if future is None:
+            future = _executor.submit(_run, name, fn, *args)
+            _futures[name] = future
+        return future
+
+
+def _run(name, fn, *args):
+    try:
+        result = fn(*args)
+        log_info(f"Uppvärmning klar: {name}.")
+        return result
+    except Exception as e:
+        log_error(f"Uppvärmning misslyckades för {name}: {e}")
+        raise
+
+
+def wait(name, fn, *args, timeout=None):
+    """
+    Väntar tills uppgiften 'name' är klar (startar den vid behov) och returnerar resultatet.
+    Ett fel i uppgiften kastas vidare; en uppgift som tar för lång tid ger TimeoutError.
+    """
+    if timeout is None:
+        timeout = RAG_CONFIG["warmup_timeout_seconds"]
+    return submit(name, fn, *args).result(timeout=timeout)
+
+
+def is_ready(name):
+    """True om uppgiften är klar utan fel."""
+    future = _futures.get(name)
+    return future is not None and future.done() and future.exception() is None
+
+
+def preload_module(module_name):
+    """Importerar en modul i bakgrunden."""
+    return submit(module_name, importlib.import_module, module_name)
+
+
+def require_module(module_name):
+    """Returnerar modulen, och väntar på en pågående bakgrundsimport om den inte är klar."""
+    return wait(module_name, importlib.import_module, module_name)
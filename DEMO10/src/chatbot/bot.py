@@ -1,73 +1,28 @@
 from src.chatbot import commands
+from src.chatbot.parser import CommandParser
+from src.chatbot.interpretation_cache import InterpretationCache
 from src.utils.logger import log_info, log_error, log_warning
 from src.ai.rag import RAGChatbot
 from src.utils.config import CHAT_CONFIG 
 
-from google import genai
-from google.genai.errors import APIError 
-from dotenv import load_dotenv
-import json
-import pandas as pd 
+from src.ai import llm, warmup
 
-#Laddar miljövariabler (som din GEMINI_API_KEY)
-load_dotenv()
+import json
 
 #LLM-baserad Kommando-Tolkning (Behålls som extern funktion) ---
 
 def tolka_kommando_med_llm(cmd_input: str, role: str) -> dict:
     """
     Använder Gemini för att tolka naturligt språk till ett strukturerat kommando (JSON).
+    Klienten och konfigurationen per roll återanvänds via src.ai.llm.
     """
-    try:
-        #Säkerställer att klienten kan initieras
-        client = genai.Client()
-    except Exception as e:
-        log_error(f"Kunde inte initiera Gemini Client för tolkning: {e}")
+    if llm.get_client() is None:
         return {"action": "okänd", "error": "LLM-klient ej tillgänglig"}
 
-    #NY PROMPT FÖR BÄTTRE KOMMANDOTOLKNING
-    system_prompt = (
-        "Du är Lagerbot, en tolk för en lagerhanteringsassistent. Din uppgift är att konvertera "
-        "användarens naturliga språk till ett strukturerat JSON-kommando. "
-        "Du får INTE svara med text, endast JSON.\n\n"
-        "Tillgängliga roller: 'user' (kan söka) och 'admin' (kan söka och uppdatera/se lågt saldo/prognos). "
-        "Användarens nuvarande roll är: {role}\n\n"
-        "Tillgängliga åtgärder (action) och deras argument (args):\n"
-        "1. saldo: Hämta lagersaldo. Kräver ett sökord för produkten i args[0].\n"
-        "2. uppdatera: Uppdatera lagersaldo. Kräver 'admin' roll. Kräver produktnamn i args[0] och nytt saldo (tal) i args[1].\n"
-        "3. lågtsaldo: Lista produkter med lågt saldo (≤10). Kräver 'admin' roll. Kräver inga args.\n"
-        "4. historik: Hämta historiska saldon. Kräver ett sökord för produkten i args[0].\n"
-        "5. prognos: Förutsäga försäljning/uttag för nästa vecka. Kräver 'admin' roll. Kräver ett sökord för produkten i args[0].\n"
-        "6. läggtill: Lägger till en ny produkt. Kräver 'admin' roll. Kräver produktnamn i args[0], initialt saldo (tal) i args[1], plats/hylla i args[2], specifikationer/beskrivning i args[3], och artikelnummer i args[4].\n" 
-        "7. topplista: Hämta topplistan över mest förbrukade produkter. Kräver 'admin' roll. Kräver inga args.\n"
-        "8. flyttaplats: Ändrar lagringsplats. Kräver 'admin' roll. Kräver produktnamn i args[0] och ny plats/hylla i args[1].\n"
-        "9. tabort: Tar bort en produkt permanent från lagret. Kräver 'admin' roll. Kräver produktnamn i args[0].\n"
-        "10. bytnamn: Ändrar namnet på en produkt. Kräver 'admin' roll. Kräver gammalt produktnamn i args[0] och nytt produktnamn i args[1].\n"
-        "11. rag: Fråga kunskapsdatabasen. Används om frågan inte matchar något av ovanstående kommandon (t.ex. 'Vad är en Dimmerspärr?'). Kräver hela frågan som args[0].\n" 
-        "12. okänd: Om frågan inte kan tolkas som någon av de andra åtgärderna.\n\n" 
-        "Returnera ALLTID en JSON med strukturen: {{ \"action\": <action>, \"args\": [<arg1>, <arg2>, ...] }}"
-    ).format(role=role)
-    
-    response_schema = {
-        "type": "OBJECT",
-        "properties": {
-            "action": {"type": "STRING", "description": "Det identifierade kommandot."},
-            "args": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "Argument till kommandot."},
-        },
-        "required": ["action", "args"]
-    }
+    from google.genai.errors import APIError
 
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=cmd_input,
-            config=genai.types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                response_mime_type="application/json",
-                response_schema=response_schema,
-                temperature=0.0
-            ),
-        )
+        response = llm.generate(cmd_input, llm.interpretation_config(role))
         
         json_response = json.loads(response.text)
         log_info(f"LLM-tolkning: {json_response}")
@@ -80,6 +35,13 @@ def tolka_kommando_med_llm(cmd_input: str, role: str) -> dict:
         log_error(f"Ett LLM-relaterat fel inträffade vid tolkning: {e}")
         return {"action": "okänd", "error": f"LLM-tolkningsfel: {e}"}
 
+def _start_projection_job():
+    #Körs själv i en uppvärmningstråd: prognosmodulen (statsmodels) importeras direkt här.
+    #Att vänta på en annan uppvärmningsuppgift skulle blockera tråden bakom RAG-uppvärmningen.
+    from src.ai import projections
+
+    return projections.start_job()
+
 #Huvudklasser
 
 class ChatBot:
@@ -87,7 +49,25 @@ class ChatBot:
         self.role = 'user' 
         self.admin_password = CHAT_CONFIG["admin_password"]
         self.rag = RAGChatbot() 
+        self.parser = CommandParser()
+        self.interpretations = InterpretationCache(embedder_provider=lambda: self.rag.embedder)
         log_info(f"ChatBot initierad. Standardroll: {self.role}.")
+
+    def start_warmup(self):
+        """
+        Laddar tunga delar i bakgrunden: embedder + FAISS-index för RAG (och därefter
+        vektorer för tolkningscachen), prognosmodulen (statsmodels) och Gemini-klienten,
+        och startar prognosjobbet som håller tabellen Prognos uppdaterad. Kommandon som behöver dem innan de är klara väntar
+        på respektive uppvärmning.
+        """
+        rag_ready = self.rag.start_warmup()
+        #Tolkningscachens frågor bäddas in när embeddern är laddad, inte i första uppslagningen
+        rag_ready.add_done_callback(
+            lambda future: future.exception() is None and warmup.submit("tolkningscache", self.interpretations.warm_up)
+        )
+        warmup.preload_module("src.ai.forecast")
+        warmup.submit("llm", llm.get_client)
+        warmup.submit("prognosjobb", _start_projection_job)
         
     def set_role(self, new_role, password=""):
         """Sätter användarens roll."""
@@ -110,22 +90,30 @@ class ChatBot:
         log_info("Roll satt till USER.")
         return f"Rollen är satt till **USER**."
         
-    def get_response(self, user_input: str) -> str:
+    def get_response(self, user_input: str, stream: bool = False):
         """
-        Tar emot användarinmatning, tolkar den via LLM och exekverar kommandot.
+        Tar emot användarinmatning, tolkar den (lokalt eller via LLM) och exekverar kommandot.
+        Med stream=True returneras svaret på RAG-frågor som en generator med textbitar
+        (så att GUI:t kan visa svaret medan det genereras); övriga svar är alltid str.
         """
         user_input = user_input.strip()
         
         if not user_input:
             return ""
 
-        #Hämtar LLM-tolkat kommando
-        parsed_cmd = tolka_kommando_med_llm(user_input, self.role)
+        #Snabbtolkning lokalt; bara tvetydig inmatning skickas till LLM
+        parsed_cmd = self.parser.parse(user_input)
+        if parsed_cmd is None:
+            #Tidigare tolkningar av samma (eller nästan samma) fråga återanvänds
+            parsed_cmd = self.interpretations.get(user_input, self.role)
+        if parsed_cmd is None:
+            parsed_cmd = tolka_kommando_med_llm(user_input, self.role)
+            self.interpretations.put(user_input, self.role, parsed_cmd)
         
         action = parsed_cmd.get("action", "okänd").lower()
         args = parsed_cmd.get("args", [])
         
-        log_info(f"Tolkad handling: '{action}' med argument: {args}")
+        log_info(f"Tolkad handling: '{action}' med argument: {args} (tolkningsstatistik: {self.parser.stats()}, cache: {self.interpretations.stats()})")
 
         try:
             #Exekvera handlingen
@@ -172,10 +160,22 @@ class ChatBot:
                 gammalt_namn = args[0]
                 nytt_namn = args[1]
                 return commands.bytnamn(gammalt_namn, nytt_namn, self.role)
+
+            elif action == "inventering" and self.role == "admin" and len(args) == 1:
+                return commands.inventering(args[0], self.role)
+
+            elif action in ["importera", "exportera"] and self.role == "admin":
+                if len(args) != 2:
+                    return f"Ange typ och fil, t.ex. '{action} produkter katalog.csv'."
+                if action == "importera":
+                    return commands.importera(args[0], args[1].strip('"'), self.role)
+                return commands.exportera(args[0], args[1].strip('"'), self.role)
             
             #RAG-fråga
             elif action == "rag" and len(args) >= 1:
                 fråga = args[0]
+                if stream:
+                    return self.stream_rag_response(fråga)
                 svar, hits = self.rag.query(fråga)
                 #Formaterar utdata för GUI
                 kontext = "\n\n--- Kontext som användes ---\n" + "\n".join(f" - {h}" for h in hits)
@@ -190,7 +190,7 @@ class ChatBot:
                 return "Jag förstår inte kommandot. Skriv 'help' för lista på tillgängliga operationer."
             
             #Fångar ALLA admin-kommandon om rollen INTE är admin
-            elif action in ["uppdatera", "lågtsaldo", "prognos", "läggtill", "topplista", "flyttaplats", "tabort", "bytnamn"] and self.role != "admin":
+            elif action in ["uppdatera", "lågtsaldo", "prognos", "läggtill", "topplista", "flyttaplats", "tabort", "bytnamn", "inventering", "importera", "exportera"] and self.role != "admin":
                  return "Åtkomst nekad: Du måste vara administratör för att utföra den åtgärden."
             
             else:
@@ -202,4 +202,17 @@ class ChatBot:
         except Exception as e:
             log_error(f"Kritiskt fel vid kommandoexekvering: {e}")
             return f"Ett oväntat fel inträffade. Kontrollera loggarna."
-        
+
+    def stream_rag_response(self, fråga):
+        """
+        Svarar på en RAG-fråga som en generator: först 'Svar: ', sedan svaret bit för bit
+        och sist kontexten, i samma format som get_response ger utan streaming.
+        """
+        chunks, hits = self.rag.query_stream(fråga)
+
+        def response():
+            yield "Svar: "
+            yield from chunks
+            yield "\n\n--- Kontext som användes ---\n" + "\n".join(f" - {h}" for h in hits)
+
+        return response()
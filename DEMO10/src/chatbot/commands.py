@@ -1,19 +1,24 @@
 from src.database.db import (
     get_product_info, 
     update_product_stock, 
+    bulk_update_stock,
     get_low_stock_products, 
     get_product_history,
+    get_projection,
+    get_stockout_risks,
     get_top_selling_products,    
     add_new_product_and_stock,
     change_product_location,
     remove_product,
     rename_product,
 )
+from src.database.history import product_daily_series
+from src.database.import_export import IMPORTERS, EXPORTERS
 from src.utils.logger import log_info, log_error, log_warning 
-from src.ai.forecast import forecast_next_week 
+from src.utils.config import FORECAST_CONFIG
 
-#NY IMPORT KRÄVS FÖR PROGNOSBERÄKNINGEN
-import pandas as pd 
+#prognos() och lågtsaldo() läser tabellen Prognos (uppdateras av prognosjobbet, src.ai.projections).
+#Saknas en produkt där används prognostjänsten: ARIMA i en processpool med cachade modeller
 
 #Saldo Kommando
 def saldo(product_name, role):
@@ -60,20 +65,140 @@ def uppdatera(product_name, stock_amount, role):
         log_error(f"Oväntat fel vid uppdatering: {e}") 
         return f"Ett oväntat fel inträffade vid uppdatering: {e}"
 
+#Inventering Kommando (Admin)
+def _parse_inventory_rows(rows_text):
+    """
+    Tolkar inventeringsrader. Rader separeras med radbrytning eller semikolon och
+    skrivs som '<produktnamn eller artikelnummer> <antal>' (även 'namn=antal' och 'namn: antal').
+    Returnerar (rader, ogiltiga rader).
+    """
+    rows = []
+    invalid = []
+    for raw in rows_text.replace(";", "\n").splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        for separator in ("=", ":"):
+            if separator in line:
+                key, _, amount = line.rpartition(separator)
+                break
+        else:
+            parts = line.rsplit(None, 1)
+            key, amount = (parts[0], parts[1]) if len(parts) == 2 else (line, "")
+        key = key.strip()
+        amount = amount.strip()
+        if not key or not amount:
+            invalid.append((line, "Saknar produkt eller antal."))
+            continue
+        rows.append((key, amount))
+    return rows, invalid
+
+def inventering(rows_text, role):
+    """Sätter nya lagersaldon för många produkter i en transaktion (t.ex. efter inventering)."""
+    if role != 'admin':
+        return "Åtkomst nekad: Du måste vara administratör för att registrera inventering."
+
+    rows, invalid = _parse_inventory_rows(rows_text)
+    if not rows and not invalid:
+        return "Inga inventeringsrader angavs. Skriv t.ex. 'inventering HB-63A 12; Kabelsax 4'."
+
+    log_info(f"Kommando 'inventering' initierat av {role} med {len(rows)} rader.")
+
+    try:
+        updated, failed = bulk_update_stock(rows)
+    except ValueError as e:
+        log_error(f"Inventeringsfel: {e}")
+        return f"Fel: {e}"
+    except Exception as e:
+        log_error(f"Oväntat fel vid inventering: {e}")
+        return f"Ett oväntat fel inträffade vid inventering: {e}"
+
+    failed = invalid + [(key, reason) for _, key, reason in failed]
+    message = f"Inventering klar: **{len(updated)}** produkter uppdaterade, **{len(failed)}** rader misslyckades.\n"
+    for key, reason in failed[:20]:
+        message += f"- {key}: {reason}\n"
+    if len(failed) > 20:
+        message += f"... och {len(failed) - 20} till (se loggen).\n"
+        for key, reason in failed[20:]:
+            log_warning(f"Inventeringsrad misslyckades: {key}: {reason}")
+
+    return message
+
+#Importera/Exportera Kommandon (Admin)
+def _format_import_failure(line, key, reason):
+    """Alla importfunktioner rapporterar fel som (radnummer, sökord, felorsak)."""
+    return f"Rad {line} ({key}): {reason}" if key else f"Rad {line}: {reason}"
+
+def importera(kind, path, role):
+    """Importerar produkter, saldon eller historik från en CSV/Excel-fil."""
+    if role != 'admin':
+        return "Åtkomst nekad: Du måste vara administratör för att importera data."
+
+    importer = IMPORTERS.get(kind.lower())
+    if importer is None:
+        return f"Okänd importtyp '{kind}'. Välj någon av: {', '.join(IMPORTERS)}."
+
+    log_info(f"Kommando 'importera' ({kind}) initierat av {role} från fil: {path}")
+    try:
+        imported, failed = importer(path)
+    except ValueError as e:
+        log_error(f"Importfel: {e}")
+        return f"Fel: {e}"
+    except Exception as e:
+        log_error(f"Oväntat fel vid import: {e}")
+        return f"Ett oväntat fel inträffade vid import: {e}"
+
+    message = f"Import av {kind} klar: **{imported}** rader importerade, **{len(failed)}** rader hoppades över.\n"
+    for failure in failed[:20]:
+        message += f"- {_format_import_failure(*failure)}\n"
+    if len(failed) > 20:
+        message += f"... och {len(failed) - 20} till (se loggen).\n"
+        for failure in failed[20:]:
+            log_warning(f"Importrad hoppades över: {_format_import_failure(*failure)}")
+    return message
+
+def exportera(kind, path, role):
+    """Exporterar produkter eller historik till en CSV/Excel-fil."""
+    if role != 'admin':
+        return "Åtkomst nekad: Du måste vara administratör för att exportera data."
+
+    exporter = EXPORTERS.get(kind.lower())
+    if exporter is None:
+        return f"Okänd exporttyp '{kind}'. Välj någon av: {', '.join(EXPORTERS)}."
+
+    log_info(f"Kommando 'exportera' ({kind}) initierat av {role} till fil: {path}")
+    try:
+        exported = exporter(path)
+        return f"Export av {kind} klar: **{exported}** rader skrevs till {path}."
+    except Exception as e:
+        log_error(f"Oväntat fel vid export: {e}")
+        return f"Ett oväntat fel inträffade vid export: {e}"
+
 #Lågtsaldo Kommando (Admin)
 def lågtsaldo(role):
-    """Hämtar produkter med lågt lagersaldo (under tröskelvärdet)."""
+    """
+    Hämtar produkter med lågt lagersaldo (under tröskelvärdet) och produkter som enligt
+    den förberäknade prognosen tar slut inom FORECAST_CONFIG['stockout_warning_days'] dagar.
+    """
     if role != 'admin':
         return "Åtkomst nekad: Du måste vara administratör för att se lågt saldo."
 
     products = get_low_stock_products(threshold=10)
+    warning_days = FORECAST_CONFIG["stockout_warning_days"]
+    risks = get_stockout_risks(warning_days)
     
     if not products:
-        return "Inga produkter har lågt saldo (under 10 st)."
-        
-    message = "Följande produkter har lågt saldo (≤10 st):\n"
-    for p in products:
-        message += f"- {p['name']}: {p['stock']} st (Plats: {p['location']})\n"
+        message = "Inga produkter har lågt saldo (under 10 st).\n"
+    else:
+        message = "Följande produkter har lågt saldo (≤10 st):\n"
+        for p in products:
+            message += f"- {p['name']}: {p['stock']} st (Plats: {p['location']})\n"
+
+    if risks:
+        message += f"\nEnligt prognosen tar följande slut inom {warning_days} dagar:\n"
+        for p in risks:
+            message += (f"- {p['name']}: {p['stock']} st, slut om ca {p['days_until_stockout']:.1f} dagar "
+                        f"(beställ {p['reorder_quantity']} st, Plats: {p['location']})\n")
         
     return message
     
@@ -107,24 +232,31 @@ def prognos(product_name, role):
         return "Åtkomst nekad: Du måste vara administratör för att skapa prognoser."
 
     try:
-        #Hämtar rå historikdata
-        history = get_product_history(product_name)
+        from src.ai.projections import is_stale
+
+        #Förberäknad prognos från prognosjobbet (ingen modell anpassas i chattanropet)
+        projection = get_projection(product_name)
+        if projection is not None and not is_stale(projection["computed_at"]):
+            return _format_projection(projection)
+        if projection is not None:
+            log_warning(f"Förberäknad prognos för {projection['name']} är inaktuell ({projection['computed_at']} UTC). Räknar om direkt.")
+
+        #Förbrukning per dag (uttag, utan påfyllning) som sammanhängande serie
+        series = product_daily_series(product_name)
         
-        if len(history) < 2:
-            return f"Kan inte skapa prognos. Minst 2 historikposter (saldoändringar) krävs för '{product_name}'. Hittade {len(history)}."
-            
-        #Skapar DataFrame
-        df = pd.DataFrame(history)
+        if series["history_rows"] < 2:
+            return f"Kan inte skapa prognos. Minst 2 historikposter (saldoändringar) krävs för '{product_name}'. Hittade {series['history_rows']}."
             
-        #Anropar prognosmodellen
-        #Använder både produktnamn och DataFrame som argument
-        predicted_consumption = forecast_next_week(product_name, df)
+        from src.ai.forecast_service import get_service
+
+        #Anpassas bara om produkten har fått ny historik sedan förra prognosen
+        predicted_consumption = get_service().forecast_next_week(series)
         
         #Avrundar till heltal
         rounded_consumption = int(predicted_consumption)
 
-        return (f"Prognos för **{product_name}** nästa vecka:\n"
-                f"Baserat på historiska data förutspås ett uttag på **{rounded_consumption}** st.")
+        return (f"Prognos för **{series['name']}** nästa vecka:\n"
+                f"Baserat på förbrukningen per dag förutspås ett uttag på **{rounded_consumption}** st.")
 
     except ValueError as e:
         #Fångar fel som "Produkt hittades inte"
@@ -135,6 +267,20 @@ def prognos(product_name, role):
         log_error(f"Kritiskt fel vid skapande av prognos för {product_name}: {e}")
         return f"Ett fel inträffade vid prognos: {e}"
 
+def _format_projection(projection):
+    horizon = FORECAST_CONFIG["horizon_days"]
+    message = (f"Prognos för **{projection['name']}** de kommande {horizon} dagarna:\n"
+               f"Förväntat uttag: **{round(projection['forecast'])}** st "
+               f"(ca {projection['daily_consumption']:.1f} st/dag). Nuvarande saldo: {projection['stock']} st.\n")
+    if projection["days_until_stockout"] is None:
+        message += "Inget uttag väntas, saldot räcker.\n"
+    else:
+        message += f"Saldot räcker i ca **{projection['days_until_stockout']:.1f}** dagar.\n"
+    if projection["reorder_quantity"] > 0:
+        message += f"Föreslagen beställning: **{projection['reorder_quantity']}** st.\n"
+    message += f"(Beräknad {projection['computed_at']} UTC, metod: {projection['method']})"
+    return message
+
 #Topplista Kommando (Admin)
 def topplista(role):
     """Hämtar de N mest förbrukade produkterna baserat på historik."""
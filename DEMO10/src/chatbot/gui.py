@@ -65,11 +65,14 @@ class RoleSelectionWindow(ctk.CTkToplevel):
 class ChatbotGUI:
     def __init__(self, master):
         self.master = master
-        #ChatBot initieras med standardroll 'user'
+        #ChatBot initieras med standardroll 'user' (tunga modeller laddas inte här)
         self.chatbot = ChatBot() 
         
         self.create_widgets()
 
+        #Startar uppvärmningen (embedder, index, prognosmodul) när fönstret har ritats
+        self.master.after(200, self.chatbot.start_warmup)
+
         #Visa pop-up för rollval efter att GUI:t har renderats
         self.master.after(100, self.show_role_selector) 
         
@@ -99,6 +102,11 @@ class ChatbotGUI:
 
     def append_message(self, sender, message, is_bot=True):
         """Lägger till ett meddelande i chatthistoriken. Uppdaterad för att visa 'Jarvis'."""
+        self.begin_message(sender, is_bot)
+        self.append_chunk(f"{message}\n\n")
+
+    def begin_message(self, sender, is_bot=True):
+        """Skriver avsändaren för ett nytt meddelande; texten läggs till med append_chunk."""
         self.chat_history.configure(state="normal")
         
         tag = "bot_tag" if is_bot else "user_tag"
@@ -110,7 +118,13 @@ class ChatbotGUI:
         sender_display = "Jarvis" if is_bot else sender
         
         self.chat_history.insert(ctk.END, f"{sender_display}: ", tag)
-        self.chat_history.insert(ctk.END, f"{message}\n\n")
+        self.chat_history.configure(state="disabled")
+        self.chat_history.see(ctk.END)
+
+    def append_chunk(self, text):
+        """Lägger till text sist i chatthistoriken (för svar som visas medan de genereras)."""
+        self.chat_history.configure(state="normal")
+        self.chat_history.insert(ctk.END, text)
         self.chat_history.configure(state="disabled")
         self.chat_history.see(ctk.END)
 
@@ -162,9 +176,12 @@ class ChatbotGUI:
     def run_response_in_thread(self, cmd_input):
         """Körs i en separat tråd för att undvika frysning."""
         try:
-            response = self.chatbot.get_response(cmd_input)
-            #Uppdaterar GUI:t på huvudtråden (använder Jarvis som avsändare)
-            self.master.after(0, lambda: self.append_message("Du", response, is_bot=True))
+            response = self.chatbot.get_response(cmd_input, stream=True)
+            if isinstance(response, str):
+                #Uppdaterar GUI:t på huvudtråden (använder Jarvis som avsändare)
+                self.master.after(0, lambda: self.append_message("Du", response, is_bot=True))
+            else:
+                self.stream_response(response)
         
         #Fångar de specifika databasfelen från db.py
         except (FileNotFoundError, ConnectionError) as db_error:
@@ -180,6 +197,18 @@ class ChatbotGUI:
             #Detta garanterar att inmatningsfältet ALLTID låses upp.
             self.master.after(0, self.enable_input)
 
+    def stream_response(self, chunks):
+        """
+        Visar ett svar som genereras bit för bit. Körs i svarstråden; varje bit läggs
+        till via master.after så att bara huvudtråden rör widgetarna.
+        """
+        self.master.after(0, lambda: self.begin_message("Du", is_bot=True))
+        try:
+            for chunk in chunks:
+                self.master.after(0, lambda text=chunk: self.append_chunk(text))
+        finally:
+            self.master.after(0, lambda: self.append_chunk("\n\n"))
+
     def send_message(self, event=None):
         cmd_input = self.input_entry.get().strip()
         if not cmd_input:
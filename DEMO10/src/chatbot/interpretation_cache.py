@@ -0,0 +1,159 @@
+import re
+import threading
+import numpy as np
+
+from src.chatbot.parser import extract_product
+from src.utils.cache import TTLCache, normalize_text as normalize, resolve_cache_path
+from src.utils.config import CACHE_CONFIG
+from src.utils.logger import log_info
+
+#Åtgärder som får återanvändas för en liknande (inte identisk) fråga.
+#Skrivande kommandon matchas bara på exakt normaliserad text.
+SEMANTIC_ACTIONS = {"saldo", "historik", "prognos", "lågtsaldo", "topplista", "rag"}
+#Åtgärder vars enda argument är en produkt
+PRODUCT_ACTIONS = {"saldo", "historik", "prognos"}
+
+
+def _numbers(text):
+    return re.findall(r"\d+", text)
+
+
+def _same_arguments(value, text):
+    """
+    True om den cachade tolkningen gäller samma sak som den nya frågan: produktkommandon
+    kräver att produkten i frågan är exakt den cachade produkten (inte bara innehåller den),
+    övriga argument måste förekomma som hela ord.
+    """
+    args = [normalize(str(arg)) for arg in value["args"]]
+    if value["action"] in PRODUCT_ACTIONS:
+        return len(args) == 1 and extract_product(text) == args[0]
+    return all(re.search(rf"(?<!\w){re.escape(arg)}(?!\w)", text) for arg in args)
+
+
+class InterpretationCache:
+    """
+    Cache för LLM-tolkningar, nycklad på roll + normaliserad text (LRU + TTL, sparas på disk).
+
+    Med en embedder aktiverad matchas även nästan identiska frågor via cosinuslikhet,
+    men bara för läsande åtgärder, när frågorna innehåller samma tal och när produkten
+    i den nya frågan (extract_product) är exakt den cachade produkten. Vektorerna för
+    cachade frågor beräknas i put() och i warm_up(), aldrig under en uppslagning.
+    """
+
+    def __init__(self, embedder_provider=None):
+        self._cache = TTLCache(
+            max_size=CACHE_CONFIG["interpretation_max_entries"],
+            ttl_seconds=CACHE_CONFIG["interpretation_ttl_seconds"],
+            path=resolve_cache_path(CACHE_CONFIG["interpretation_path"]),
+        )
+        #Returnerar en SentenceTransformer (eller None om den inte är laddad än)
+        self._embedder_provider = embedder_provider
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(role, text):
+        return f"{role}|{normalize(text)}"
+
+    def get(self, user_input, role):
+        """Returnerar en cachad tolkning ({"action", "args"}) eller None."""
+        key = self._key(role, user_input)
+        cached = self._cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return dict(cached)
+
+        cached = self._semantic_lookup(user_input, role)
+        if cached is not None:
+            with self._lock:
+                self.semantic_hits += 1
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, user_input, role, parsed_cmd):
+        """Sparar en lyckad tolkning. Fel och 'okänd' cachas aldrig."""
+        action = str(parsed_cmd.get("action", "okänd")).lower()
+        if action == "okänd" or "error" in parsed_cmd:
+            return
+        key = self._key(role, user_input)
+        self._cache.set(key, {"action": action, "args": list(parsed_cmd.get("args", []))})
+        if action in SEMANTIC_ACTIONS:
+            #Ett encode-anrop efter ett LLM-anrop; uppslagningar behöver aldrig bädda in cachen
+            self._embed_keys([key])
+
+    def warm_up(self, batch_size=256):
+        """Bäddar in alla cachade frågor som saknar vektor (körs i bakgrunden när embeddern är laddad)."""
+        keys = [key for key, value in self._cache.items() if value["action"] in SEMANTIC_ACTIONS]
+        with self._lock:
+            keys = [key for key in keys if key not in self._vectors]
+        for start in range(0, len(keys), batch_size):
+            if not self._embed_keys(keys[start:start + batch_size]):
+                return
+        log_info(f"Tolkningscachen: {len(keys)} frågor inbäddade för semantisk sökning.")
+
+    def _embed_keys(self, keys):
+        embedder = self._embedder()
+        if embedder is None or not keys:
+            return False
+        vectors = embedder.encode([key.split("|", 1)[1] for key in keys], convert_to_numpy=True, normalize_embeddings=True)
+        with self._lock:
+            self._vectors.update(zip(keys, vectors))
+            if len(self._vectors) > 2 * self._cache.max_size:
+                #Släpper vektorer för poster som har trängts ut ur cachen
+                live = {key for key, _ in self._cache.items()}
+                self._vectors = {key: vector for key, vector in self._vectors.items() if key in live}
+        return True
+
+    def _embedder(self):
+        if self._embedder_provider is None:
+            return None
+        return self._embedder_provider()
+
+    def _semantic_lookup(self, user_input, role):
+        embedder = self._embedder()
+        if embedder is None:
+            return None
+
+        text = normalize(user_input)
+        with self._lock:
+            vectors = dict(self._vectors)
+        #Bara poster som redan har en vektor; övriga blir sökbara när put/warm_up bäddat in dem
+        candidates = [
+            (key, value) for key, value in self._cache.items()
+            if key in vectors
+            and key.startswith(role + "|")
+            and value["action"] in SEMANTIC_ACTIONS
+            and _numbers(key) == _numbers(text)
+        ]
+        if not candidates:
+            return None
+
+        matrix = np.stack([vectors[key] for key, _ in candidates])
+        query = embedder.encode([text], convert_to_numpy=True, normalize_embeddings=True)[0]
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < CACHE_CONFIG["interpretation_similarity"]:
+            return None
+
+        key, value = candidates[best]
+        if value["action"] == "rag":
+            #Kunskapsfrågor skickas vidare med den nya formuleringen
+            result = {"action": "rag", "args": [user_input]}
+        elif _same_arguments(value, text):
+            result = dict(value)
+        else:
+            return None
+
+        log_info(f"Semantisk cacheträff ({scores[best]:.3f}): '{user_input}' ~ '{key.split('|', 1)[1]}'")
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"träffar": self.hits, "semantiska": self.semantic_hits, "missar": self.misses}
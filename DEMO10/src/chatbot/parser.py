@@ -0,0 +1,132 @@
+import re
+import threading
+
+#Snabbtolkning av strukturerade kommandon utan LLM.
+#Varje mönster ger ett kommando på samma form som tolka_kommando_med_llm:
+#{"action": <action>, "args": [...]}. Inmatning som inte känns igen säkert
+#returnerar None och skickas vidare till LLM-tolkningen.
+
+_PRODUCT = r"(?P<product>.+?)"
+_AMOUNT = r"(?P<amount>\d+)\s*(?:st|st\.|stycken)?"
+
+#(action, mönster, argumentgrupper) i prioritetsordning
+_PATTERNS = [
+    ("saldo", rf"^saldo\s+(?:för\s+|på\s+)?{_PRODUCT}$", ["product"]),
+    ("saldo", rf"^hur många\s+{_PRODUCT}\s+(?:finns det|finns|har vi)(?:\s+i lager(?:et)?)?$", ["product"]),
+    ("saldo", rf"^var (?:ligger|finns|hittar jag)\s+{_PRODUCT}$", ["product"]),
+    ("uppdatera", rf"^uppdatera\s+(?:saldo\s+(?:för|på)\s+)?{_PRODUCT}\s+(?:till\s+)?{_AMOUNT}$", ["product", "amount"]),
+    ("lågtsaldo", r"^(?:lågtsaldo|lågt saldo|låga saldon|låg lagerstatus)$", []),
+    ("historik", rf"^historik\s+(?:för\s+|på\s+)?{_PRODUCT}$", ["product"]),
+    ("prognos", rf"^prognos\s+(?:för\s+|på\s+)?{_PRODUCT}$", ["product"]),
+    ("topplista", r"^(?:topplista|topplistan|topp\s*5|mest förbrukade(?: produkter)?)$", []),
+    ("flyttaplats", r"^(?:flyttaplats|flytta)\s+(?P<product>.+)\s+till\s+(?:plats\s+)?(?P<location>.+)$", ["product", "location"]),
+    ("flyttaplats", rf"^flyttaplats\s+{_PRODUCT}\s+(?P<location>[^\s]+)$", ["product", "location"]),
+    ("tabort", rf"^(?:tabort|ta bort)\s+(?:produkten\s+)?{_PRODUCT}$", ["product"]),
+    ("bytnamn", rf"^(?:bytnamn|byt namn)\s+(?:på\s+)?{_PRODUCT}\s+till\s+(?P<new_name>.+)$", ["product", "new_name"]),
+]
+_COMPILED = [(action, re.compile(pattern, re.IGNORECASE), groups) for action, pattern, groups in _PATTERNS]
+
+#Frågor som går direkt till kunskapsdatabasen (rag)
+_RAG_PATTERN = re.compile(r"^(?:vad är|vad betyder|vad används|hur fungerar|varför|förklara|vilken skillnad)\b", re.IGNORECASE)
+
+#Ord som tyder på ett lagerkommando; då är en fråga tvetydig och skickas till LLM
+_COMMAND_WORDS = re.compile(r"\b(?:saldo\w*|lager\w*|historik\w*|prognos\w*|uppdatera\w*|topplista\w*|plats)\b", re.IGNORECASE)
+
+#Kommandon med fri text som aldrig skickas till LLM (kan vara tusentals rader eller en filsökväg)
+_RAW_COMMANDS = ("inventering", "importera", "exportera")
+
+#Utfyllnad före och efter produktnamnet i fritt formulerade frågor ("kan du kolla saldot på X",
+#"hur många X har vi kvar"); används av extract_product
+_PRODUCT_PREFIX = re.compile(
+    r"^(?:kan du|kan ni|snälla|visa|kolla|ge mig|berätta|hur många|hur mycket|hur ser|vad är|vad har vi|"
+    r"var ligger|var finns|var hittar jag|saldo\w*|historik\w*|prognos\w*|lager\w*|"
+    r"för|på|av|om|det|ut|med|mig|oss|finns det|har vi)\s+",
+    re.IGNORECASE,
+)
+_PRODUCT_SUFFIX = re.compile(
+    r"\s+(?:finns det|finns|har vi|kvar|i lager\w*|på lager|just nu|nu|idag|tack)$",
+    re.IGNORECASE,
+)
+
+#Separator för läggtill: 'läggtill namn; saldo; plats; specifikation; artikelnummer'
+_ADD_PATTERN = re.compile(r"^(?:läggtill|lägg till)\s+(?P<rest>.+)$", re.IGNORECASE)
+
+
+class CommandParser:
+    """
+    Deterministisk, mönsterbaserad tolk för de dokumenterade kommandona.
+    Räknar träffar per åtgärd och antal inmatningar som fick gå vidare till LLM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.fallbacks = 0
+
+    def _hit(self, action, args):
+        with self._lock:
+            self.hits[action] = self.hits.get(action, 0) + 1
+        return {"action": action, "args": args}
+
+    def parse(self, user_input):
+        """Returnerar ett kommando-dict eller None om inmatningen bör tolkas av LLM."""
+        text = " ".join(user_input.split())
+        first_word = text.split(" ", 1)[0].lower() if text else ""
+
+        if first_word in _RAW_COMMANDS:
+            #Behåller radbrytningar och originalformat i argumentet
+            rest = user_input.strip()[len(first_word):]
+            if first_word == "inventering":
+                return self._hit(first_word, [rest])
+            return self._hit(first_word, rest.split(None, 1))
+
+        text = text.rstrip("?!. ")
+
+        add = _ADD_PATTERN.match(text)
+        if add:
+            parts = [part.strip() for part in add.group("rest").split(";")]
+            if len(parts) == 5 and parts[0] and parts[1].isdigit():
+                return self._hit("läggtill", parts)
+            return self._fallback()
+
+        for action, pattern, groups in _COMPILED:
+            match = pattern.match(text)
+            if match:
+                return self._hit(action, [match.group(group).strip() for group in groups])
+
+        if _RAG_PATTERN.match(text) and not _COMMAND_WORDS.search(text):
+            return self._hit("rag", [user_input.strip()])
+
+        return self._fallback()
+
+    def _fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+    def hit_rate(self):
+        """Andel inmatningar som tolkades lokalt utan LLM (0.0–1.0)."""
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + self.fallbacks
+        return hits / total if total else 0.0
+
+    def stats(self):
+        """Sammanfattning av räknarna för loggning."""
+        with self._lock:
+            hits = dict(self.hits)
+            fallbacks = self.fallbacks
+        return {"träffar": hits, "llm": fallbacks, "träffgrad": round(self.hit_rate(), 3)}
+
+
+def extract_product(text):
+    """
+    Plockar ut produktnamnet ur en fritt formulerad fråga om en produkt genom att ta bort
+    kända inledningar och avslutningar. Returnerar namnet i gemener, eller None om inget återstår.
+    """
+    span = " ".join(text.lower().split()).rstrip("?!. ")
+    while True:
+        stripped = _PRODUCT_SUFFIX.sub("", _PRODUCT_PREFIX.sub("", span))
+        if stripped == span:
+            return span or None
+        span = stripped
@@ -1,7 +1,13 @@
 import sqlite3
 import os
 import sys
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
 from src.utils.logger import log_info, log_error, log_warning
+from src.utils.config import DB_CONFIG
+from src.database.resolver import product_resolver
 from datetime import datetime 
 
 #Kolumnnamn
@@ -16,14 +22,260 @@ COL_TIME = "timestamp"
 PRODUCTS_TABLE = "Produkter"
 STOCK_TABLE = "Lager"
 HISTORY_TABLE = "Produkt_historik" 
+CONSUMPTION_TABLE = "Produkt_forbrukning"
+CONSUMPTION_PERIOD_TABLE = "Forbrukning_period"
+PROJECTION_TABLE = "Prognos"
+PROJECTION_STATE_TABLE = "Prognos_status"
+
+#Format för tidsstämplar i prognostabellerna (UTC, samma som SQLite DATETIME())
+PROJECTION_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+#Periodtyper i Forbrukning_period
+PERIOD_DAY = "dag"
+PERIOD_WEEK = "vecka"
 
 #Beräknar sökvägen till projektets rotmapp
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 DATABASE_PATH_DEV = os.path.join(PROJECT_ROOT, 'Elfirman.db')
 
+def _migrate_history_product_id(cursor):
+    """
+    Migrering 1: Kopplar Produkt_historik till Produkter via ProduktID i stället för
+    fritext-namn och skapar de sekundära index som databasen saknade.
+    """
+    cursor.execute(f"ALTER TABLE {HISTORY_TABLE} ADD COLUMN {COL_PRODID} INTEGER REFERENCES {PRODUCTS_TABLE}({COL_PRODID})")
+
+    #Fyller i ProduktID för befintlig historik (exakt namn först, sedan skiftlägesokänsligt)
+    cursor.execute(f"""
+        UPDATE {HISTORY_TABLE}
+        SET {COL_PRODID} = (
+            SELECT MIN(p.{COL_PRODID}) FROM {PRODUCTS_TABLE} p
+            WHERE p.{COL_NAME} = {HISTORY_TABLE}.product_name
+        )
+    """)
+    cursor.execute(f"""
+        UPDATE {HISTORY_TABLE}
+        SET {COL_PRODID} = (
+            SELECT MIN(p.{COL_PRODID}) FROM {PRODUCTS_TABLE} p
+            WHERE LOWER(p.{COL_NAME}) = LOWER({HISTORY_TABLE}.product_name)
+        )
+        WHERE {COL_PRODID} IS NULL
+    """)
+
+    #Täckande index för historik per produkt i datumordning (id avgör ordningen inom samma dag)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_historik_produkt_datum ON {HISTORY_TABLE}({COL_PRODID}, date, id, quantity)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_lager_produkt ON {STOCK_TABLE}({COL_PRODID})")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_lager_antal ON {STOCK_TABLE}({COL_STOCK})")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_produkter_artikelnummer ON {PRODUCTS_TABLE}({COL_ARTICLENUMBER})")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_produkter_namn_lower ON {PRODUCTS_TABLE}(LOWER({COL_NAME}))")
+
+
+#Saldoförändringar per historikrad: föregående saldo för samma produkt i (datum, id)-ordning.
+#Rader utan ProduktID (äldre historik för borttagna produkter) grupperas på sitt namn.
+_STOCK_CHANGES_CTE = f"""
+    WITH StockChanges AS (
+        SELECT
+            h.{COL_PRODID} AS product_id,
+            CASE WHEN h.{COL_PRODID} IS NULL THEN h.product_name END AS orphan_name,
+            COALESCE(p.{COL_NAME}, h.product_name) AS name,
+            h.date,
+            h.quantity,
+            LAG(h.quantity, 1, h.quantity) OVER (
+                PARTITION BY h.{COL_PRODID}, CASE WHEN h.{COL_PRODID} IS NULL THEN h.product_name END
+                ORDER BY h.date, h.id
+            ) AS previous_quantity
+        FROM {HISTORY_TABLE} h
+        LEFT JOIN {PRODUCTS_TABLE} p ON p.{COL_PRODID} = h.{COL_PRODID}
+        {{where}}
+    )
+"""
+
+
+def _rebuild_consumption(cursor, product_ids=None):
+    """
+    Räknar om förbrukningstabellerna från Produkt_historik, för alla produkter
+    eller bara för de angivna ProduktID:na. Används vid migrering och när
+    historik skrivs i efterhand (t.ex. import).
+    """
+    if product_ids is None:
+        cursor.execute(f"DELETE FROM {CONSUMPTION_TABLE}")
+        cursor.execute(f"DELETE FROM {CONSUMPTION_PERIOD_TABLE}")
+        cte = _STOCK_CHANGES_CTE.format(where="")
+        params = ()
+    else:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ", ".join("?" * len(product_ids))
+        cursor.execute(f"DELETE FROM {CONSUMPTION_TABLE} WHERE {COL_PRODID} IN ({placeholders})", product_ids)
+        cursor.execute(f"DELETE FROM {CONSUMPTION_PERIOD_TABLE} WHERE {COL_PRODID} IN ({placeholders})", product_ids)
+        cte = _STOCK_CHANGES_CTE.format(where=f"WHERE h.{COL_PRODID} IN ({placeholders})")
+        params = tuple(product_ids)
+
+    cursor.execute(f"""
+        {cte}
+        INSERT INTO {CONSUMPTION_TABLE} ({COL_PRODID}, product_name, total_consumption)
+        SELECT product_id, MAX(name), SUM(previous_quantity - quantity)
+        FROM StockChanges
+        WHERE quantity < previous_quantity
+        GROUP BY product_id, orphan_name
+    """, params)
+
+    for period_type, period_expr in ((PERIOD_DAY, "DATE(date)"), (PERIOD_WEEK, "strftime('%Y-W%W', date)")):
+        cursor.execute(f"""
+            {cte}
+            INSERT INTO {CONSUMPTION_PERIOD_TABLE} ({COL_PRODID}, period_type, period, consumption)
+            SELECT product_id, ?, {period_expr}, SUM(previous_quantity - quantity)
+            FROM StockChanges
+            WHERE quantity < previous_quantity AND product_id IS NOT NULL
+            GROUP BY product_id, {period_expr}
+        """, (period_type,) + params)
+
+
+def _record_consumption(cursor, entries, date="now"):
+    """
+    Lägger till uttag i förbrukningstabellerna (totalt, per dag och per vecka).
+    entries är en lista av (ProduktID, produktnamn, uttag).
+    Anropas i samma transaktion som historikraderna skrivs.
+    """
+    cursor.executemany(f"""
+        INSERT INTO {CONSUMPTION_TABLE} ({COL_PRODID}, product_name, total_consumption)
+        VALUES (?, ?, ?)
+        ON CONFLICT({COL_PRODID}) DO UPDATE SET
+            total_consumption = total_consumption + excluded.total_consumption
+    """, entries)
+    cursor.executemany(f"""
+        INSERT INTO {CONSUMPTION_PERIOD_TABLE} ({COL_PRODID}, period_type, period, consumption)
+        VALUES (?, '{PERIOD_DAY}', DATE(?), ?), (?, '{PERIOD_WEEK}', strftime('%Y-W%W', ?), ?)
+        ON CONFLICT({COL_PRODID}, period_type, period) DO UPDATE SET
+            consumption = consumption + excluded.consumption
+    """, [(pid, date, amount, pid, date, amount) for pid, _, amount in entries])
+
+
+def _latest_stock_in_history(cursor, product_id):
+    """Senast loggade saldo för produkten (det som LAG() jämför nästa rad mot)."""
+    cursor.execute(f"""
+        SELECT quantity FROM {HISTORY_TABLE}
+        WHERE {COL_PRODID} = ?
+        ORDER BY date DESC, id DESC
+        LIMIT 1
+    """, (product_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _latest_stocks_in_history(cursor, product_ids, chunk_size=500):
+    """Senast loggade saldo för flera produkter på en gång, som {ProduktID: saldo}."""
+    product_ids = list(product_ids)
+    latest = {}
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"""
+            SELECT product_id, quantity FROM (
+                SELECT
+                    {COL_PRODID} AS product_id,
+                    quantity,
+                    ROW_NUMBER() OVER (PARTITION BY {COL_PRODID} ORDER BY date DESC, id DESC) AS rn
+                FROM {HISTORY_TABLE}
+                WHERE {COL_PRODID} IN ({placeholders})
+            )
+            WHERE rn = 1
+        """, chunk)
+        latest.update((row[0], row[1]) for row in cursor.fetchall())
+    return latest
+
+
+def _migrate_consumption_tables(cursor):
+    """
+    Migrering 2: Inkrementellt uppdaterade förbrukningstabeller för topplistan,
+    med löpande total per produkt samt hinkar per dag och vecka.
+    """
+    cursor.execute(f"""
+        CREATE TABLE {CONSUMPTION_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {COL_PRODID} INTEGER UNIQUE REFERENCES {PRODUCTS_TABLE}({COL_PRODID}),
+            product_name TEXT NOT NULL,
+            total_consumption INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(f"CREATE INDEX idx_forbrukning_total ON {CONSUMPTION_TABLE}(total_consumption)")
+    cursor.execute(f"""
+        CREATE TABLE {CONSUMPTION_PERIOD_TABLE} (
+            {COL_PRODID} INTEGER NOT NULL,
+            period_type TEXT NOT NULL,
+            period TEXT NOT NULL,
+            consumption INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY ({COL_PRODID}, period_type, period)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"CREATE INDEX idx_forbrukning_period ON {CONSUMPTION_PERIOD_TABLE}(period_type, period, consumption)")
+
+    #Fyller tabellerna från befintlig historik
+    _rebuild_consumption(cursor)
+
+
+def _migrate_projection_tables(cursor):
+    """
+    Migrering 3: Förberäknade prognoser per produkt (förbrukning, dagar tills saldot
+    tar slut och föreslagen beställning) samt hur långt i historiken de är uppdaterade.
+    """
+    cursor.execute(f"""
+        CREATE TABLE {PROJECTION_TABLE} (
+            {COL_PRODID} INTEGER PRIMARY KEY REFERENCES {PRODUCTS_TABLE}({COL_PRODID}),
+            daily_consumption REAL NOT NULL,
+            forecast REAL NOT NULL,
+            days_until_stockout REAL,
+            reorder_quantity INTEGER NOT NULL,
+            method TEXT NOT NULL,
+            computed_at TEXT NOT NULL
+        )
+    """)
+    cursor.execute(f"CREATE INDEX idx_prognos_dagar ON {PROJECTION_TABLE}(days_until_stockout)")
+    cursor.execute(f"""
+        CREATE TABLE {PROJECTION_STATE_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_history_id INTEGER NOT NULL DEFAULT 0,
+            last_full_refresh TEXT
+        )
+    """)
+    cursor.execute(f"INSERT INTO {PROJECTION_STATE_TABLE} (id, last_history_id) VALUES (1, 0)")
+
+
+#Versionerade migreringar (version, beskrivning, funktion). Databasens nuvarande
+#version lagras i PRAGMA user_version så att varje migrering körs exakt en gång.
+MIGRATIONS = [
+    (1, "ProduktID i Produkt_historik samt index", _migrate_history_product_id),
+    (2, "Förbrukningstabeller för topplistan", _migrate_consumption_tables),
+    (3, "Förberäknade prognoser", _migrate_projection_tables),
+]
+
+
+def _run_migrations(conn):
+    """Kör alla migreringar som är nyare än databasens version, var och en i en egen transaktion."""
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        log_info(f"Kör databasmigrering {version}: {description}")
+        try:
+            conn.execute("BEGIN")
+            migrate(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            log_error(f"Databasmigrering {version} misslyckades: {e}")
+            raise
+        log_info(f"Databasen är migrerad till version {version}.")
+
+
 def _initialize_database(conn):
     """
-    Kritisk funktion: Säkerställer att alla nödvändiga tabeller existerar.
+    Kritisk funktion: Säkerställer att alla nödvändiga tabeller existerar och
+    att databasen är migrerad till senaste versionen.
     Lägger även till initial historik om tabellen är tom (behövs för prognos).
     """
     cursor = conn.cursor()
@@ -44,6 +296,8 @@ def _initialize_database(conn):
         log_error(f"Kritiskt SQLite fel vid initiering av {HISTORY_TABLE}: {e}")
         return 
 
+    _run_migrations(conn)
+
     #Kontrollera om historiktabellen är tom
     cursor.execute(f"SELECT COUNT(*) FROM {HISTORY_TABLE}")
     count = cursor.fetchone()[0]
@@ -53,7 +307,7 @@ def _initialize_database(conn):
         
         #Hämtar alla produkter och deras nuvarande lagerstatus
         cursor.execute(f"""
-            SELECT p.{COL_NAME}, l.{COL_STOCK} 
+            SELECT p.{COL_PRODID}, p.{COL_NAME}, l.{COL_STOCK} 
             FROM {PRODUCTS_TABLE} p
             INNER JOIN {STOCK_TABLE} l ON p.{COL_PRODID} = l.{COL_PRODID}
         """)
@@ -62,13 +316,13 @@ def _initialize_database(conn):
         #Lägger till varje produkt i historiken med dagens datum
         current_date = datetime.now().strftime('%Y-%m-%d')
         
-        #Använder p.product_name och l.stock_count som alias (ROW[0], ROW[1] i SQL-resultatet)
-        insert_data = [(row[0], current_date, row[1]) for row in initial_products] 
+        #ROW[0], ROW[1], ROW[2] = ProduktID, Namn, Antal i SQL-resultatet
+        insert_data = [(row[0], row[1], current_date, row[2]) for row in initial_products] 
         
         try:
             cursor.executemany(f"""
-                INSERT INTO {HISTORY_TABLE} (product_name, date, quantity) 
-                VALUES (?, ?, ?)
+                INSERT INTO {HISTORY_TABLE} ({COL_PRODID}, product_name, date, quantity) 
+                VALUES (?, ?, ?, ?)
             """, insert_data)
             conn.commit()
             log_info(f"Initiala {len(initial_products)} produkter lades till i historiken.")
@@ -78,67 +332,203 @@ def _initialize_database(conn):
         log_info(f"Produkt_historik har redan {count} poster. Ingen initial fyllning behövs.")
 
 
-def get_db_connection():
+def _resolve_db_path():
     """
-    Hanterar databasanslutning för både utveckling och PyInstaller (.exe).
+    Hanterar databassökväg för både utveckling och PyInstaller (.exe).
     """
     if getattr(sys, 'frozen', False):
         #Ansluter till originalfilen
-        db_path = r'C:\Users\Admin\Desktop\DEMO10\Elfirman.db'
-    else:
-        #Använder relativ sökväg i projektet
-        db_path = DATABASE_PATH_DEV
+        return r'C:\Users\Admin\Desktop\DEMO10\Elfirman.db'
+    #Använder relativ sökväg i projektet
+    return DATABASE_PATH_DEV
 
-    log_info(f"Försöker ansluta till databas: {db_path}") 
-    
-    if not os.path.exists(db_path):
-        log_error(f"FATAL: Databasfilen hittades INTE på förväntad sökväg: {db_path}")
-        raise FileNotFoundError(f"Databasfilen hittades inte. Sökväg: {db_path}")
-        
-    try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row 
-        
-        #Initierar databasstrukturen (inklusive initial fyllning)
-        _initialize_database(conn)
-        
+
+class ConnectionPool:
+    """
+    Trådmedveten pool av långlivade SQLite-anslutningar i WAL-läge.
+    Läsningar lånar en av flera läsanslutningar (connection) och kan köras samtidigt;
+    alla skrivningar går genom en enda serialiserad skrivanslutning (writer).
+    I WAL-läge blockeras läsare aldrig av en pågående skrivning.
+    """
+
+    def __init__(self, db_path, max_size=None, timeout=10.0):
+        self.db_path = db_path
+        self.max_size = max_size or DB_CONFIG["read_pool_size"]
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._writer = None
+        self._writer_lock = threading.RLock()
+
+    def _connect(self, read_only=False):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_CONFIG["busy_timeout_ms"] / 1000,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(DB_CONFIG['busy_timeout_ms'])}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = {-int(DB_CONFIG['cache_size_kib'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(DB_CONFIG['mmap_size'])}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            #Skyddar mot att en skrivning av misstag går förbi den serialiserade skrivaren
+            conn.execute("PRAGMA query_only = ON")
         return conn
-    except sqlite3.Error as e:
-        log_error(f"Kritiskt SQLite fel vid anslutning: {e}")
-        raise ConnectionError(f"Kunde inte ansluta till databasen: {e}")
+
+    def enable_wal(self):
+        """Slår på WAL-journalen (sparas i databasfilen, behöver bara göras en gång)."""
+        with self.writer() as conn:
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if mode.lower() != "wal":
+            log_warning(f"Databasen kunde inte växla till WAL-läge (journal_mode={mode}).")
+        return mode
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                try:
+                    return self._connect(read_only=True)
+                except sqlite3.Error:
+                    self._created -= 1
+                    raise
+
+        #Poolen är full: vänta på att en annan tråd lämnar tillbaka en anslutning
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ConnectionError("Timeout: ingen ledig databasanslutning i poolen.")
+
+    def _release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Lånar en läsanslutning ur poolen. Påbörjade transaktioner rullas tillbaka
+        när blocket avslutas, så att nästa låntagare får en ren anslutning.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._release(conn)
+
+    @contextmanager
+    def writer(self):
+        """
+        Lånar den enda skrivanslutningen. Skrivningar från olika trådar körs en i taget,
+        så att de inte konkurrerar om skrivlåset och ger 'database is locked'.
+        Ej committade ändringar rullas tillbaka när blocket avslutas.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+
+    def close_all(self):
+        """Stänger alla lediga anslutningar och skrivanslutningen (anropas vid programavslut)."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    Returnerar processens anslutningspool. Vid första anropet kontrolleras
+    databasfilen, WAL slås på och databasstrukturen initieras (exakt en gång per process).
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+
+        db_path = _resolve_db_path()
+        log_info(f"Försöker ansluta till databas: {db_path}")
+
+        if not os.path.exists(db_path):
+            log_error(f"FATAL: Databasfilen hittades INTE på förväntad sökväg: {db_path}")
+            raise FileNotFoundError(f"Databasfilen hittades inte. Sökväg: {db_path}")
+
+        pool = ConnectionPool(db_path)
+        try:
+            pool.enable_wal()
+            with pool.writer() as conn:
+                #Initierar databasstrukturen (inklusive initial fyllning)
+                _initialize_database(conn)
+        except sqlite3.Error as e:
+            pool.close_all()
+            log_error(f"Kritiskt SQLite fel vid anslutning: {e}")
+            raise ConnectionError(f"Kunde inte ansluta till databasen: {e}")
+
+        atexit.register(pool.close_all)
+        _pool = pool
+        return _pool
+
 
 def get_product_info(product_name):
     """
     Hämtar produktinformation (Namn, Antal, Lagerplats) baserat på produktnamn eller artikelnummer.
     """
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception as e:
         log_error(f"Anslutning misslyckades vid get_product_info: {e}")
         raise ConnectionError(f"Kunde inte ansluta till databasen: {e}")
     
-    cursor = conn.cursor()
-    p_lower = product_name.lower()
-    
-    #Använder INNER JOIN och söker i både namn och artikelnummer
-    cursor.execute(f"""
-        SELECT 
-            p.{COL_NAME} AS name, 
-            l.{COL_STOCK} AS stock, 
-            l.{COL_LOCATION} AS location
-        FROM {PRODUCTS_TABLE} p
-        INNER JOIN {STOCK_TABLE} l ON p.{COL_PRODID} = l.{COL_PRODID}
-        WHERE LOWER(p.{COL_NAME}) = LOWER(?)
-        OR LOWER(p.{COL_NAME}) LIKE ?
-        OR p.{COL_ARTICLENUMBER} = ?  -- NY SÖKNING PÅ ARTIKELNUMMER
-    """, (p_lower, '%' + p_lower + '%', product_name)) 
-    
-    matched_products = cursor.fetchall()
-    conn.close()
+    with pool.connection() as conn:
+        #Söker i både namn och artikelnummer via minnesindexet
+        matched_products = product_resolver.find(conn, product_name)
 
-    if len(matched_products) == 1:
-        return matched_products[0]
-    elif len(matched_products) > 1:
+        if len(matched_products) == 1:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT 
+                    p.{COL_NAME} AS name, 
+                    l.{COL_STOCK} AS stock, 
+                    l.{COL_LOCATION} AS location
+                FROM {PRODUCTS_TABLE} p
+                INNER JOIN {STOCK_TABLE} l ON p.{COL_PRODID} = l.{COL_PRODID}
+                WHERE p.{COL_PRODID} = ?
+            """, (matched_products[0].product_id,))
+            product = cursor.fetchone()
+            if product is not None:
+                return product
+
+    if len(matched_products) > 1:
         raise ValueError(f"Tvetydig sökning efter '{product_name}'. Vänligen specificera.") 
     else:
         raise ValueError(f"Produkt '{product_name}' hittades inte i lagret.")
@@ -146,41 +536,30 @@ def get_product_info(product_name):
 def get_product_history(product_name):
     """Hämtar historik (datum och lagersaldo) för en specifik produkt."""
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception:
         return []
         
-    cursor = conn.cursor()
-    
-    #Hittar exakt namn från Produkter baserat på användarens inmatning
-    cursor.execute(f"""
-        SELECT {COL_NAME} 
-        FROM {PRODUCTS_TABLE} 
-        WHERE LOWER({COL_NAME}) = LOWER(?) 
-        OR LOWER({COL_NAME}) LIKE ?
-        OR {COL_ARTICLENUMBER} = ?
-    """, (product_name.lower(), '%' + product_name.lower() + '%', product_name))
-    
-    matched_products = cursor.fetchall()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        #Hittar exakt namn från Produkter baserat på användarens inmatning
+        matched_products = product_resolver.find(conn, product_name)
 
-    if not matched_products or len(matched_products) > 1:
-        #Stoppar om ingen match eller tvetydig match (returnerar tom lista)
-        conn.close()
-        return []
+        if not matched_products or len(matched_products) > 1:
+            #Stoppar om ingen match eller tvetydig match (returnerar tom lista)
+            return []
+            
+        #Hämtar historik via ProduktID (indexerad), sorterat efter datum (senaste sist)
+        cursor.execute(f"""
+            SELECT date, quantity 
+            FROM {HISTORY_TABLE} 
+            WHERE {COL_PRODID} = ? 
+            ORDER BY date ASC, id ASC
+        """, (matched_products[0].product_id,))
         
-    #Använder det exakta namnet för sökning i historiktabellen
-    exact_name = matched_products[0][COL_NAME]
+        history = cursor.fetchall()
 
-    #Hämtar historik baserat på det exakta produktnamnet, sorterat efter datum (senaste sist)
-    cursor.execute(f"""
-        SELECT date, quantity 
-        FROM {HISTORY_TABLE} 
-        WHERE product_name = ? 
-        ORDER BY date ASC
-    """, (exact_name,))
-    
-    history = cursor.fetchall()
-    conn.close()
     return [dict(row) for row in history] #Konverterar till lista av dicts för enkel användning
     
 def update_product_stock(product_name, new_stock):
@@ -191,45 +570,126 @@ def update_product_stock(product_name, new_stock):
     """
     log_info(f"Försöker uppdatera '{product_name}' till {new_stock} st.")
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception as e:
         log_error(f"Databasanslutning misslyckades: {e}")
         raise ValueError(f"Kunde inte ansluta till databasen för uppdatering: {e}")
         
-    cursor = conn.cursor()
-    
-    #Hitta ProduktID och exakt namn
-    cursor.execute(f"""
-        SELECT {COL_PRODID}, {COL_NAME} 
-        FROM {PRODUCTS_TABLE} 
-        WHERE LOWER({COL_NAME}) = LOWER(?) 
-        OR LOWER({COL_NAME}) LIKE ?
-        OR {COL_ARTICLENUMBER} = ?
-    """, (product_name.lower(), '%' + product_name.lower() + '%', product_name))
-    matched_products = cursor.fetchall()
-
-    if len(matched_products) == 1:
-        product_id = matched_products[0][COL_PRODID]
-        exact_name = matched_products[0][COL_NAME]
-        
-        #Uppdatera Antal i tabellen Lager, kopplat till ProduktID
-        cursor.execute(f"UPDATE {STOCK_TABLE} SET {COL_STOCK} = ? WHERE {COL_PRODID} = ?", (new_stock, product_id))
-        
-        #Logga transaktion i Produkt_historik
-        cursor.execute(f"INSERT INTO {HISTORY_TABLE} (product_name, date, quantity) VALUES (?, DATE('now'), ?)", (exact_name, new_stock))
+    with pool.writer() as conn:
+        cursor = conn.cursor()
         
-        conn.commit()
-        conn.close()
-        log_info(f"Uppdatering lyckades för '{exact_name}'. Nytt saldo: {new_stock}. Historik loggad.")
-        return exact_name
-    elif len(matched_products) > 1:
-        conn.close()
-        log_warning(f"Tvetydig sökning för: {product_name}")
-        raise ValueError("Tvetydig produkt. Uppdateringen avbröts. Var vänlig specificera produktnamnet mer exakt.")
-    else:
-        conn.close()
-        log_warning(f"Produkt hittades inte: {product_name}")
-        raise ValueError(f"Produkt '{product_name}' hittades inte.")
+        #Hitta ProduktID och exakt namn
+        matched_products = product_resolver.find(conn, product_name)
+
+        if len(matched_products) == 1:
+            product_id = matched_products[0].product_id
+            exact_name = matched_products[0].name
+            
+            previous_stock = _latest_stock_in_history(cursor, product_id)
+
+            #Uppdatera Antal i tabellen Lager, kopplat till ProduktID
+            cursor.execute(f"UPDATE {STOCK_TABLE} SET {COL_STOCK} = ? WHERE {COL_PRODID} = ?", (new_stock, product_id))
+            
+            #Logga transaktion i Produkt_historik
+            cursor.execute(f"INSERT INTO {HISTORY_TABLE} ({COL_PRODID}, product_name, date, quantity) VALUES (?, ?, DATE('now'), ?)", (product_id, exact_name, new_stock))
+
+            #Ett minskat saldo räknas som uttag i förbrukningstabellerna (samma transaktion)
+            if previous_stock is not None and new_stock < previous_stock:
+                _record_consumption(cursor, [(product_id, exact_name, previous_stock - new_stock)])
+            
+            conn.commit()
+            log_info(f"Uppdatering lyckades för '{exact_name}'. Nytt saldo: {new_stock}. Historik loggad.")
+            return exact_name
+        elif len(matched_products) > 1:
+            log_warning(f"Tvetydig sökning för: {product_name}")
+            raise ValueError("Tvetydig produkt. Uppdateringen avbröts. Var vänlig specificera produktnamnet mer exakt.")
+        else:
+            log_warning(f"Produkt hittades inte: {product_name}")
+            raise ValueError(f"Produkt '{product_name}' hittades inte.")
+
+
+def bulk_update_stock(items, exact=False):
+    """
+    Uppdaterar lagersaldo för många produkter i en enda transaktion (t.ex. efter inventering).
+    Sökorden löses upp exakt (artikelnummer, sedan namn); bara om inget matchar exakt och
+    exact är False används delsträngssökning som i update_stock.
+
+    Args:
+        items: Itererbar av (produktnamn eller artikelnummer, nytt saldo).
+        exact: True = ingen delsträngssökning (t.ex. vid import från fil).
+
+    Returns:
+        (updated, failed) där updated är en lista av (exakt namn, nytt saldo)
+        och failed en lista av (position i items, sökord, felorsak) för rader som inte kunde tillämpas.
+    """
+    try:
+        pool = get_connection_pool()
+    except Exception as e:
+        log_error(f"Databasanslutning misslyckades vid massuppdatering: {e}")
+        raise ValueError(f"Kunde inte ansluta till databasen för massuppdatering: {e}")
+
+    updated = []
+    failed = []
+
+    with pool.writer() as conn:
+        cursor = conn.cursor()
+
+        #Löser upp alla sökord mot minnesindexet i ett svep
+        resolved = []
+        for position, (key, new_stock) in enumerate(items):
+            key = str(key).strip()
+            try:
+                new_stock = int(new_stock)
+            except (TypeError, ValueError):
+                failed.append((position, key, f"Ogiltigt saldo '{new_stock}'."))
+                continue
+            if new_stock < 0:
+                failed.append((position, key, "Lagersaldo kan inte vara negativt."))
+                continue
+
+            matched_products = product_resolver.find_exact(conn, key) if key else []
+            if not matched_products and key and not exact:
+                #Handskrivna rader får ange en del av namnet, som i uppdatera
+                matched_products = product_resolver.find(conn, key)
+            if len(matched_products) == 1:
+                resolved.append((matched_products[0], new_stock))
+            elif len(matched_products) > 1:
+                failed.append((position, key, "Tvetydig produkt."))
+            else:
+                failed.append((position, key, "Produkten hittades inte."))
+
+        if not resolved:
+            return updated, failed
+
+        previous = _latest_stocks_in_history(cursor, {match.product_id for match, _ in resolved})
+
+        stock_rows = []
+        history_rows = []
+        consumption = []
+        for match, new_stock in resolved:
+            #Samma produkt kan förekomma flera gånger: jämför mot föregående rad i batchen
+            previous_stock = previous.get(match.product_id)
+            if previous_stock is not None and new_stock < previous_stock:
+                consumption.append((match.product_id, match.name, previous_stock - new_stock))
+            previous[match.product_id] = new_stock
+
+            stock_rows.append((new_stock, match.product_id))
+            history_rows.append((match.product_id, match.name, new_stock))
+            updated.append((match.name, new_stock))
+
+        try:
+            cursor.executemany(f"UPDATE {STOCK_TABLE} SET {COL_STOCK} = ? WHERE {COL_PRODID} = ?", stock_rows)
+            cursor.executemany(f"INSERT INTO {HISTORY_TABLE} ({COL_PRODID}, product_name, date, quantity) VALUES (?, ?, DATE('now'), ?)", history_rows)
+            if consumption:
+                _record_consumption(cursor, consumption)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            log_error(f"SQLite fel vid massuppdatering: {e}")
+            raise ValueError(f"Databasfel: Massuppdateringen avbröts ({e}).")
+
+    log_info(f"Massuppdatering klar: {len(updated)} rader uppdaterade, {len(failed)} misslyckades.")
+    return updated, failed
 
 
 def add_new_product_and_stock(product_name, initial_stock, location, specifications="", article_number="", category_id=1, supplier_id=1, unit="st"):
@@ -243,254 +703,383 @@ def add_new_product_and_stock(product_name, initial_stock, location, specificati
         raise ValueError("Initialt saldo måste vara noll (0) eller positivt.")
 
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception as e:
         log_error(f"Databasanslutning misslyckades vid tillägg av produkt: {e}")
         raise ValueError("Kunde inte ansluta till databasen för att lägga till produkt.")
 
-    cursor = conn.cursor()
+    with pool.writer() as conn:
+        cursor = conn.cursor()
 
-    try:
-        #Kontrollerar om produkten redan finns ELLER om artikelnumret redan används
-        cursor.execute(f"SELECT {COL_NAME} FROM {PRODUCTS_TABLE} WHERE LOWER({COL_NAME}) = LOWER(?) OR {COL_ARTICLENUMBER} = ?", 
-                       (product_name, article_number))
-        if cursor.fetchone():
-            conn.close()
-            raise ValueError(f"Produktnamn '{product_name}' eller Artikelnummer '{article_number}' existerar redan i databasen.")
+        try:
+            #Kontrollerar om produkten redan finns ELLER om artikelnumret redan används
+            if product_resolver.exists(conn, product_name, article_number):
+                raise ValueError(f"Produktnamn '{product_name}' eller Artikelnummer '{article_number}' existerar redan i databasen.")
 
-        #INSERT i Produkter-tabellen 
-        cursor.execute(f"""
-            INSERT INTO {PRODUCTS_TABLE} ({COL_NAME}, Specifikationer, Artikelnummer, KategoriID, LeverantorID, Enhet) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (product_name, specifications, article_number, category_id, supplier_id, unit))
+            #INSERT i Produkter-tabellen 
+            cursor.execute(f"""
+                INSERT INTO {PRODUCTS_TABLE} ({COL_NAME}, Specifikationer, Artikelnummer, KategoriID, LeverantorID, Enhet) 
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (product_name, specifications, article_number, category_id, supplier_id, unit))
 
-        #Hämtar det senast infogade ProduktID
-        new_product_id = cursor.lastrowid
-        if not new_product_id:
-            raise Exception("Kunde inte hämta det nya ProduktID:t efter infogning i Produkter.")
+            #Hämtar det senast infogade ProduktID
+            new_product_id = cursor.lastrowid
+            if not new_product_id:
+                raise Exception("Kunde inte hämta det nya ProduktID:t efter infogning i Produkter.")
 
-        #INSERT i Lager-tabellen, med det nya ProduktID:t
-        cursor.execute(f"""
-            INSERT INTO {STOCK_TABLE} ({COL_PRODID}, {COL_STOCK}, {COL_LOCATION}) 
-            VALUES (?, ?, ?)
-        """, (new_product_id, initial_stock, location))
+            #INSERT i Lager-tabellen, med det nya ProduktID:t
+            cursor.execute(f"""
+                INSERT INTO {STOCK_TABLE} ({COL_PRODID}, {COL_STOCK}, {COL_LOCATION}) 
+                VALUES (?, ?, ?)
+            """, (new_product_id, initial_stock, location))
 
-        #Logga initialt saldo i Produkt_historik
-        cursor.execute(f"""
-            INSERT INTO {HISTORY_TABLE} (product_name, date, quantity) 
-            VALUES (?, DATE('now'), ?)
-        """, (product_name, initial_stock))
+            #Logga initialt saldo i Produkt_historik
+            cursor.execute(f"""
+                INSERT INTO {HISTORY_TABLE} ({COL_PRODID}, product_name, date, quantity) 
+                VALUES (?, ?, DATE('now'), ?)
+            """, (new_product_id, product_name, initial_stock))
 
-        #Slutför transaktionen (MÅSTE ske efter alla inserts)
-        conn.commit()
-        log_info(f"Produkten {product_name} (ID: {new_product_id}) lades till framgångsrikt i Lager och Historik.")
-        return product_name
+            #Slutför transaktionen (MÅSTE ske efter alla inserts)
+            conn.commit()
+            product_resolver.invalidate()
+            log_info(f"Produkten {product_name} (ID: {new_product_id}) lades till framgångsrikt i Lager och Historik.")
+            return product_name
 
-    except sqlite3.Error as e:
-        conn.rollback()
-        log_error(f"SQLite fel vid tillägg av produkt: {e}")
-        raise ValueError(f"Databasfel: Kunde inte lägga till produkten ({e}).")
-    finally:
-        conn.close()
+        except sqlite3.Error as e:
+            conn.rollback()
+            log_error(f"SQLite fel vid tillägg av produkt: {e}")
+            raise ValueError(f"Databasfel: Kunde inte lägga till produkten ({e}).")
 
 
 def get_low_stock_products(threshold=10):
     """Hämtar en lista över alla produkter med lagersaldo under en given tröskel."""
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception:
         return []
 
-    cursor = conn.cursor()
-    
-    #Använder INNER JOIN mellan Produkter (p) och Lager (l) på ProduktID
-    cursor.execute(f"""
-        SELECT 
-            p.{COL_NAME} AS name, 
-            l.{COL_STOCK} AS stock, 
-            l.{COL_LOCATION} AS location
-        FROM {PRODUCTS_TABLE} p
-        INNER JOIN {STOCK_TABLE} l ON p.{COL_PRODID} = l.{COL_PRODID}
-        WHERE l.{COL_STOCK} <= ?
-    """, (threshold,))
-    
-    products = cursor.fetchall()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        #Använder INNER JOIN mellan Produkter (p) och Lager (l) på ProduktID
+        cursor.execute(f"""
+            SELECT 
+                p.{COL_NAME} AS name, 
+                l.{COL_STOCK} AS stock, 
+                l.{COL_LOCATION} AS location
+            FROM {PRODUCTS_TABLE} p
+            INNER JOIN {STOCK_TABLE} l ON p.{COL_PRODID} = l.{COL_PRODID}
+            WHERE l.{COL_STOCK} <= ?
+        """, (threshold,))
+        
+        products = cursor.fetchall()
     
     #Returnerar en lista av dicts för enkel hantering i commands.py
     return [dict(p) for p in products]
 
-def get_top_selling_products(limit=5):
+def get_top_selling_products(limit=5, period_type=None, period=None):
     """
-    Beräknar och returnerar de N (limit) produkter som haft störst nettouttag 
-    (minskat saldo) över hela den tillgängliga historiken.
+    Returnerar de N (limit) produkter som haft störst nettouttag (minskat saldo).
+    Utan period gäller hela historiken; med period_type ('dag' eller 'vecka') och
+    period (t.ex. '2025-10-06' eller '2025-W40') gäller bara den perioden.
+    Läser de inkrementellt uppdaterade förbrukningstabellerna.
     """
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception:
         return []
 
-    cursor = conn.cursor()
-    
-    #Kärnlogik SQL-fråga beräknar den totala minskningen i saldo per produkt.
-    cursor.execute(f"""
-        WITH StockChanges AS (
-            SELECT
-                product_name,
-                quantity,
-                -- Hämta föregående saldo för samma produkt, sorterat efter datum
-                LAG(quantity, 1, quantity) OVER (
-                    PARTITION BY product_name 
-                    ORDER BY date
-                ) AS previous_quantity
-            FROM {HISTORY_TABLE}
-        )
-        -- Summera den totala förbrukningen (endast när saldot har minskat)
-        SELECT
-            product_name AS name,
-            SUM(CASE 
-                WHEN quantity < previous_quantity THEN previous_quantity - quantity 
-                ELSE 0 
-            END) AS total_consumption
-        FROM StockChanges
-        GROUP BY product_name
-        HAVING total_consumption > 0 -- Filtrera bort produkter som aldrig har förbrukats
-        ORDER BY total_consumption DESC -- Störst förbrukning först
-        LIMIT ?
-    """, (limit,))
-    
-    top_products = cursor.fetchall()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        if period_type is None:
+            #Indexerad läsning av den löpande totalen per produkt
+            cursor.execute(f"""
+                SELECT
+                    COALESCE(p.{COL_NAME}, f.product_name) AS name,
+                    f.total_consumption
+                FROM {CONSUMPTION_TABLE} f
+                LEFT JOIN {PRODUCTS_TABLE} p ON p.{COL_PRODID} = f.{COL_PRODID}
+                WHERE f.total_consumption > 0 -- Filtrera bort produkter som aldrig har förbrukats
+                ORDER BY f.total_consumption DESC -- Störst förbrukning först
+                LIMIT ?
+            """, (limit,))
+        else:
+            cursor.execute(f"""
+                SELECT
+                    COALESCE(p.{COL_NAME}, t.product_name) AS name,
+                    f.consumption AS total_consumption
+                FROM {CONSUMPTION_PERIOD_TABLE} f
+                LEFT JOIN {PRODUCTS_TABLE} p ON p.{COL_PRODID} = f.{COL_PRODID}
+                LEFT JOIN {CONSUMPTION_TABLE} t ON t.{COL_PRODID} = f.{COL_PRODID}
+                WHERE f.period_type = ? AND f.period = ? AND f.consumption > 0
+                ORDER BY f.consumption DESC
+                LIMIT ?
+            """, (period_type, period, limit))
+        
+        top_products = cursor.fetchall()
     
     #Returnerar en lista av dicts
     return [dict(p) for p in top_products]
 
+def get_daily_consumption(days, product_ids=None, chunk_size=500):
+    """
+    Hämtar förbrukningen per dag de senaste days dagarna, för alla produkter i ett anrop
+    eller bara för product_ids. Varje produkt i lagret ger minst en rad; produkter utan
+    uttag har date = None.
+
+    Returns:
+        Lista av (ProduktID, namn, saldo, datum, uttag), sorterad på ProduktID.
+    """
+    try:
+        pool = get_connection_pool()
+    except Exception:
+        return []
+
+    query = f"""
+        SELECT p.{COL_PRODID}, p.{COL_NAME}, l.{COL_STOCK}, f.period, f.consumption
+        FROM {PRODUCTS_TABLE} p
+        INNER JOIN {STOCK_TABLE} l ON l.{COL_PRODID} = p.{COL_PRODID}
+        LEFT JOIN {CONSUMPTION_PERIOD_TABLE} f
+            ON f.{COL_PRODID} = p.{COL_PRODID}
+            AND f.period_type = '{PERIOD_DAY}'
+            AND f.period > DATE('now', ?)
+        {{where}}
+        ORDER BY p.{COL_PRODID}
+    """
+    since = f"-{int(days)} days"
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        if product_ids is None:
+            cursor.execute(query.format(where=""), (since,))
+            return [tuple(row) for row in cursor.fetchall()]
+
+        product_ids = sorted(set(product_ids))
+        rows = []
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(query.format(where=f"WHERE p.{COL_PRODID} IN ({placeholders})"), (since, *chunk))
+            rows.extend(tuple(row) for row in cursor.fetchall())
+        return rows
+
+
+def get_projection_state():
+    """
+    Hur långt prognostabellen är uppdaterad: {"last_history_id", "last_full_refresh",
+    "max_history_id"} (senaste historikraden i databasen just nu).
+    """
+    pool = get_connection_pool()
+    with pool.connection() as conn:
+        state = conn.execute(f"SELECT last_history_id, last_full_refresh FROM {PROJECTION_STATE_TABLE} WHERE id = 1").fetchone()
+        max_history_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {HISTORY_TABLE}").fetchone()[0]
+    return {
+        "last_history_id": state["last_history_id"],
+        "last_full_refresh": state["last_full_refresh"],
+        "max_history_id": max_history_id,
+    }
+
+
+def get_products_with_new_history(since_history_id, until_history_id):
+    """ProduktID för produkter med historikrader i intervallet (since, until]."""
+    pool = get_connection_pool()
+    with pool.connection() as conn:
+        rows = conn.execute(f"""
+            SELECT DISTINCT {COL_PRODID} FROM {HISTORY_TABLE}
+            WHERE id > ? AND id <= ? AND {COL_PRODID} IS NOT NULL
+        """, (since_history_id, until_history_id)).fetchall()
+    return [row[0] for row in rows]
+
+
+def save_projections(rows, history_id, computed_at, full_refresh=False):
+    """
+    Skriver prognoser och flyttar fram historikmarkeringen i samma transaktion.
+
+    Args:
+        rows: Lista av (ProduktID, förbrukning per dag, prognos för horisonten,
+              dagar tills saldot tar slut eller None, föreslagen beställning, metod).
+        history_id: Senaste historikraden som prognoserna bygger på.
+        computed_at: Beräkningstid (UTC, PROJECTION_TIME_FORMAT) för raderna och, vid
+                     full_refresh, för den senaste fullständiga omräkningen.
+        full_refresh: True om alla produkter räknades om (borttagna produkter rensas då).
+    """
+    pool = get_connection_pool()
+    with pool.writer() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(f"""
+                INSERT INTO {PROJECTION_TABLE}
+                    ({COL_PRODID}, daily_consumption, forecast, days_until_stockout, reorder_quantity, method, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT({COL_PRODID}) DO UPDATE SET
+                    daily_consumption = excluded.daily_consumption,
+                    forecast = excluded.forecast,
+                    days_until_stockout = excluded.days_until_stockout,
+                    reorder_quantity = excluded.reorder_quantity,
+                    method = excluded.method,
+                    computed_at = excluded.computed_at
+            """, [row + (computed_at,) for row in rows])
+            if full_refresh:
+                cursor.execute(f"DELETE FROM {PROJECTION_TABLE} WHERE {COL_PRODID} NOT IN (SELECT {COL_PRODID} FROM {PRODUCTS_TABLE})")
+                cursor.execute(f"UPDATE {PROJECTION_STATE_TABLE} SET last_history_id = ?, last_full_refresh = ? WHERE id = 1", (history_id, computed_at))
+            else:
+                cursor.execute(f"UPDATE {PROJECTION_STATE_TABLE} SET last_history_id = ? WHERE id = 1", (history_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            log_error(f"SQLite fel vid sparande av prognoser: {e}")
+            raise
+
+
+def get_projection(product_name):
+    """
+    Förberäknad prognos för en produkt (namn, saldo, förbrukning, prognos, dagar tills
+    saldot tar slut, föreslagen beställning, metod, beräkningstid), eller None om
+    produkten inte har räknats än.
+    """
+    pool = get_connection_pool()
+    with pool.connection() as conn:
+        matched_products = product_resolver.find(conn, product_name)
+        if len(matched_products) > 1:
+            raise ValueError(f"Tvetydig sökning efter '{product_name}'. Vänligen specificera.")
+        if not matched_products:
+            raise ValueError(f"Produkt '{product_name}' hittades inte i lagret.")
+
+        row = conn.execute(f"""
+            SELECT
+                p.{COL_NAME} AS name,
+                l.{COL_STOCK} AS stock,
+                f.daily_consumption, f.forecast, f.days_until_stockout,
+                f.reorder_quantity, f.method, f.computed_at
+            FROM {PROJECTION_TABLE} f
+            INNER JOIN {PRODUCTS_TABLE} p ON p.{COL_PRODID} = f.{COL_PRODID}
+            INNER JOIN {STOCK_TABLE} l ON l.{COL_PRODID} = f.{COL_PRODID}
+            WHERE f.{COL_PRODID} = ?
+        """, (matched_products[0].product_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_stockout_risks(max_days):
+    """Produkter som enligt prognostabellen tar slut inom max_days dagar, snabbast först."""
+    try:
+        pool = get_connection_pool()
+    except Exception:
+        return []
+
+    with pool.connection() as conn:
+        rows = conn.execute(f"""
+            SELECT
+                p.{COL_NAME} AS name,
+                l.{COL_STOCK} AS stock,
+                l.{COL_LOCATION} AS location,
+                f.days_until_stockout,
+                f.reorder_quantity
+            FROM {PROJECTION_TABLE} f
+            INNER JOIN {PRODUCTS_TABLE} p ON p.{COL_PRODID} = f.{COL_PRODID}
+            INNER JOIN {STOCK_TABLE} l ON l.{COL_PRODID} = f.{COL_PRODID}
+            WHERE f.days_until_stockout <= ?
+            ORDER BY f.days_until_stockout
+        """, (max_days,)).fetchall()
+    return [dict(row) for row in rows]
+
 def change_product_location(product_name, new_location):
     """Ändrar lagerplats för en befintlig produkt."""
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception as e:
         raise ValueError(f"Kunde inte ansluta till databasen för platsändring: {e}")
 
-    cursor = conn.cursor()
+    with pool.writer() as conn:
+        cursor = conn.cursor()
 
-    #Hittar ProduktID och exakt namn (Sök på Namn OCH Artikelnummer)
-    cursor.execute(f"""
-        SELECT {COL_PRODID}, {COL_NAME} 
-        FROM {PRODUCTS_TABLE} 
-        WHERE LOWER({COL_NAME}) = LOWER(?) 
-        OR LOWER({COL_NAME}) LIKE ? 
-        OR {COL_ARTICLENUMBER} = ?
-    """, (product_name.lower(), '%' + product_name.lower() + '%', product_name))
-    matched_products = cursor.fetchall()
-
-    if len(matched_products) == 1:
-        product_id = matched_products[0][COL_PRODID]
-        exact_name = matched_products[0][COL_NAME]
-
-        #Uppdaterar Lagerplats i tabellen Lager
-        cursor.execute(f"UPDATE {STOCK_TABLE} SET {COL_LOCATION} = ? WHERE {COL_PRODID} = ?", (new_location, product_id))
-        
-        conn.commit()
-        conn.close()
-        log_info(f"Lagerplats lyckades ändras för '{exact_name}' till {new_location}.")
-        return exact_name
-    elif len(matched_products) > 1:
-        conn.close()
-        raise ValueError("Tvetydig produkt. Platsändring avbröts. Var vänlig specificera produktnamnet mer exakt.")
-    else:
-        conn.close()
-        raise ValueError(f"Produkt '{product_name}' hittades inte.")
+        #Hittar ProduktID och exakt namn (Sök på Namn OCH Artikelnummer)
+        matched_products = product_resolver.find(conn, product_name)
+
+        if len(matched_products) == 1:
+            product_id = matched_products[0].product_id
+            exact_name = matched_products[0].name
+
+            #Uppdaterar Lagerplats i tabellen Lager
+            cursor.execute(f"UPDATE {STOCK_TABLE} SET {COL_LOCATION} = ? WHERE {COL_PRODID} = ?", (new_location, product_id))
+            
+            conn.commit()
+            log_info(f"Lagerplats lyckades ändras för '{exact_name}' till {new_location}.")
+            return exact_name
+        elif len(matched_products) > 1:
+            raise ValueError("Tvetydig produkt. Platsändring avbröts. Var vänlig specificera produktnamnet mer exakt.")
+        else:
+            raise ValueError(f"Produkt '{product_name}' hittades inte.")
 
 def remove_product(product_name):
     """Tar bort en produkt från Lager och Produkt-tabellerna (avveckling)."""
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception as e:
         raise ValueError(f"Kunde inte ansluta till databasen för borttagning: {e}")
 
-    cursor = conn.cursor()
+    with pool.writer() as conn:
+        cursor = conn.cursor()
 
-    #Hittar ProduktID och exakt namn (Sök på Namn OCH Artikelnummer)
-    cursor.execute(f"""
-        SELECT {COL_PRODID}, {COL_NAME} 
-        FROM {PRODUCTS_TABLE} 
-        WHERE LOWER({COL_NAME}) = LOWER(?) 
-        OR LOWER({COL_NAME}) LIKE ? 
-        OR {COL_ARTICLENUMBER} = ?
-    """, (product_name.lower(), '%' + product_name.lower() + '%', product_name))
-    matched_products = cursor.fetchall()
-
-    if len(matched_products) == 1:
-        product_id = matched_products[0][COL_PRODID]
-        exact_name = matched_products[0][COL_NAME]
-
-        #Transaktionell borttagning
-        try:
-            #Ta bort från Lager-tabellen
-            cursor.execute(f"DELETE FROM {STOCK_TABLE} WHERE {COL_PRODID} = ?", (product_id,))
-            
-            #Ta bort från Produkter-tabellen
-            cursor.execute(f"DELETE FROM {PRODUCTS_TABLE} WHERE {COL_PRODID} = ?", (product_id,))
-            
-            conn.commit()
-            log_info(f"Produkten '{exact_name}' (ID: {product_id}) togs bort permanent från Lager och Produkter.")
-            return exact_name
-        except sqlite3.Error as e:
-            conn.rollback()
-            raise ValueError(f"Databasfel vid borttagning av produkt: {e}")
-        finally:
-            conn.close()
-    elif len(matched_products) > 1:
-        conn.close()
-        raise ValueError("Tvetydig produkt. Borttagning avbröts. Var vänlig specificera produktnamnet mer exakt.")
-    else:
-        conn.close()
-        raise ValueError(f"Produkt '{product_name}' hittades inte.")
+        #Hittar ProduktID och exakt namn (Sök på Namn OCH Artikelnummer)
+        matched_products = product_resolver.find(conn, product_name)
+
+        if len(matched_products) == 1:
+            product_id = matched_products[0].product_id
+            exact_name = matched_products[0].name
+
+            #Transaktionell borttagning
+            try:
+                #Ta bort från Lager-tabellen
+                cursor.execute(f"DELETE FROM {STOCK_TABLE} WHERE {COL_PRODID} = ?", (product_id,))
+                
+                #Ta bort från Produkter-tabellen
+                cursor.execute(f"DELETE FROM {PRODUCTS_TABLE} WHERE {COL_PRODID} = ?", (product_id,))
+                
+                conn.commit()
+                product_resolver.invalidate()
+                log_info(f"Produkten '{exact_name}' (ID: {product_id}) togs bort permanent från Lager och Produkter.")
+                return exact_name
+            except sqlite3.Error as e:
+                conn.rollback()
+                raise ValueError(f"Databasfel vid borttagning av produkt: {e}")
+        elif len(matched_products) > 1:
+            raise ValueError("Tvetydig produkt. Borttagning avbröts. Var vänlig specificera produktnamnet mer exakt.")
+        else:
+            raise ValueError(f"Produkt '{product_name}' hittades inte.")
 
 def rename_product(old_name, new_name):
-    """Ändrar namnet på en produkt i Produkter-tabellen och uppdaterar historiktabellen."""
+    """Ändrar namnet på en produkt i Produkter-tabellen. Historiken följer med via ProduktID."""
     try:
-        conn = get_db_connection()
+        pool = get_connection_pool()
     except Exception as e:
         raise ValueError(f"Kunde inte ansluta till databasen för namnbyte: {e}")
 
-    cursor = conn.cursor()
+    with pool.writer() as conn:
+        cursor = conn.cursor()
 
-    #Hittar ProduktID och exakt gammalt namn (Sök på Namn OCH Artikelnummer)
-    cursor.execute(f"""
-        SELECT {COL_PRODID}, {COL_NAME} 
-        FROM {PRODUCTS_TABLE} 
-        WHERE LOWER({COL_NAME}) = LOWER(?) 
-        OR LOWER({COL_NAME}) LIKE ? 
-        OR {COL_ARTICLENUMBER} = ?
-    """, (old_name.lower(), '%' + old_name.lower() + '%', old_name))
-    matched_products = cursor.fetchall()
-
-    if len(matched_products) == 1:
-        product_id = matched_products[0][COL_PRODID]
-        exact_old_name = matched_products[0][COL_NAME]
-
-        #Transaktionellt namnbyte
-        try:
-            #Steg 2: Uppdatera namnet i Produkter-tabellen
-            cursor.execute(f"UPDATE {PRODUCTS_TABLE} SET {COL_NAME} = ? WHERE {COL_PRODID} = ?", (new_name, product_id))
+        #Hittar ProduktID och exakt gammalt namn (Sök på Namn OCH Artikelnummer)
+        matched_products = product_resolver.find(conn, old_name)
 
-            #Uppdatera namnet i Historik-tabellen (för att bevara historisk data)
-            cursor.execute(f"UPDATE {HISTORY_TABLE} SET product_name = ? WHERE product_name = ?", (new_name, exact_old_name))
+        if len(matched_products) == 1:
+            product_id = matched_products[0].product_id
+            exact_old_name = matched_products[0].name
 
-            conn.commit()
-            log_info(f"Produktnamn ändrat från '{exact_old_name}' till '{new_name}'. Historik uppdaterad.")
-            return exact_old_name, new_name
-        except sqlite3.Error as e:
-            conn.rollback()
-            raise ValueError(f"Databasfel vid namnbyte av produkt: {e}")
-        finally:
-            conn.close()
+            #Transaktionellt namnbyte
+            try:
+                #Steg 2: Uppdatera namnet i Produkter-tabellen
+                cursor.execute(f"UPDATE {PRODUCTS_TABLE} SET {COL_NAME} = ? WHERE {COL_PRODID} = ?", (new_name, product_id))
 
-    elif len(matched_products) > 1:
-        conn.close()
-        raise ValueError("Tvetydig produkt. Namnbyte avbröts. Var vänlig specificera det gamla produktnamnet mer exakt.")
-    else:
-        conn.close()
-        raise ValueError(f"Produkt '{old_name}' hittades inte.")
+                #Historiken är kopplad via ProduktID och behöver inte skrivas om
+                conn.commit()
+                product_resolver.invalidate()
+                log_info(f"Produktnamn ändrat från '{exact_old_name}' till '{new_name}'.")
+                return exact_old_name, new_name
+            except sqlite3.Error as e:
+                conn.rollback()
+                raise ValueError(f"Databasfel vid namnbyte av produkt: {e}")
+
+        elif len(matched_products) > 1:
+            raise ValueError("Tvetydig produkt. Namnbyte avbröts. Var vänlig specificera det gamla produktnamnet mer exakt.")
+        else:
+            raise ValueError(f"Produkt '{old_name}' hittades inte.")
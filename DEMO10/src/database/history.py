@@ -0,0 +1,148 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.database.db import (
+    COL_NAME,
+    COL_PRODID,
+    COL_STOCK,
+    HISTORY_TABLE,
+    PRODUCTS_TABLE,
+    STOCK_TABLE,
+    get_connection_pool,
+)
+from src.database.resolver import product_resolver
+from src.utils.config import FORECAST_CONFIG
+
+#Historik som tidsserier för prognoser. Produkt_historik innehåller saldon vid varje
+#ändring (flera per dag, oregelbundna glapp); här räknas de om i SQL till uttag och
+#påfyllning per dag och fylls ut till en sammanhängande NumPy-array med en post per dag.
+
+#Saldoändringar per dag för en produkt. LAG() löper över hela historiken så att första
+#dagen i fönstret jämförs mot saldot före fönstret; minskningar är uttag, ökningar påfyllning.
+_DAILY_CHANGES_SQL = f"""
+    WITH Changes AS (
+        SELECT
+            DATE(date) AS day,
+            quantity - LAG(quantity) OVER (ORDER BY date, id) AS delta
+        FROM {HISTORY_TABLE}
+        WHERE {COL_PRODID} = ?
+    )
+    SELECT
+        day,
+        SUM(CASE WHEN delta < 0 THEN -delta ELSE 0 END) AS consumption,
+        SUM(CASE WHEN delta > 0 THEN delta ELSE 0 END) AS restock
+    FROM Changes
+    WHERE delta IS NOT NULL AND delta != 0 AND day > DATE(?, ?)
+    GROUP BY day
+    ORDER BY day
+"""
+
+#Samma beräkning för alla produkter på en gång (LAG per produkt), i get_daily_consumptions
+#radformat. Läser Produkt_historik direkt i stället för de förberäknade Forbrukning_period-raderna.
+_CATALOG_DAILY_SQL = f"""
+    WITH Changes AS (
+        SELECT
+            {COL_PRODID} AS product_id,
+            DATE(date) AS day,
+            quantity - LAG(quantity) OVER (PARTITION BY {COL_PRODID} ORDER BY date, id) AS delta
+        FROM {HISTORY_TABLE}
+        WHERE {COL_PRODID} IS NOT NULL
+    ),
+    Daily AS (
+        SELECT product_id, day, SUM(-delta) AS consumption
+        FROM Changes
+        WHERE delta < 0 AND day > DATE(?, ?) AND day <= ?
+        GROUP BY product_id, day
+    )
+    SELECT p.{COL_PRODID}, p.{COL_NAME}, l.{COL_STOCK}, d.day, d.consumption
+    FROM {PRODUCTS_TABLE} p
+    INNER JOIN {STOCK_TABLE} l ON l.{COL_PRODID} = p.{COL_PRODID}
+    LEFT JOIN Daily d ON d.product_id = p.{COL_PRODID}
+    ORDER BY p.{COL_PRODID}, d.day
+"""
+
+
+def _today():
+    #DATE('now') i SQLite är UTC
+    return np.datetime64(datetime.now(timezone.utc).date(), "D")
+
+
+def fill_days(rows, days, end=None):
+    """
+    Fyller ut (datum, uttag, påfyllning)-rader till två arrayer med en post per dag,
+    days dagar bakåt till och med end (i dag). Dagar utan rader blir 0.
+
+    Returns:
+        (första dagen som datetime64[D], uttag, påfyllning)
+    """
+    end = np.datetime64(end, "D") if end is not None else _today()
+    start = end - (days - 1)
+    consumption = np.zeros(days, dtype="float64")
+    restocks = np.zeros(days, dtype="float64")
+    if rows:
+        columns = (np.array([row[0] for row in rows], dtype="datetime64[D]") - start).astype("int64")
+        inside = (columns >= 0) & (columns < days)
+        consumption[columns[inside]] = np.array([row[1] for row in rows], dtype="float64")[inside]
+        restocks[columns[inside]] = np.array([row[2] for row in rows], dtype="float64")[inside]
+    return start, consumption, restocks
+
+
+def product_daily_series(product_name, days=None):
+    """
+    Uttag och påfyllning per dag för en produkt de senaste days dagarna (till och med i dag).
+
+    Returns:
+        dict med product_id, name, start och end (första och sista dagen), consumption och restocks
+        (float64-arrayer med en post per dag), history_rows (antal historikrader)
+        och latest_history_id (senaste historikraden; nyckel för cachade modeller).
+
+    Raises:
+        ValueError: om produkten inte hittas eller sökningen är tvetydig.
+    """
+    days = days or FORECAST_CONFIG["history_days"]
+    pool = get_connection_pool()
+
+    with pool.connection() as conn:
+        matched_products = product_resolver.find(conn, product_name)
+        if len(matched_products) > 1:
+            raise ValueError(f"Tvetydig sökning efter '{product_name}'. Vänligen specificera.")
+        if not matched_products:
+            raise ValueError(f"Produkt '{product_name}' hittades inte i lagret.")
+        product = matched_products[0]
+
+        end = _today()
+        rows = conn.execute(_DAILY_CHANGES_SQL, (product.product_id, str(end), f"-{int(days)} days")).fetchall()
+        history_rows, latest_history_id = conn.execute(
+            f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {HISTORY_TABLE} WHERE {COL_PRODID} = ?",
+            (product.product_id,),
+        ).fetchone()
+
+    start, consumption, restocks = fill_days(rows, days, end)
+    return {
+        "product_id": product.product_id,
+        "name": product.name,
+        "start": start,
+        "end": end,
+        "consumption": consumption,
+        "restocks": restocks,
+        "history_rows": history_rows,
+        "latest_history_id": latest_history_id,
+    }
+
+
+def catalog_daily_consumption(days, end=None):
+    """
+    Uttag per dag för alla produkter de senaste days dagarna till och med end (i dag),
+    beräknat direkt ur Produkt_historik. Varje produkt i lagret ger minst en rad;
+    produkter utan uttag har datum None.
+
+    Returns:
+        Lista av (ProduktID, namn, saldo, datum, uttag), sorterad på ProduktID
+        (samma format som db.get_daily_consumption, för forecast.consumption_matrix).
+    """
+    end = np.datetime64(end, "D") if end is not None else _today()
+    pool = get_connection_pool()
+    with pool.connection() as conn:
+        rows = conn.execute(_CATALOG_DAILY_SQL, (str(end), f"-{int(days)} days", str(end))).fetchall()
+    return [tuple(row) for row in rows]
@@ -0,0 +1,365 @@
+import csv
+import os
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from src.utils.logger import log_info, log_error
+from src.database.resolver import product_resolver
+from src.database.db import (
+    get_connection_pool,
+    bulk_update_stock,
+    _rebuild_consumption,
+    COL_NAME,
+    COL_STOCK,
+    COL_LOCATION,
+    COL_PRODID,
+    COL_ARTICLENUMBER,
+    PRODUCTS_TABLE,
+    STOCK_TABLE,
+    HISTORY_TABLE,
+)
+
+#Antal rader per transaktion vid import
+DEFAULT_CHUNK_SIZE = 1000
+
+#Kolumnrubriker i CSV/Excel (samma namn som i databasen)
+PRODUCT_COLUMNS = [COL_NAME, COL_STOCK, COL_LOCATION, "Specifikationer", COL_ARTICLENUMBER, "KategoriID", "LeverantorID", "Enhet"]
+HISTORY_COLUMNS = [COL_ARTICLENUMBER, COL_NAME, "Datum", COL_STOCK]
+
+
+def _iter_csv(path):
+    """Läser en CSV-fil rad för rad som dicts. Avgränsaren (',' ';' eller tab) identifieras automatiskt."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.DictReader(f, dialect=dialect):
+            yield {(key or "").strip(): (value or "").strip() for key, value in row.items()}
+
+
+def _iter_excel(path):
+    """Läser första bladet i en .xlsx-fil rad för rad (kräver openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Excel-import kräver paketet 'openpyxl' (pip install openpyxl).")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+        for values in rows:
+            yield {key: ("" if value is None else str(value).strip()) for key, value in zip(header, values)}
+    finally:
+        workbook.close()
+
+
+def iter_rows(path):
+    """Returnerar en generator över filens rader (dicts) beroende på filändelse."""
+    if not os.path.exists(path):
+        raise ValueError(f"Filen hittades inte: {path}")
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return _iter_excel(path)
+    return _iter_csv(path)
+
+
+def iter_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delar upp en radström i listor om högst chunk_size rader (begränsat minne)."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_int(value, default=None):
+    if value in (None, ""):
+        if default is None:
+            raise ValueError("värde saknas")
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    #Excel levererar ofta heltal som '12.0'; decimaltal som '1.5' avvisas i stället för att avrundas
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"'{value}' är inte ett heltal")
+    return int(number)
+
+
+def _next_product_id(cursor):
+    """Nästa lediga ProduktID, med hänsyn till AUTOINCREMENT-sekvensen."""
+    cursor.execute(f"SELECT MAX({COL_PRODID}) FROM {PRODUCTS_TABLE}")
+    max_id = cursor.fetchone()[0] or 0
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (PRODUCTS_TABLE,))
+    row = cursor.fetchone()
+    return max(max_id, row[0] if row else 0) + 1
+
+
+def import_products(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importerar nya produkter (Produkter + Lager + initial historik) från CSV/Excel.
+    Filen läses strömmande och varje chunk skrivs med executemany i en egen transaktion.
+    Produkter vars namn eller artikelnummer redan finns hoppas över.
+
+    Returns:
+        (antal importerade, lista av (radnummer, namn, felorsak))
+    """
+    pool = get_connection_pool()
+    imported = 0
+    failed = []
+    seen_names = set()
+    seen_articles = set()
+    line_no = 1
+
+    #Validering sker mot en läsanslutning; skrivlåset tas bara medan en chunk skrivs.
+    #Produktindexet byggs om en gång efter importen: nya namn och artikelnummer i filen
+    #kontrolleras mot seen_names/seen_articles i stället för mot ett nybyggt index per chunk.
+    try:
+        with pool.connection() as conn:
+            for chunk in iter_chunks(iter_rows(path), chunk_size):
+                valid = []
+                for row in chunk:
+                    line_no += 1
+                    name = row.get(COL_NAME, "")
+                    article = row.get(COL_ARTICLENUMBER, "")
+                    try:
+                        stock = _parse_int(row.get(COL_STOCK), default=0)
+                        category_id = _parse_int(row.get("KategoriID"), default=1)
+                        supplier_id = _parse_int(row.get("LeverantorID"), default=1)
+                    except ValueError as e:
+                        failed.append((line_no, name, f"Ogiltigt tal ({e})."))
+                        continue
+
+                    if not name:
+                        failed.append((line_no, article, "Namn saknas."))
+                    elif stock < 0:
+                        failed.append((line_no, name, "Saldo kan inte vara negativt."))
+                    elif (name.lower() in seen_names or (article and article in seen_articles)
+                          or product_resolver.exists(conn, name, article)):
+                        failed.append((line_no, name, f"'{name}' eller artikelnummer '{article}' finns redan."))
+                    else:
+                        seen_names.add(name.lower())
+                        if article:
+                            seen_articles.add(article)
+                        valid.append((name, stock, row.get(COL_LOCATION, ""), row.get("Specifikationer", ""),
+                                      article, category_id, supplier_id, row.get("Enhet") or "st"))
+
+                if not valid:
+                    continue
+
+                with pool.writer() as writer:
+                    try:
+                        #IMMEDIATE tar skrivlåset direkt så att tilldelade ProduktID inte krockar
+                        writer.execute("BEGIN IMMEDIATE")
+                        write_cursor = writer.cursor()
+                        first_id = _next_product_id(write_cursor)
+                        ids = range(first_id, first_id + len(valid))
+
+                        write_cursor.executemany(f"""
+                            INSERT INTO {PRODUCTS_TABLE} ({COL_PRODID}, {COL_NAME}, Specifikationer, {COL_ARTICLENUMBER}, KategoriID, LeverantorID, Enhet)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """, [(pid, v[0], v[3], v[4], v[5], v[6], v[7]) for pid, v in zip(ids, valid)])
+                        write_cursor.executemany(f"""
+                            INSERT INTO {STOCK_TABLE} ({COL_PRODID}, {COL_STOCK}, {COL_LOCATION})
+                            VALUES (?, ?, ?)
+                        """, [(pid, v[1], v[2]) for pid, v in zip(ids, valid)])
+                        write_cursor.executemany(f"""
+                            INSERT INTO {HISTORY_TABLE} ({COL_PRODID}, product_name, date, quantity)
+                            VALUES (?, ?, DATE('now'), ?)
+                        """, [(pid, v[0], v[1]) for pid, v in zip(ids, valid)])
+                        writer.commit()
+                    except sqlite3.Error as e:
+                        writer.rollback()
+                        log_error(f"SQLite fel vid produktimport: {e}")
+                        raise ValueError(f"Databasfel vid import efter {imported} produkter: {e}")
+
+                imported += len(valid)
+                log_info(f"Produktimport: {imported} produkter importerade hittills från {path}.")
+    finally:
+        product_resolver.invalidate()
+
+    return imported, failed
+
+
+def import_stock(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importerar nya lagersaldon för befintliga produkter (kolumner Namn eller Artikelnummer samt Antal).
+    Varje chunk tillämpas med bulk_update_stock i en egen transaktion. Produkterna löses upp
+    exakt (artikelnummer, sedan namn), utan delsträngssökning.
+
+    Returns:
+        (antal uppdaterade, lista av (radnummer, sökord, felorsak))
+    """
+    updated = 0
+    failed = []
+    line_no = 1
+    for chunk in iter_chunks(iter_rows(path), chunk_size):
+        items = []
+        lines = []
+        for row in chunk:
+            line_no += 1
+            key = row.get(COL_ARTICLENUMBER) or row.get(COL_NAME, "")
+            try:
+                items.append((key, _parse_int(row.get(COL_STOCK))))
+                lines.append(line_no)
+            except ValueError as e:
+                failed.append((line_no, key, f"Ogiltigt saldo ({e})."))
+        chunk_updated, chunk_failed = bulk_update_stock(items, exact=True)
+        updated += len(chunk_updated)
+        failed.extend((lines[position], key, reason) for position, key, reason in chunk_failed)
+    failed.sort(key=lambda failure: failure[0])
+    return updated, failed
+
+
+def import_history(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importerar historiska saldon (kolumner Namn eller Artikelnummer, Datum, Antal) för befintliga produkter.
+    Produkterna löses upp exakt (artikelnummer, sedan namn), utan delsträngssökning.
+    Förbrukningstabellerna räknas om för de berörda produkterna i samma transaktion.
+
+    Returns:
+        (antal importerade rader, lista av (radnummer, sökord, felorsak))
+    """
+    pool = get_connection_pool()
+    imported = 0
+    failed = []
+    line_no = 1
+
+    with pool.connection() as conn:
+        for chunk in iter_chunks(iter_rows(path), chunk_size):
+            history_rows = []
+            for row in chunk:
+                line_no += 1
+                key = row.get(COL_ARTICLENUMBER) or row.get(COL_NAME, "")
+                try:
+                    date = datetime.strptime(row.get("Datum", "")[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+                    quantity = _parse_int(row.get(COL_STOCK))
+                except ValueError:
+                    failed.append((line_no, key, "Ogiltigt datum (ÅÅÅÅ-MM-DD) eller antal."))
+                    continue
+
+                matched_products = product_resolver.find_exact(conn, key) if key else []
+                if len(matched_products) != 1:
+                    reason = "Tvetydig produkt." if matched_products else "Produkten hittades inte."
+                    failed.append((line_no, key, reason))
+                    continue
+                match = matched_products[0]
+                history_rows.append((match.product_id, match.name, date, quantity))
+
+            if not history_rows:
+                continue
+
+            with pool.writer() as writer:
+                try:
+                    write_cursor = writer.cursor()
+                    write_cursor.executemany(f"""
+                        INSERT INTO {HISTORY_TABLE} ({COL_PRODID}, product_name, date, quantity)
+                        VALUES (?, ?, ?, ?)
+                    """, history_rows)
+                    _rebuild_consumption(write_cursor, {r[0] for r in history_rows})
+                    writer.commit()
+                except sqlite3.Error as e:
+                    writer.rollback()
+                    log_error(f"SQLite fel vid historikimport: {e}")
+                    raise ValueError(f"Databasfel vid import efter {imported} historikrader: {e}")
+
+            imported += len(history_rows)
+            log_info(f"Historikimport: {imported} rader importerade hittills från {path}.")
+
+    return imported, failed
+
+
+def _iter_query(query, fetch_size):
+    """Kör en fråga och ger resultatet i omgångar om fetch_size rader."""
+    pool = get_connection_pool()
+    with pool.connection() as conn:
+        cursor = conn.execute(query)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+
+
+def _write_csv(path, header, batches):
+    exported = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(header)
+        for rows in batches:
+            writer.writerows(rows)
+            exported += len(rows)
+    return exported
+
+
+def _write_excel(path, header, batches):
+    """Skriver raderna till en .xlsx-fil i strömmande läge (kräver openpyxl)."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("Excel-export kräver paketet 'openpyxl' (pip install openpyxl).")
+
+    #write_only skriver raderna direkt till filen i stället för att hålla hela bladet i minnet
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    exported = 0
+    for rows in batches:
+        for row in rows:
+            sheet.append(row)
+        exported += len(rows)
+    workbook.save(path)
+    return exported
+
+
+def _export(path, header, query, fetch_size=DEFAULT_CHUNK_SIZE):
+    """
+    Skriver resultatet av en fråga i omgångar om fetch_size rader, som Excel om
+    filändelsen är .xlsx och annars som CSV.
+    """
+    batches = _iter_query(query, fetch_size)
+    if path.lower().endswith(".xlsx"):
+        exported = _write_excel(path, header, batches)
+    else:
+        exported = _write_csv(path, header, batches)
+    log_info(f"Exporterade {exported} rader till {path}.")
+    return exported
+
+
+def export_products(path):
+    """Exporterar alla produkter med saldo och lagerplats till CSV/Excel (samma format som import_products)."""
+    return _export(path, PRODUCT_COLUMNS, f"""
+        SELECT p.{COL_NAME}, l.{COL_STOCK}, l.{COL_LOCATION}, p.Specifikationer, p.{COL_ARTICLENUMBER},
+               p.KategoriID, p.LeverantorID, p.Enhet
+        FROM {PRODUCTS_TABLE} p
+        LEFT JOIN {STOCK_TABLE} l ON p.{COL_PRODID} = l.{COL_PRODID}
+        ORDER BY p.{COL_PRODID}
+    """)
+
+
+def export_history(path):
+    """Exporterar saldohistoriken till CSV/Excel (samma format som import_history)."""
+    return _export(path, HISTORY_COLUMNS, f"""
+        SELECT p.{COL_ARTICLENUMBER}, COALESCE(p.{COL_NAME}, h.product_name), h.date, h.quantity
+        FROM {HISTORY_TABLE} h
+        LEFT JOIN {PRODUCTS_TABLE} p ON p.{COL_PRODID} = h.{COL_PRODID}
+        ORDER BY h.{COL_PRODID}, h.date, h.id
+    """)
+
+
+#Tillgängliga import- och exporttyper (används av kommandona importera/exportera)
+IMPORTERS = {
+    "produkter": import_products,
+    "saldon": import_stock,
+    "historik": import_history,
+}
+EXPORTERS = {
+    "produkter": export_products,
+    "historik": export_history,
+}
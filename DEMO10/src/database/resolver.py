@@ -0,0 +1,124 @@
+import threading
+from collections import namedtuple
+
+#Resultat från en sökning: ProduktID och exakt produktnamn
+ProductMatch = namedtuple("ProductMatch", ["product_id", "name"])
+
+#Längd på n-grammen i delsträngsindexet
+NGRAM_SIZE = 3
+
+
+def _ngrams(text):
+    """Returnerar mängden av alla n-gram (NGRAM_SIZE tecken) i texten."""
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class _ProductIndex:
+    """
+    Oföränderlig ögonblicksbild av Produkter-tabellen:
+    exakt namn (gemener), artikelnummer och n-gram för delsträngssökning.
+    """
+
+    def __init__(self, rows):
+        self.names = {}
+        self.lower_names = {}
+        self.by_name = {}
+        self.by_article = {}
+        self.by_ngram = {}
+
+        for product_id, name, article_number in rows:
+            lower = name.lower()
+            self.names[product_id] = name
+            self.lower_names[product_id] = lower
+            self.by_name.setdefault(lower, set()).add(product_id)
+            if article_number:
+                self.by_article.setdefault(article_number, set()).add(product_id)
+            for gram in _ngrams(lower):
+                self.by_ngram.setdefault(gram, set()).add(product_id)
+
+    def substring_matches(self, p_lower):
+        """Motsvarar LOWER(Namn) LIKE '%sökord%' utan att läsa hela tabellen."""
+        if len(p_lower) < NGRAM_SIZE:
+            #För korta sökord saknas n-gram: gå igenom namnen direkt
+            return {pid for pid, lower in self.lower_names.items() if p_lower in lower}
+
+        #Börjar med det minsta postingsetet för att hålla snittet litet
+        postings = sorted((self.by_ngram.get(g, set()) for g in _ngrams(p_lower)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+
+        #N-gram kan matcha i fel ordning, så kandidaterna verifieras
+        return {pid for pid in candidates if p_lower in self.lower_names[pid]}
+
+
+class ProductResolver:
+    """
+    Löser upp användarens sökord (namn, del av namn eller artikelnummer) till produkter
+    via ett minnesindex i stället för en fullständig tabellskanning per kommando.
+    Indexet byggs vid första användning och måste ogiltigförklaras (invalidate)
+    när produkter läggs till, byter namn eller tas bort.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Kastar indexet så att det byggs om vid nästa sökning."""
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+    def _get_index(self, conn):
+        index = self._index
+        if index is not None:
+            return index
+
+        with self._lock:
+            generation = self._generation
+
+        rows = conn.execute("SELECT ProduktID, Namn, Artikelnummer FROM Produkter").fetchall()
+        index = _ProductIndex((row[0], row[1], row[2]) for row in rows)
+
+        with self._lock:
+            #Installerar bara indexet om ingen ändring skett under inläsningen
+            if generation == self._generation:
+                self._index = index
+        return index
+
+    def find(self, conn, query):
+        """
+        Returnerar alla produkter vars namn är lika med eller innehåller sökordet
+        (skiftlägesokänsligt), eller vars artikelnummer är exakt lika med sökordet.
+        Samma semantik som den tidigare SQL-frågan med LOWER()/LIKE/Artikelnummer.
+        """
+        index = self._get_index(conn)
+        p_lower = query.lower()
+
+        matched = index.substring_matches(p_lower)
+        matched |= index.by_article.get(query, set())
+
+        return [ProductMatch(pid, index.names[pid]) for pid in sorted(matched)]
+
+    def find_exact(self, conn, key):
+        """
+        Exakt uppslagning för massuppdateringar och import: produkter vars artikelnummer är
+        lika med key, annars produkter vars namn är lika med key (skiftlägesokänsligt).
+        Ingen delsträngssökning, så 'Mjölk' ger inte 'Mjölkchoklad'.
+        """
+        index = self._get_index(conn)
+        matched = index.by_article.get(key) or index.by_name.get(key.lower(), set())
+        return [ProductMatch(pid, index.names[pid]) for pid in sorted(matched)]
+
+    def exists(self, conn, name, article_number):
+        """Kontrollerar om ett produktnamn (skiftlägesokänsligt) eller artikelnummer redan används."""
+        index = self._get_index(conn)
+        return name.lower() in index.by_name or article_number in index.by_article
+
+
+#Delad instans för hela processen
+product_resolver = ProductResolver()
@@ -0,0 +1,125 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from src.utils.logger import BASE_DIR, log_info, log_warning
+
+
+def resolve_cache_path(relative_path):
+    """
+    Sökväg för cachefiler. Relativ till projektroten, eller till mappen där .exe-filen
+    ligger i PyInstaller-läge (paketets egen data-mapp är skrivskyddad och temporär).
+    """
+    return os.path.join(str(BASE_DIR), relative_path)
+
+
+def normalize_text(text):
+    """Cachenyckel för fri text: gemener, ett blanksteg mellan ord och utan avslutande skiljetecken."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+class TTLCache:
+    """
+    Trådsäker LRU-cache med livslängd (TTL) per post och valfri lagring på disk (JSON).
+    Nycklar är strängar och värden måste gå att serialisera som JSON om path anges.
+    """
+
+    def __init__(self, max_size=1000, ttl_seconds=None, path=None, save_every=20):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.save_every = save_every
+        self._data = OrderedDict()  #nyckel -> (värde, tidsstämpel)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """Returnerar värdet eller None om nyckeln saknas eller har gått ut."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self._expired(stored_at, now):
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._unsaved += 1
+
+    def items(self):
+        """Ögonblicksbild av alla giltiga (nyckel, värde)-par, äldst använda först."""
+        now = time.time()
+        with self._lock:
+            return [(key, value) for key, (value, stored_at) in self._data.items()
+                    if not self._expired(stored_at, now)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def load(self):
+        """Läser in cachen från disk. En trasig eller saknad fil ger en tom cache."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            log_warning(f"Kunde inte läsa cachefilen {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, value, stored_at in entries[-self.max_size:]:
+                if not self._expired(stored_at, now):
+                    self._data[key] = (value, stored_at)
+        log_info(f"Läste in {len(self._data)} cacheposter från {self.path}.")
+
+    def save(self):
+        """Skriver cachen atomiskt till disk (temporär fil + os.replace)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._unsaved:
+                return
+            entries = [[key, value, stored_at] for key, (value, stored_at) in self._data.items()]
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log_warning(f"Kunde inte spara cachefilen {self.path}: {e}")
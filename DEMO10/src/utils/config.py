@@ -1,12 +1,91 @@
 DB_CONFIG = {
-    "db_path": "Elfirman.db" 
+    "db_path": "Elfirman.db",
+    "read_pool_size": 5,          #Antal samtidiga läsanslutningar
+    "busy_timeout_ms": 5000,      #Väntetid vid låst databas innan 'database is locked'
+    "cache_size_kib": 65536,      #Sidcache per anslutning (KiB)
+    "mmap_size": 268435456,       #Minnesmappad I/O (byte)
 }
 
 RAG_CONFIG = {
     "embedding_model": "all-MiniLM-L6-v2",
+    #Inferens för embeddern: "torch", "int8" (dynamisk kvantisering) eller "onnx" (ONNX Runtime).
+    #int8/onnx kontrolleras mot torch vid uppstart på ett urval ur dokumentlagret (torch används om
+    #kontrollen inte klaras). Resultatet sparas i data/index.faiss.check.json och kontrollen körs
+    #bara om när modell, backend eller lagret ändras; manuell jämförelse: python -m src.ai.embedding <backend>
+    "embedding_backend": "torch",
+    "onnx_file_name": None,       #T.ex. "onnx/model_qint8_avx512_vnni.onnx" för en kvantiserad ONNX-modell
+    "embedding_min_agreement": 0.9,  #Minsta andel gemensamma top-k-träffar jämfört med torch
+    "embedding_check_docs": 200,  #Antal dokument i urvalet för kontrollen vid uppstart
+    "embedding_check_queries": 50,  #Antal testfrågor i kontrollen
     "data_dir": "data",
     "index_path": "data/index.faiss",
     "docs_path": "data/docs.txt",
+    "store_path": "data/docstore",  #Dokumentlager: docstore.bin (texter), docstore.idx (poster)
+    "index_mmap": True,           #Minnesmappa IVF-index vid inläsning (läses in vid ändring); flat/HNSW läses alltid in i minnet
+    "lexical_path": "data/lexical.db",  #BM25-index (SQLite FTS5) över samma dokument
+    "hybrid": True,               #Slå ihop vektor- och BM25-träffar (Reciprocal Rank Fusion)
+    "hybrid_candidates": 20,      #Kandidater från varje sökning innan sammanslagning
+    "rrf_k": 60,                  #RRF-konstant: högre värde jämnar ut betydelsen av rangordningen
+    "query_cache_size": 2000,     #Antal frågevektorer som sparas (LRU)
+    "batch_max_size": 32,         #Max antal samtidiga sökningar per omgång
+    "batch_max_wait_ms": 5,       #Hur länge en sökning väntar på fler innan omgången körs (0 = av)
+    "encode_batch_size": 64,      #Antal texter per anrop till SentenceTransformer.encode
+    "chunk_tokens": 200,          #Max antal ordbitar (tokenizer) per textbit, högst modellens maxlängd (MiniLM: 256)
+    "chunk_overlap": 40,          #Antal ordbitar som överlappar mellan på varandra följande bitar
+    "ingest_flush_batches": 20,   #Dokumentlagret skrivs till disk efter så här många omgångar vid inläsning
+    "ingest_extensions": [".txt", ".md", ".markdown", ".pdf"],
+    "warmup_timeout_seconds": 300,  #Maximal väntan på bakgrundsladdning av modell och index
+    #FAISS-index: "flat" (exakt), "ivf_flat", "ivf_pq", "hnsw" eller "auto" (efter antal dokument).
+    #Jämför recall och latens med: python -m src.ai.vector_index
+    "index_type": "auto",
+    "auto_flat_max": 20000,       #auto: exakt sökning upp till så här många vektorer
+    "auto_hnsw_max": 200000,      #auto: HNSW upp till så här många, därefter IVF
+    "auto_ivf_flat_max": 1000000, #auto: IVF-Flat upp till så här många, därefter IVF-PQ
+    "nlist": None,                #Antal IVF-kluster (None = 4·√n)
+    "nprobe": 16,                 #Antal kluster som genomsöks per fråga (IVF)
+    "pq_m": 16,                   #Antal PQ-delkvantiserare (måste dela dimensionen, 384 för MiniLM)
+    "pq_nbits": 8,                #Bitar per PQ-kod
+    "hnsw_m": 32,                 #Grannar per nod i HNSW-grafen
+    "ef_construction": 80,        #Sökbredd när HNSW-grafen byggs
+    "ef_search": 64,              #Sökbredd per fråga i HNSW
+    "train_sample_size": 100000,  #Max antal vektorer för IVF/PQ-träning
+    "ivf_retrain_factor": 2,      #IVF: träna om när korpusen borde ha så här många gånger fler kluster än vid träningen
+    "max_tombstone_ratio": 0.2,   #HNSW: komprimera indexet när så stor andel är borttagna vektorer
+}
+
+LLM_CONFIG = {
+    "model": "gemini-2.5-flash",
+    "timeout_ms": 30000,          #Tidsgräns per anrop till Gemini
+    "max_retries": 3,             #Antal nya försök vid tillfälliga fel (429/5xx/nätverk)
+    "backoff_seconds": 0.5,       #Startväntetid, dubblas för varje nytt försök
+}
+
+CACHE_CONFIG = {
+    "interpretation_path": "data/interpretation_cache.json",
+    "interpretation_max_entries": 5000,
+    "interpretation_ttl_seconds": 7 * 24 * 3600,
+    "interpretation_similarity": 0.93,   #Minsta cosinuslikhet för en semantisk träff
+    #Svar på RAG-frågor, nycklade på indexversion + träffarnas ID + normaliserad fråga
+    "answer_path": "data/answer_cache.json",
+    "answer_max_entries": 2000,
+    "answer_ttl_seconds": 24 * 3600,
+}
+
+FORECAST_CONFIG = {
+    "history_days": 90,           #Antal dagar förbrukning som prognoserna bygger på
+    "horizon_days": 7,            #Prognoshorisont (nästa vecka)
+    "min_active_days": 5,         #Färre dagar med uttag än så: medelvärdet används i stället för en modell
+    "ses_alphas": [0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9],  #Utjämningsparametrar som provas (exponentiell utjämning)
+    "unit_root_phi": 0.95,        #|phi| över så här: AR(1) på sluten form är osäker, kör ARIMA i stället
+    "arima_fallback_max": 200,    #Max antal serier per körning som anpassas med statsmodels ARIMA
+    "workers": None,              #Processer för ARIMA-anpassning (None = antal kärnor)
+    "model_cache_path": "data/forecast_models.json",  #Anpassade modeller per produkt
+    "model_cache_max_entries": 50000,
+    "reorder_lead_days": 7,       #Leveranstid: beställningsförslaget ska räcka den här tiden...
+    "reorder_cover_days": 14,     #...plus så här många dagar efter leveransen
+    "stockout_warning_days": 7,   #lågtsaldo: visa produkter som enligt prognosen tar slut inom så här många dagar
+    "projection_poll_seconds": 30,  #Hur ofta prognosjobbet letar efter ny historik
+    "projection_full_refresh_hours": 24,  #Hur ofta alla produkter räknas om
 }
 
 CHAT_CONFIG = {
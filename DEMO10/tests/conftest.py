@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from src.ai import forecast_service
+from src.database import db
+from src.database.resolver import product_resolver
+from src.utils.config import FORECAST_CONFIG
+
+#Samma tabeller som i Elfirman.db; Produkt_historik skapas och migreras av db._initialize_database
+SCHEMA = """
+    CREATE TABLE Kategorier (
+        KategoriID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Namn TEXT NOT NULL,
+        Beskrivning TEXT
+    );
+    CREATE TABLE Leverantorer (
+        LeverantorID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Namn TEXT NOT NULL,
+        Kontaktinfo TEXT
+    );
+    CREATE TABLE Produkter (
+        ProduktID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Namn TEXT NOT NULL,
+        Specifikationer TEXT,
+        Artikelnummer TEXT,
+        KategoriID INTEGER,
+        LeverantorID INTEGER,
+        Enhet TEXT
+    );
+    CREATE TABLE Lager (
+        LagerID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ProduktID INTEGER,
+        Antal INTEGER NOT NULL,
+        Lagerplats TEXT
+    );
+"""
+
+PRODUCTS = [
+    #(namn, artikelnummer, saldo, lagerplats)
+    ("Kabel 3x1.5", "1001", 120, "A1"),
+    ("Kabel 3x2.5", "1002", 80, "A2"),
+    ("Jordfelsbrytare 30mA", "2001", 12, "B1"),
+    ("Mjölk", "3001", 5, "C1"),
+    ("Mjölkchoklad", "3002", 40, "C2"),
+]
+
+
+@pytest.fixture(autouse=True)
+def model_cache(tmp_path, monkeypatch):
+    """Prognostjänstens modellcache hamnar i tmp_path, aldrig i data/; tjänsten skapas om per test."""
+    monkeypatch.setitem(FORECAST_CONFIG, "model_cache_path", str(tmp_path / "models.json"))
+    monkeypatch.setattr(forecast_service, "_service", None)
+    yield
+    if forecast_service._service is not None:
+        forecast_service._service.shutdown()
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Tillfällig databas med testprodukter; processens pool pekas om till den."""
+    path = tmp_path / "test.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    for name, article_number, stock, location in PRODUCTS:
+        cursor = conn.execute(
+            "INSERT INTO Produkter (Namn, Artikelnummer, KategoriID, LeverantorID, Enhet) VALUES (?, ?, 1, 1, 'st')",
+            (name, article_number),
+        )
+        conn.execute(
+            "INSERT INTO Lager (ProduktID, Antal, Lagerplats) VALUES (?, ?, ?)",
+            (cursor.lastrowid, stock, location),
+        )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "_resolve_db_path", lambda: str(path))
+    monkeypatch.setattr(db, "_pool", None)
+    product_resolver.invalidate()
+    yield path
+
+    if db._pool is not None:
+        db._pool.close_all()
+    db._pool = None
+    product_resolver.invalidate()
@@ -0,0 +1,80 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.ai import backtest
+from src.database import db, history
+
+
+def test_rolling_origins():
+    assert backtest.rolling_origins(20, 10, 3, 3) == [10, 13, 16]
+    assert backtest.rolling_origins(12, 10, 3, 3) == []
+
+
+def test_errors_skip_failed_fits():
+    error = np.array([[1.0, np.nan], [-3.0, 2.0]])
+    actual = np.array([[2.0, 5.0], [0.0, 4.0]])
+    mae, mape = backtest._errors(error, actual)
+
+    assert mae == pytest.approx(2.0)
+    assert mape == pytest.approx((0.5 + 0.5) / 2 * 100)
+
+
+def test_backtest_report_without_arima():
+    rng = np.random.default_rng(0)
+    matrix = rng.poisson(3, size=(50, 40)).astype("float64")
+    report = backtest.backtest(matrix, history_days=20, horizon=5, arima_series=0)
+
+    assert [row["model"] for row in report] == ["medel", "ses", "ar1", "vektoriserad"]
+    for row in report:
+        assert row["n"] == 50 * 4
+        assert row["failed"] == 0
+        assert 0 < row["mae"] < 15
+    assert "medel" in backtest.format_report(report)
+
+
+def test_backtest_fits_arima_unrounded():
+    pytest.importorskip("statsmodels")
+    rng = np.random.default_rng(1)
+    matrix = rng.poisson(3, size=(6, 30)).astype("float64")
+    report = {row["model"]: row for row in backtest.backtest(matrix, history_days=20, horizon=5, arima_series=3, workers=1)}
+
+    arima = report["arima"]
+    assert arima["n"] == 3 * 2
+    assert arima["failed"] == 0
+    #Oavrundade prognoser: felet är i allmänhet inte ett heltal
+    assert arima["mae"] != round(arima["mae"])
+    #Urvalskolumnerna jämför de andra modellerna på samma serier som ARIMA
+    assert arima["mae_sample"] == arima["mae"]
+    assert np.isfinite(report["medel"]["mae_sample"])
+
+
+def test_catalog_daily_consumption_matches_product_series(temp_db):
+    #Initierar databasen; historiken fylls med dagens saldon (Kabel 3x1.5: 120)
+    db.get_connection_pool()
+    conn = sqlite3.connect(temp_db)
+    rows = [
+        (1, "Kabel 3x1.5", "DATE('now', '-3 days')", 110),
+        (1, "Kabel 3x1.5", "DATE('now', '-3 days')", 100),
+        (1, "Kabel 3x1.5", "DATE('now', '-1 days')", 130),
+        (1, "Kabel 3x1.5", "DATE('now')", 95),
+    ]
+    for product_id, name, date, quantity in rows:
+        conn.execute(
+            f"INSERT INTO Produkt_historik (ProduktID, product_name, date, quantity) VALUES (?, ?, {date}, ?)",
+            (product_id, name, quantity),
+        )
+    conn.commit()
+    conn.close()
+
+    from src.ai.forecast import consumption_matrix
+
+    ids, _, _, matrix = consumption_matrix(history.catalog_daily_consumption(10), 10)
+    series = history.product_daily_series("Kabel 3x1.5", days=10)
+
+    assert ids.tolist() == [1, 2, 3, 4, 5]
+    assert matrix[0].tolist() == series["consumption"].tolist()
+    #110 -> 100 för tre dagar sedan; i dag 130 -> 120 (initial historik) -> 95
+    assert matrix[0, -4] == 10 and matrix[0, -1] == 35
+    assert not matrix[1:].any()
@@ -0,0 +1,103 @@
+import sqlite3
+
+from src.database import db
+from src.database.resolver import product_resolver
+
+
+def _stock(path, name):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT l.Antal FROM Lager l JOIN Produkter p ON p.ProduktID = l.ProduktID WHERE p.Namn = ?",
+            (name,),
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_updates_stock_and_history(temp_db):
+    updated, failed = db.bulk_update_stock([("Kabel 3x1.5", 100), ("2001", "15")])
+
+    assert updated == [("Kabel 3x1.5", 100), ("Jordfelsbrytare 30mA", 15)]
+    assert failed == []
+    assert _stock(temp_db, "Kabel 3x1.5") == 100
+    assert _stock(temp_db, "Jordfelsbrytare 30mA") == 15
+
+    conn = sqlite3.connect(temp_db)
+    latest = conn.execute(
+        "SELECT quantity FROM Produkt_historik WHERE product_name = ? ORDER BY id DESC LIMIT 1",
+        ("Kabel 3x1.5",),
+    ).fetchone()[0]
+    conn.close()
+    assert latest == 100
+
+
+def test_reports_failed_rows_and_applies_the_rest(temp_db):
+    updated, failed = db.bulk_update_stock([
+        ("kabel", 10),          #tvetydig
+        ("finns inte", 10),
+        ("Mjölk", -1),
+        ("Mjölkchoklad", "många"),
+        ("", 3),
+        ("3x2.5", 70),
+    ])
+
+    assert updated == [("Kabel 3x2.5", 70)]
+    assert [reason for _, _, reason in failed] == [
+        "Tvetydig produkt.",
+        "Produkten hittades inte.",
+        "Lagersaldo kan inte vara negativt.",
+        "Ogiltigt saldo 'många'.",
+        "Produkten hittades inte.",
+    ]
+    assert _stock(temp_db, "Kabel 3x1.5") == 120
+    assert _stock(temp_db, "Mjölk") == 5
+
+
+def test_repeated_product_records_consumption_against_previous_row(temp_db):
+    db.bulk_update_stock([("Kabel 3x1.5", 100), ("Kabel 3x1.5", 90), ("Kabel 3x1.5", 95)])
+
+    assert _stock(temp_db, "Kabel 3x1.5") == 95
+    conn = sqlite3.connect(temp_db)
+    total = conn.execute(
+        "SELECT total_consumption FROM Produkt_forbrukning WHERE product_name = ?",
+        ("Kabel 3x1.5",),
+    ).fetchone()[0]
+    conn.close()
+    #120 -> 100 -> 90 är uttag, 90 -> 95 är påfyllning
+    assert total == 30
+
+
+def test_nothing_resolved_writes_nothing(temp_db):
+    updated, failed = db.bulk_update_stock([("finns inte", 1)])
+
+    assert updated == []
+    assert len(failed) == 1
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute("SELECT COUNT(*) FROM Produkt_historik").fetchone()[0] == len(
+        conn.execute("SELECT * FROM Produkter").fetchall()
+    )
+    conn.close()
+
+
+def test_exact_name_or_article_wins_over_substring_matches(temp_db):
+    conn = sqlite3.connect(temp_db)
+    conn.execute("INSERT INTO Produkter (Namn, Artikelnummer) VALUES ('Kopplingsdosa', '30')")
+    conn.execute("INSERT INTO Lager (ProduktID, Antal) VALUES (last_insert_rowid(), 1)")
+    conn.commit()
+    conn.close()
+    product_resolver.invalidate()
+
+    #'Mjölk' ingår i 'Mjölkchoklad' och '30' i 'Jordfelsbrytare 30mA'
+    updated, failed = db.bulk_update_stock([("Mjölk", 7), ("30", 3)])
+
+    assert updated == [("Mjölk", 7), ("Kopplingsdosa", 3)]
+    assert failed == []
+    assert _stock(temp_db, "Mjölkchoklad") == 40
+
+
+def test_exact_mode_never_falls_back_to_substrings(temp_db):
+    updated, failed = db.bulk_update_stock([("3x2.5", 70)], exact=True)
+
+    assert updated == []
+    assert failed == [(0, "3x2.5", "Produkten hittades inte.")]
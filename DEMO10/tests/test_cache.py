@@ -0,0 +1,126 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.chatbot.interpretation_cache import InterpretationCache
+from src.utils.cache import TTLCache, normalize_text
+from src.utils.config import CACHE_CONFIG
+
+
+def test_normalize_text():
+    assert normalize_text("  Saldo   KABEL 3x1.5?! ") == "saldo kabel 3x1.5"
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert [key for key, _ in cache.items()] == ["a", "c"]
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    cache.set("a", 1)
+
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_persists_to_disk(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = TTLCache(max_size=10, path=path, save_every=1000)
+    cache.set("a", {"action": "saldo", "args": ["kabel"]})
+    cache.save()
+
+    assert TTLCache(max_size=10, path=path).get("a") == {"action": "saldo", "args": ["kabel"]}
+
+
+def test_broken_file_gives_empty_cache(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{inte json", encoding="utf-8")
+    assert len(TTLCache(path=str(path))) == 0
+
+
+class _SameVectorEmbedder:
+    """Ger alla texter samma vektor, så att bara argumentkontrollen avgör semantiska träffar."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.ones((len(texts), 4), dtype="float32") / 2
+
+
+@pytest.fixture
+def interpretations(tmp_path, monkeypatch):
+    monkeypatch.setitem(CACHE_CONFIG, "interpretation_path", str(tmp_path / "interpretations.json"))
+    embedder = _SameVectorEmbedder()
+    cache = InterpretationCache(embedder_provider=lambda: embedder)
+    return cache, embedder
+
+
+def test_exact_hit_on_normalized_text_and_role(interpretations):
+    cache, _ = interpretations
+    cache.put("Hur många jordfelsbrytare har vi?", "user", {"action": "saldo", "args": ["jordfelsbrytare"]})
+
+    assert cache.get("hur många  jordfelsbrytare har vi", "user") == {"action": "saldo", "args": ["jordfelsbrytare"]}
+    assert cache.get("hur många jordfelsbrytare har vi", "admin") is None
+    assert cache.stats() == {"träffar": 1, "semantiska": 0, "missar": 1}
+
+
+def test_errors_and_unknown_are_not_cached(interpretations):
+    cache, _ = interpretations
+    cache.put("blabla", "user", {"action": "okänd"})
+    cache.put("saldo?", "user", {"action": "saldo", "error": "LLM-timeout."})
+    assert len(cache._cache) == 0
+
+
+def test_semantic_hit_requires_the_same_product(interpretations):
+    cache, _ = interpretations
+    cache.put("hur många mjölk har vi", "user", {"action": "saldo", "args": ["Mjölk"]})
+
+    assert cache.get("kan du kolla saldot på mjölk", "user") == {"action": "saldo", "args": ["Mjölk"]}
+    #Ett längre produktnamn som bara innehåller det cachade ska inte ge träff
+    assert cache.get("kan du kolla saldot på mjölkchoklad", "user") is None
+    assert cache.get("kan du kolla saldot på mjölk choklad", "user") is None
+    assert cache.stats() == {"träffar": 0, "semantiska": 1, "missar": 2}
+
+
+def test_semantic_lookup_does_not_embed_cached_keys(interpretations):
+    cache, embedder = interpretations
+    cache.put("hur många mjölk har vi", "user", {"action": "saldo", "args": ["mjölk"]})
+    cache._cache.save()
+
+    #Ny process: posten finns på disk men har ingen vektor förrän warm_up har körts
+    restarted = InterpretationCache(embedder_provider=lambda: embedder)
+    embedder.encoded.clear()
+    assert restarted.get("kan du kolla saldot på mjölk", "user") is None
+    assert embedder.encoded == []
+
+    restarted.warm_up()
+    assert restarted.get("kan du kolla saldot på mjölk", "user") == {"action": "saldo", "args": ["mjölk"]}
+
+
+def test_writing_commands_are_never_semantic(interpretations):
+    cache, _ = interpretations
+    cache.put("sätt mjölk till 5", "admin", {"action": "uppdatera", "args": ["mjölk", "5"]})
+    assert cache.get("ändra mjölk till 5", "admin") is None
+
+
+def test_rag_hit_uses_the_new_wording(interpretations):
+    cache, _ = interpretations
+    cache.put("berätta om jordfelsbrytare", "user", {"action": "rag", "args": ["berätta om jordfelsbrytare"]})
+    assert cache.get("berätta lite om jordfelsbrytare", "user") == {
+        "action": "rag", "args": ["berätta lite om jordfelsbrytare"],
+    }
@@ -0,0 +1,107 @@
+import numpy as np
+
+from src.ai.docstore import DocumentStore
+
+
+def test_round_trip(tmp_path):
+    base = str(tmp_path / "docstore")
+    store = DocumentStore(base)
+    store.add(3, "tredje", "manual.pdf", 120)
+    store.add(1, "första åäö")
+    store.add(2, "andra", "manual.pdf", 0)
+    assert len(store) == 3
+    store.save()
+
+    reopened = DocumentStore(base)
+    assert DocumentStore.exists(base)
+    assert len(reopened) == 3
+    assert reopened.get(1) == "första åäö"
+    assert reopened.get(3) == "tredje"
+    assert reopened.get(4) is None
+    assert reopened.metadata(3) == {"source": "manual.pdf", "offset": 120}
+    assert reopened.metadata(1) is None
+    assert reopened.ids().tolist() == [1, 2, 3]
+    assert sorted(reopened.ids_from("manual.pdf")) == [2, 3]
+    assert reopened.sources() == {"manual.pdf"}
+
+
+def test_pending_changes_are_visible_before_save(tmp_path):
+    store = DocumentStore(str(tmp_path / "docstore"))
+    store.add(1, "ett", "a.txt")
+    store.save()
+    store.add(2, "två", "b.txt")
+    store.delete(1)
+
+    assert 1 not in store and 2 in store
+    assert len(store) == 1
+    assert store.ids().tolist() == [2]
+    assert store.sources() == {"b.txt"}
+    assert store.get(1) is None
+
+
+def test_delete_replace_and_clear(tmp_path):
+    base = str(tmp_path / "docstore")
+    store = DocumentStore(base)
+    for key in range(10):
+        store.add(key, f"dokument {key}")
+    store.save()
+
+    store.delete(4)
+    store.add(5, "ersatt")
+    store.save()
+    reopened = DocumentStore(base)
+    assert 4 not in reopened
+    assert reopened.get(5) == "ersatt"
+    assert len(reopened) == 9
+
+    reopened.clear()
+    reopened.add(42, "ensam")
+    reopened.save()
+    assert DocumentStore(base).ids().tolist() == [42]
+
+
+def test_garbage_is_compacted(tmp_path):
+    base = str(tmp_path / "docstore")
+    store = DocumentStore(base)
+    for key in range(100):
+        store.add(key, "x" * 100)
+    store.save()
+    for key in range(80):
+        store.delete(key)
+    store.save()
+    #Nästa save skriver om .bin eftersom mer än hälften är borttagna texter
+    store.add(1000, "ny")
+    store.save()
+
+    reopened = DocumentStore(base)
+    assert (tmp_path / "docstore.bin").stat().st_size == 20 * 100 + len("ny")
+    assert [reopened.get(key) for key in (80, 99, 1000)] == ["x" * 100, "x" * 100, "ny"]
+    assert np.array_equal(reopened.ids(), np.array(list(range(80, 100)) + [1000]))
+
+
+def test_iter_texts(tmp_path):
+    store = DocumentStore(str(tmp_path / "docstore"))
+    for key in range(5):
+        store.add(key, f"text {key}")
+    store.save()
+    assert list(store.iter_texts(batch_size=2)) == [(key, f"text {key}") for key in range(5)]
+
+
+def test_shared_text_is_kept_until_its_last_source_drops_it(tmp_path):
+    base = str(tmp_path / "docstore")
+    store = DocumentStore(base)
+    store.add(1, "gemensam", "a.txt", 0)
+    store.add_source(1, "b.txt", 40)
+    store.add_source(1, "a.txt", 0)
+    store.save()
+
+    reopened = DocumentStore(base)
+    assert sorted(reopened.ids_from("b.txt")) == [1]
+    assert reopened.sources() == {"a.txt", "b.txt"}
+
+    #a.txt släpper texten: den flyttas till b.txt i stället för att tas bort
+    assert reopened.drop_source(1, "a.txt") is False
+    assert reopened.metadata(1) == {"source": "b.txt", "offset": 40}
+    assert reopened.ids_from("a.txt") == []
+    assert reopened.drop_source(1, "c.txt") is False
+    assert reopened.drop_source(1, "b.txt") is True
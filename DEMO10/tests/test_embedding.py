@@ -0,0 +1,103 @@
+import numpy as np
+
+from src.ai import embedding
+
+DOCS = [f"dokument nummer {i} om kabel och säkring" for i in range(40)]
+
+
+class _Model:
+    """Bäddar in varje text som en fast slumpvektor; shuffle=True ger en helt annan vektor."""
+
+    def __init__(self, shuffle=False):
+        self.shuffle = shuffle
+
+    def encode(self, texts, **kwargs):
+        vectors = []
+        for text in texts:
+            seed = sum(text.encode("utf-8")) + len(text) * 7919 + (1 if self.shuffle else 0)
+            vectors.append(np.random.default_rng(seed).normal(size=16))
+        return np.array(vectors, dtype="float32")
+
+
+def _fake_loader(candidate):
+    def load(model_name, backend):
+        return _Model() if backend == "torch" else candidate
+    return load
+
+
+def test_top_k_matches_brute_force():
+    rng = np.random.default_rng(1)
+    docs, queries = rng.normal(size=(30, 8)), rng.normal(size=(5, 8))
+    expected = np.argsort(((queries[:, None, :] - docs[None, :, :]) ** 2).sum(axis=2), axis=1)[:, :3]
+    assert np.array_equal(embedding._top_k(docs, queries, 3), expected)
+
+
+def test_agreeing_backend_is_used(monkeypatch):
+    candidate = _Model()
+    monkeypatch.setattr(embedding, "_load", _fake_loader(candidate))
+
+    model, backend = embedding.load_embedder("modell", "int8", sample_docs=DOCS)
+
+    assert model is candidate
+    assert backend == "int8"
+
+
+def test_disagreeing_backend_falls_back_to_torch(monkeypatch):
+    candidate = _Model(shuffle=True)
+    monkeypatch.setattr(embedding, "_load", _fake_loader(candidate))
+
+    model, backend = embedding.load_embedder("modell", "onnx", sample_docs=DOCS)
+
+    assert model is not candidate
+    assert backend == "torch"
+
+
+def test_backend_that_cannot_load_falls_back_to_torch(monkeypatch):
+    def load(model_name, backend):
+        if backend == "onnx":
+            raise ImportError("optimum saknas")
+        return _Model()
+
+    monkeypatch.setattr(embedding, "_load", load)
+    assert embedding.load_embedder("modell", "onnx", sample_docs=DOCS)[1] == "torch"
+
+
+def test_check_agreement_reports_overlap():
+    result = embedding.check_agreement(_Model(), _Model(), DOCS)
+    assert result["agreement_mean"] == 1.0
+    assert result["ok"]
+
+
+def test_check_result_is_reused_until_the_store_changes(monkeypatch, tmp_path):
+    loads = []
+
+    def load(model_name, backend):
+        loads.append(backend)
+        return _Model()
+
+    monkeypatch.setattr(embedding, "_load", load)
+    path = str(tmp_path / "index.faiss.check.json")
+
+    def load_embedder(store_version):
+        return embedding.load_embedder("modell", "int8", sample_docs=DOCS, check_path=path, store_version=store_version)
+
+    assert load_embedder(3)[1] == "int8"
+    assert loads == ["int8", "torch"]
+
+    #Samma modell, backend och lagerversion: ingen extra torch-modell laddas
+    assert load_embedder(3)[1] == "int8"
+    assert loads == ["int8", "torch", "int8"]
+
+    load_embedder(4)
+    assert loads[-2:] == ["int8", "torch"]
+
+
+def test_saved_failed_check_still_falls_back_to_torch(monkeypatch, tmp_path):
+    candidate = _Model(shuffle=True)
+    monkeypatch.setattr(embedding, "_load", _fake_loader(candidate))
+    path = str(tmp_path / "index.faiss.check.json")
+
+    for _ in range(2):
+        model, backend = embedding.load_embedder("modell", "onnx", sample_docs=DOCS, check_path=path, store_version=1)
+        assert model is not candidate
+        assert backend == "torch"
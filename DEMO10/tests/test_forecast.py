@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from src.ai import forecast
+from src.utils.config import FORECAST_CONFIG
+
+
+def _ar1_series(mu, phi, n, seed=0, noise=1.0):
+    rng = np.random.default_rng(seed)
+    x = np.empty(n)
+    x[0] = mu
+    for t in range(1, n):
+        x[t] = mu + phi * (x[t - 1] - mu) + rng.normal(scale=noise)
+    return x
+
+
+def test_fit_ar1_recovers_parameters():
+    matrix = np.vstack([_ar1_series(20, 0.6, 5000, seed=1), _ar1_series(5, -0.3, 5000, seed=2)])
+    mu, phi, variance = forecast.fit_ar1(matrix)
+
+    assert mu == pytest.approx([20, 5], abs=0.2)
+    assert phi == pytest.approx([0.6, -0.3], abs=0.05)
+    assert variance == pytest.approx([1, 1], rel=0.1)
+
+
+def test_fit_ar1_constant_series():
+    mu, phi, variance = forecast.fit_ar1(np.full((1, 10), 4.0))
+    assert (mu[0], phi[0], variance[0]) == (4.0, 0.0, 0.0)
+
+
+def test_forecast_ar1_matches_recursion():
+    mu, phi, last, horizon = np.array([10.0]), np.array([0.5]), np.array([14.0]), 3
+    expected = sum(10 + (14 - 10) * 0.5 ** step for step in range(1, horizon + 1))
+    assert forecast.forecast_ar1(mu, phi, last, horizon)[0] == pytest.approx(expected)
+
+
+def test_forecast_ar1_clips_explosive_phi():
+    result = forecast.forecast_ar1(np.array([0.0]), np.array([1.5]), np.array([1.0]), 2)
+    assert result[0] == pytest.approx(0.99 + 0.99 ** 2)
+
+
+def test_fit_ses_matches_loop_and_picks_best_alpha():
+    rng = np.random.default_rng(3)
+    matrix = rng.poisson(5, size=(3, 30)).astype("float64")
+    alphas = [0.1, 0.5, 0.9]
+    level, alpha, variance = forecast.fit_ses(matrix, alphas)
+
+    for row in range(3):
+        best = None
+        for a in alphas:
+            lvl, sse = matrix[row, 0], 0.0
+            for value in matrix[row, 1:]:
+                sse += (value - lvl) ** 2
+                lvl += a * (value - lvl)
+            if best is None or sse < best[0]:
+                best = (sse, a, lvl)
+        assert alpha[row] == best[1]
+        assert level[row] == pytest.approx(best[2])
+        assert variance[row] == pytest.approx(best[0] / 29)
+
+
+def test_forecast_matrix_uses_mean_for_sparse_series():
+    matrix = np.zeros((1, 20))
+    matrix[0, [3, 9]] = 10
+    predicted, methods = forecast.forecast_matrix(matrix, horizon=7, arima_max=0)
+
+    assert methods[0] == forecast.METHOD_MEAN
+    assert predicted[0] == pytest.approx(7 * 20 / 20)
+
+
+def test_forecast_matrix_is_never_negative():
+    matrix = np.vstack([np.linspace(30, 0, 60), _ar1_series(8, 0.4, 60, seed=4)])
+    predicted, methods = forecast.forecast_matrix(matrix, horizon=7, arima_max=0)
+
+    assert (predicted >= 0).all()
+    assert set(methods) <= {forecast.METHOD_AR1, forecast.METHOD_SES}
+
+
+def test_consumption_matrix_pivots_rows():
+    rows = [
+        #(ProduktID, namn, saldo, datum, uttag); produkter utan uttag har datum None
+        (1, "Kabel", 100, "2026-01-01", 3),
+        (1, "Kabel", 100, "2026-01-03", 5),
+        (2, "Mjölk", 4, None, None),
+        (3, "Säkring", 9, "2025-12-01", 7),   #utanför fönstret
+    ]
+    ids, names, stocks, matrix = forecast.consumption_matrix(rows, 3, end_date="2026-01-03")
+
+    assert ids.tolist() == [1, 2, 3]
+    assert names == ["Kabel", "Mjölk", "Säkring"]
+    assert stocks.tolist() == [100, 4, 9]
+    assert matrix.tolist() == [[3, 0, 5], [0, 0, 0], [0, 0, 0]]
+
+
+def test_forecast_next_week_sparse_series_uses_mean():
+    consumption = np.zeros(FORECAST_CONFIG["history_days"])
+    consumption[-1] = 90
+    assert forecast.forecast_next_week("Kabel", consumption, 7) == 7
+    assert forecast.forecast_next_week("Kabel", [], 7) == 0
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.ai.forecast_service import ForecastService
+
+
+@pytest.fixture
+def service():
+    service = ForecastService(max_workers=1)
+    yield service
+    service.shutdown()
+
+
+def _series(consumption, end="2026-01-31", latest_history_id=10, history_rows=5):
+    return {
+        "product_id": 1,
+        "name": "Kabel",
+        "end": np.datetime64(end, "D"),
+        "consumption": np.asarray(consumption, dtype="float64"),
+        "history_rows": history_rows,
+        "latest_history_id": latest_history_id,
+    }
+
+
+def test_cache_hit_until_new_history(service):
+    sparse = np.zeros(30)
+    sparse[-1] = 30
+
+    assert service.forecast_next_week(_series(sparse)) == 7
+    assert service.forecast_next_week(_series(sparse)) == 7
+    assert service.stats()["cacheträffar"] == 1
+
+    assert service.cached(_series(sparse, latest_history_id=11, history_rows=6)) is None
+
+
+def test_cache_is_invalidated_when_the_window_moves(service):
+    sparse = np.zeros(30)
+    sparse[-1] = 30
+    service.forecast_next_week(_series(sparse, end="2026-01-31"))
+
+    assert service.cached(_series(sparse, end="2026-01-31")) == 7
+    assert service.cached(_series(sparse, end="2026-02-01")) is None
+
+
+def test_arima_fit_in_pool(service):
+    pytest.importorskip("statsmodels")
+    rng = np.random.default_rng(0)
+    consumption = rng.poisson(4, size=60).astype("float64")
+
+    predicted = service.forecast_next_week(_series(consumption))
+
+    assert service.stats()["anpassningar"] == 1
+    assert predicted == pytest.approx(7 * consumption.mean(), abs=7)
+    assert service._models.get("1")["params"] is not None
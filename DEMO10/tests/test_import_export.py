@@ -0,0 +1,97 @@
+import pytest
+
+from src.chatbot import commands
+from src.database import db, import_export
+from src.database.import_export import _parse_int
+from src.database.resolver import product_resolver
+
+
+def test_parse_int_accepts_whole_numbers_only():
+    assert _parse_int("12") == 12
+    assert _parse_int("12.0") == 12
+    assert _parse_int("", default=1) == 1
+    for value in ("1.5", "abc", "nan"):
+        with pytest.raises(ValueError):
+            _parse_int(value)
+    with pytest.raises(ValueError):
+        _parse_int("")
+
+
+def test_import_stock_reports_fractional_quantities(temp_db, tmp_path):
+    path = tmp_path / "saldon.csv"
+    path.write_text("Artikelnummer;Antal\n1001;1.5\n1002;60.0\n", encoding="utf-8")
+
+    updated, failed = import_export.import_stock(str(path))
+
+    assert updated == 1
+    assert failed == [(2, "1001", "Ogiltigt saldo ('1.5' är inte ett heltal).")]
+    assert db.get_product_info("1001")[1] == 120
+
+
+def test_import_products_reports_fractional_stock(temp_db, tmp_path):
+    path = tmp_path / "katalog.csv"
+    path.write_text("Namn;Antal;Lagerplats\nSäkring 10A;2.5;D1\nSäkring 16A;4;D2\n", encoding="utf-8")
+
+    imported, failed = import_export.import_products(str(path))
+
+    assert imported == 1
+    assert [line for line, *_ in failed] == [2]
+
+
+def test_csv_export_round_trip(temp_db, tmp_path):
+    path = tmp_path / "produkter.csv"
+
+    assert import_export.export_products(str(path)) == 5
+    rows = list(import_export.iter_rows(str(path)))
+    assert [row["Namn"] for row in rows][:2] == ["Kabel 3x1.5", "Kabel 3x2.5"]
+    assert rows[0]["Antal"] == "120"
+
+
+def test_excel_export_round_trip(temp_db, tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "historik.xlsx"
+
+    assert import_export.export_history(str(path)) == 5
+    rows = list(import_export.iter_rows(str(path)))
+    assert rows[0]["Artikelnummer"] == "1001"
+    assert _parse_int(rows[0]["Antal"]) == 120
+
+
+def test_imports_resolve_keys_exactly(temp_db, tmp_path):
+    stock = tmp_path / "saldon.csv"
+    stock.write_text("Namn;Antal\nMjölk;9\nkabel;1\n", encoding="utf-8")
+    history = tmp_path / "historik.csv"
+    history.write_text("Namn;Datum;Antal\nMjölk;2026-01-05;6\n3x2.5;2026-01-05;70\n", encoding="utf-8")
+
+    updated, failed = import_export.import_stock(str(stock))
+    assert updated == 1
+    assert failed == [(3, "kabel", "Produkten hittades inte.")]
+    assert db.get_product_info("3001")[1] == 9
+
+    imported, failed = import_export.import_history(str(history))
+    assert imported == 1
+    assert failed == [(3, "3x2.5", "Produkten hittades inte.")]
+
+
+def test_import_products_rebuilds_the_resolver_once(temp_db, tmp_path, monkeypatch):
+    path = tmp_path / "katalog.csv"
+    path.write_text("Namn;Antal\nSäkring 10A;1\nSäkring 16A;2\nsäkring 10a;3\nSäkring 20A;4\n", encoding="utf-8")
+    calls = []
+    monkeypatch.setattr(product_resolver, "invalidate", lambda: calls.append(1))
+
+    imported, failed = import_export.import_products(str(path), chunk_size=1)
+
+    assert imported == 3
+    #Dubbletten i en senare chunk hittas utan att indexet byggts om
+    assert [line for line, *_ in failed] == [4]
+    assert len(calls) == 1
+
+
+def test_importera_reports_line_key_and_reason_for_every_importer(temp_db, tmp_path):
+    stock = tmp_path / "saldon.csv"
+    stock.write_text("Namn;Antal\nkabel;1\nMjölk;-2\n", encoding="utf-8")
+
+    message = commands.importera("saldon", str(stock), "admin")
+
+    assert "- Rad 2 (kabel): Produkten hittades inte." in message
+    assert "- Rad 3 (Mjölk): Lagersaldo kan inte vara negativt." in message
@@ -0,0 +1,80 @@
+import pytest
+
+from src.ai.ingest import iter_chunks, max_chunk_tokens, token_counter
+
+
+def _words(n):
+    return " ".join(f"ord{i}" for i in range(n))
+
+
+def test_chunks_overlap_and_cover_every_word():
+    chunks = list(iter_chunks([_words(12) + "\n"], chunk_tokens=5, overlap=2))
+
+    assert [text.split() for _, text in chunks] == [
+        ["ord0", "ord1", "ord2", "ord3", "ord4"],
+        ["ord3", "ord4", "ord5", "ord6", "ord7"],
+        ["ord6", "ord7", "ord8", "ord9", "ord10"],
+        ["ord9", "ord10", "ord11"],
+    ]
+
+
+def test_offsets_point_at_the_first_word():
+    lines = ["alfa beta\n", "gamma delta\n"]
+    text = "".join(lines)
+    for offset, chunk in iter_chunks(lines, chunk_tokens=2, overlap=0):
+        assert text[offset:].startswith(chunk.split()[0])
+
+
+def test_no_trailing_chunk_of_only_overlap():
+    chunks = list(iter_chunks([_words(8)], chunk_tokens=5, overlap=2))
+    assert len(chunks) == 2
+    assert chunks[-1][1].split()[-1] == "ord7"
+
+
+def test_chunks_are_bounded_by_wordpieces():
+    #Långa ord räknas som flera ordbitar
+    def count(word):
+        return 3 if word.startswith("lång") else 1
+
+    text = "a b långordA c långordB d e f"
+    for _, chunk in iter_chunks([text], chunk_tokens=5, overlap=1, count_tokens=count):
+        assert sum(count(word) for word in chunk.split()) <= 5
+
+
+def test_invalid_overlap():
+    with pytest.raises(ValueError):
+        list(iter_chunks(["a b c"], chunk_tokens=3, overlap=3))
+
+
+class _Tokenizer:
+    def __init__(self):
+        self.calls = 0
+
+    def tokenize(self, word):
+        self.calls += 1
+        return [word[i:i + 4] for i in range(0, len(word), 4)]
+
+
+class _Embedder:
+    max_seq_length = 128
+
+    def __init__(self):
+        self.tokenizer = _Tokenizer()
+
+
+def test_token_counter_uses_and_caches_the_tokenizer():
+    embedder = _Embedder()
+    count = token_counter(embedder)
+
+    assert count("jordfelsbrytare") == 4
+    assert count("jordfelsbrytare") == 4
+    assert embedder.tokenizer.calls == 1
+    assert token_counter(object()) is None
+
+
+def test_max_chunk_tokens_respects_the_model(monkeypatch):
+    from src.utils.config import RAG_CONFIG
+
+    monkeypatch.setitem(RAG_CONFIG, "chunk_tokens", 400)
+    assert max_chunk_tokens(_Embedder()) == 126
+    assert max_chunk_tokens(object()) == 400
@@ -0,0 +1,71 @@
+import pytest
+
+from src.chatbot.parser import CommandParser, extract_product
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("saldo kabel 3x1.5", {"action": "saldo", "args": ["kabel 3x1.5"]}),
+    ("Saldo för  jordfelsbrytare?", {"action": "saldo", "args": ["jordfelsbrytare"]}),
+    ("hur många jordfelsbrytare har vi", {"action": "saldo", "args": ["jordfelsbrytare"]}),
+    ("var ligger kabel 3x2.5", {"action": "saldo", "args": ["kabel 3x2.5"]}),
+    ("uppdatera kabel 3x1.5 till 40 st", {"action": "uppdatera", "args": ["kabel 3x1.5", "40"]}),
+    ("uppdatera saldo för mjölk 7", {"action": "uppdatera", "args": ["mjölk", "7"]}),
+    ("lågt saldo", {"action": "lågtsaldo", "args": []}),
+    ("historik på mjölk", {"action": "historik", "args": ["mjölk"]}),
+    ("prognos kabel", {"action": "prognos", "args": ["kabel"]}),
+    ("topp 5", {"action": "topplista", "args": []}),
+    ("flytta kabel 3x1.5 till plats B4", {"action": "flyttaplats", "args": ["kabel 3x1.5", "B4"]}),
+    ("flyttaplats mjölk C9", {"action": "flyttaplats", "args": ["mjölk", "C9"]}),
+    ("ta bort produkten mjölk", {"action": "tabort", "args": ["mjölk"]}),
+    ("byt namn på mjölk till havremjölk", {"action": "bytnamn", "args": ["mjölk", "havremjölk"]}),
+    ("läggtill Säkring 10A; 20; D1; 10 A; 4001",
+     {"action": "läggtill", "args": ["Säkring 10A", "20", "D1", "10 A", "4001"]}),
+    ("vad är en jordfelsbrytare?", {"action": "rag", "args": ["vad är en jordfelsbrytare?"]}),
+])
+def test_structured_commands(text, expected):
+    assert CommandParser().parse(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "kan du kolla hur det ser ut med kablarna",
+    "vad är saldot på kabel",          #rag-fråga med lagerord: tvetydig
+    "läggtill Säkring; många; D1; x; 1",
+    "läggtill Säkring 10A",
+    "",
+])
+def test_ambiguous_input_falls_back_to_llm(text):
+    assert CommandParser().parse(text) is None
+
+
+def test_raw_commands_keep_their_text():
+    parser = CommandParser()
+    assert parser.parse("inventering\nkabel 3x1.5;100\nmjölk;4") == {
+        "action": "inventering", "args": ["\nkabel 3x1.5;100\nmjölk;4"],
+    }
+    assert parser.parse('importera produkter "C:/Min mapp/katalog.csv"') == {
+        "action": "importera", "args": ["produkter", '"C:/Min mapp/katalog.csv"'],
+    }
+
+
+def test_hit_rate_counters():
+    parser = CommandParser()
+    parser.parse("saldo kabel")
+    parser.parse("saldo mjölk")
+    parser.parse("topplista")
+    parser.parse("något helt annat")
+
+    assert parser.hits == {"saldo": 2, "topplista": 1}
+    assert parser.fallbacks == 1
+    assert parser.hit_rate() == 0.75
+    assert parser.stats()["träffgrad"] == 0.75
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("hur många jordfelsbrytare har vi kvar?", "jordfelsbrytare"),
+    ("kan du kolla saldot på Mjölkchoklad", "mjölkchoklad"),
+    ("hur ser det ut med saldot för kabel 3x1.5", "kabel 3x1.5"),
+    ("mjölk", "mjölk"),
+    ("  ", None),
+])
+def test_extract_product(text, expected):
+    assert extract_product(text) == expected
@@ -0,0 +1,56 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from src.ai import projections
+from src.chatbot import commands
+from src.database import db
+from src.utils.config import FORECAST_CONFIG
+
+
+def _state(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT last_history_id, last_full_refresh FROM Prognos_status").fetchone()
+    finally:
+        conn.close()
+
+
+def test_is_stale():
+    now = datetime(2026, 1, 2, 12, 0, tzinfo=timezone.utc)
+    hours = FORECAST_CONFIG["projection_full_refresh_hours"]
+    fresh = (now - timedelta(hours=hours - 1)).strftime(db.PROJECTION_TIME_FORMAT)
+    old = (now - timedelta(hours=hours + 1)).strftime(db.PROJECTION_TIME_FORMAT)
+
+    assert not projections.is_stale(fresh, now)
+    assert projections.is_stale(old, now)
+
+
+def test_full_then_incremental_refresh(temp_db):
+    assert projections.refresh() == 5
+    last_history_id, last_full_refresh = _state(temp_db)
+    assert last_history_id == 5
+    assert projections.parse_timestamp(last_full_refresh) <= datetime.now(timezone.utc)
+
+    #Ingen ny historik: inget räknas om
+    assert projections.refresh() == 0
+
+    db.bulk_update_stock([("Kabel 3x1.5", 100)])
+    assert projections.refresh() == 1
+    assert _state(temp_db)[0] == 6
+    assert _state(temp_db)[1] == last_full_refresh
+
+
+def test_prognos_serves_fresh_projection_and_recomputes_stale(temp_db):
+    db.bulk_update_stock([("Kabel 3x1.5", 100)])
+    projections.refresh(full=True)
+    assert "Beräknad" in commands.prognos("Kabel 3x1.5", "admin")
+
+    old = (datetime.now(timezone.utc) - timedelta(days=3)).strftime(db.PROJECTION_TIME_FORMAT)
+    conn = sqlite3.connect(temp_db)
+    conn.execute("UPDATE Prognos SET computed_at = ?", (old,))
+    conn.commit()
+    conn.close()
+
+    message = commands.prognos("Kabel 3x1.5", "admin")
+    assert "Beräknad" not in message
+    assert "Prognos för **Kabel 3x1.5** nästa vecka" in message
@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.ai.ingest import ingest_directory, ingest_file
+from src.ai.rag import RAGChatbot, doc_id
+from src.utils.config import CACHE_CONFIG, RAG_CONFIG
+
+DIM = 16
+
+
+class _Embedder:
+    """Samma text ger alltid samma slumpvektor, så en fråga med dokumentets text träffar det exakt."""
+
+    max_seq_length = 256
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.array([np.random.default_rng(doc_id(text)).normal(size=DIM) for text in texts], dtype="float32")
+
+
+def _chatbot():
+    chatbot = RAGChatbot()
+    chatbot._embedder = _Embedder()
+    chatbot.embedding_backend = "torch"
+    chatbot.wait_until_ready = lambda: None
+    return chatbot
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    for key, name in (("index_path", "index.faiss"), ("docs_path", "docs.txt"),
+                      ("store_path", "docstore"), ("lexical_path", "lexical.db")):
+        monkeypatch.setitem(RAG_CONFIG, key, str(tmp_path / name))
+    monkeypatch.setitem(RAG_CONFIG, "batch_max_wait_ms", 0)
+    monkeypatch.setitem(RAG_CONFIG, "auto_flat_max", 100)
+    monkeypatch.setitem(RAG_CONFIG, "auto_hnsw_max", 200)
+    monkeypatch.setitem(CACHE_CONFIG, "answer_path", str(tmp_path / "answers.json"))
+    return _chatbot()
+
+
+def _texts(start, stop):
+    return [f"dokument {i}" for i in range(start, stop)]
+
+
+def test_index_type_follows_the_growing_corpus(rag):
+    rag.add_documents(_texts(0, 50))
+    assert rag.index_type == "flat"
+
+    rag.add_documents(_texts(50, 150))
+    assert rag.index_type == "hnsw"
+
+    rag.add_documents(_texts(150, 300))
+    assert rag.index_type == "ivf_flat"
+    assert rag.index.ntotal == 300
+    assert rag.search("dokument 42", top_k=1)[0][1] == "dokument 42"
+
+
+def test_deletions_do_not_shrink_the_index_type(rag):
+    rag.add_documents(_texts(0, 150))
+    rag.delete_documents(texts=_texts(0, 100))
+    rag.add_documents(_texts(300, 310))
+
+    assert rag.index_type == "hnsw"
+    assert len(rag.store) == 60
+
+
+def test_loading_an_index_stuck_at_its_first_type_rebuilds_it(rag, monkeypatch):
+    monkeypatch.setitem(RAG_CONFIG, "auto_flat_max", 1000)
+    rag.add_documents(_texts(0, 150))
+    assert rag.index_type == "flat"
+
+    monkeypatch.setitem(RAG_CONFIG, "auto_flat_max", 100)
+    reloaded = _chatbot()
+    reloaded.load_index()
+
+    assert reloaded.index_type == "hnsw"
+    assert reloaded.index.ntotal == 150
+
+
+def test_ivf_is_retrained_when_the_corpus_outgrows_its_clusters(rag, monkeypatch):
+    import faiss
+
+    monkeypatch.setitem(RAG_CONFIG, "index_type", "ivf_flat")
+
+    def nlist():
+        return faiss.extract_index_ivf(rag.index).nlist
+
+    rag.add_documents(_texts(0, 100))
+    assert nlist() == 2
+
+    #100 -> 130 vektorer: 3 kluster vore bäst, under ivf_retrain_factor (2) gånger 2
+    rag.add_documents(_texts(100, 130))
+    assert nlist() == 2
+
+    rag.add_documents(_texts(130, 200))
+    assert nlist() == 5
+    assert rag.index.ntotal == 200
+    #Vektorerna läses ur IVF-Flat-indexet; bara de nya dokumenten bäddades in
+    assert rag.embedder.encoded == 200
+    assert rag.search("dokument 7", top_k=1)[0][1] == "dokument 7"
+
+
+SHARED = "gemensam text om jordfelsbrytare"
+
+
+@pytest.fixture
+def manuals(tmp_path, monkeypatch):
+    monkeypatch.setitem(RAG_CONFIG, "chunk_tokens", 4)
+    monkeypatch.setitem(RAG_CONFIG, "chunk_overlap", 0)
+    directory = tmp_path / "manualer"
+    directory.mkdir()
+    (directory / "a.txt").write_text(f"{SHARED}\nbara i fil a\n", encoding="utf-8")
+    (directory / "b.txt").write_text(f"{SHARED}\nbara i fil b\n", encoding="utf-8")
+    return directory
+
+
+def test_reingesting_a_file_keeps_chunks_shared_with_another_file(rag, manuals):
+    ingest_directory(rag, str(manuals))
+    (manuals / "a.txt").write_text("helt ny text här\n", encoding="utf-8")
+
+    chunks, added, removed = ingest_file(rag, str(manuals / "a.txt"), "a.txt")
+
+    assert (chunks, added, removed) == (1, 1, 1)
+    assert doc_id(SHARED) in rag.store
+    assert rag.store.metadata(doc_id(SHARED))["source"] == "b.txt"
+    assert sorted(rag.documents_from("b.txt")) == sorted([doc_id(SHARED), doc_id("bara i fil b")])
+    assert rag.index.ntotal == len(rag.store) == 3
+
+
+def test_pruning_a_file_keeps_chunks_shared_with_another_file(rag, manuals):
+    ingest_directory(rag, str(manuals))
+    (manuals / "a.txt").unlink()
+
+    stats = ingest_directory(rag, str(manuals), prune=True)
+
+    assert stats["borttagna"] == 1
+    assert rag.sources() == {"b.txt"}
+    assert sorted(rag.documents_from("b.txt")) == sorted([doc_id(SHARED), doc_id("bara i fil b")])
+    assert rag.search(SHARED, top_k=1)[0][1] == SHARED
+
+
+@pytest.mark.parametrize("index_type, mapped", [("flat", False), ("hnsw", False), ("ivf_flat", True)])
+def test_only_ivf_indexes_are_memory_mapped(rag, monkeypatch, index_type, mapped):
+    monkeypatch.setitem(RAG_CONFIG, "index_type", index_type)
+    rag.add_documents(_texts(0, 100))
+
+    reloaded = _chatbot()
+    reloaded.load_index()
+    assert reloaded._index_mapped is mapped
+
+    #Första ändringen läser in ett minnesmappat index; sökningen fungerar före och efter
+    assert reloaded.search("dokument 3", top_k=1)[0][1] == "dokument 3"
+    reloaded.add_documents(_texts(100, 110))
+    assert reloaded._index_mapped is False
+    assert reloaded.index.ntotal == 110
+    assert reloaded.search("dokument 105", top_k=1)[0][1] == "dokument 105"
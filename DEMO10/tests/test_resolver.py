@@ -0,0 +1,79 @@
+from src.database import db
+from src.database.resolver import ProductResolver, product_resolver
+
+
+def _names(matches):
+    return [match.name for match in matches]
+
+
+def test_exact_name_is_case_insensitive(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        assert _names(product_resolver.find(conn, "jordfelsbrytare 30ma")) == ["Jordfelsbrytare 30mA"]
+
+
+def test_substring_matches_like_the_old_query(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        assert _names(product_resolver.find(conn, "kabel")) == ["Kabel 3x1.5", "Kabel 3x2.5"]
+        assert _names(product_resolver.find(conn, "3x2")) == ["Kabel 3x2.5"]
+        #Kortare än ett n-gram: söks direkt i namnen
+        assert _names(product_resolver.find(conn, "5")) == ["Kabel 3x1.5", "Kabel 3x2.5"]
+        assert product_resolver.find(conn, "finns inte") == []
+
+
+def test_ngrams_out_of_order_are_verified(temp_db):
+    #"belkab" har samma n-gram som delar av "Kabel" men finns inte som delsträng
+    with db.get_connection_pool().connection() as conn:
+        assert product_resolver.find(conn, "belkab") == []
+
+
+def test_article_number_is_exact(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        assert _names(product_resolver.find(conn, "2001")) == ["Jordfelsbrytare 30mA"]
+        assert product_resolver.find(conn, "200") == []
+
+
+def test_results_are_ordered_by_product_id(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        matches = product_resolver.find(conn, "mjölk")
+    assert [match.product_id for match in matches] == sorted(match.product_id for match in matches)
+    assert _names(matches) == ["Mjölk", "Mjölkchoklad"]
+
+
+def test_exists(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        assert product_resolver.exists(conn, "KABEL 3X1.5", "")
+        assert product_resolver.exists(conn, "Ny produkt", "1002")
+        assert not product_resolver.exists(conn, "Ny produkt", "9999")
+
+
+def test_invalidate_after_rename(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        assert _names(product_resolver.find(conn, "mjölkchoklad")) == ["Mjölkchoklad"]
+
+    db.rename_product("Mjölkchoklad", "Mörk choklad")
+
+    with db.get_connection_pool().connection() as conn:
+        assert product_resolver.find(conn, "mjölkchoklad") == []
+        assert _names(product_resolver.find(conn, "choklad")) == ["Mörk choklad"]
+
+
+def test_index_is_not_installed_if_invalidated_while_loading(temp_db):
+    resolver = ProductResolver()
+    with db.get_connection_pool().connection() as conn:
+        original = conn.execute
+
+        class _Conn:
+            def execute(self, *args):
+                #Simulerar en ändring medan indexet läses in
+                resolver.invalidate()
+                return original(*args)
+
+        assert _names(resolver.find(_Conn(), "2001")) == ["Jordfelsbrytare 30mA"]
+    assert resolver._index is None
+
+
+def test_find_exact_prefers_article_number_then_name(temp_db):
+    with db.get_connection_pool().connection() as conn:
+        assert _names(product_resolver.find_exact(conn, "mjölk")) == ["Mjölk"]
+        assert _names(product_resolver.find_exact(conn, "3002")) == ["Mjölkchoklad"]
+        assert product_resolver.find_exact(conn, "kabel") == []